@@ -0,0 +1,100 @@
+"""
+日历规则查询基准
+
+生成包含大量例外的 .ics 文件，测量流式导入耗时，以及 theme_at / next_event
+在区间索引上的查询耗时（对比逐条线性扫描原始区间）。
+
+用法: python benchmarks/bench_calendar_rules.py [--events N]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calendar_rules import RuleSchedule, iter_ics_events, load_calendar  # noqa: E402
+from scheduler import DailySchedule  # noqa: E402
+
+
+def write_calendar(path, count, first_day):
+    """写入 count 个随机例外：半数全天（按周末处理），半数为强制主题的时段"""
+    rng = random.Random(42)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('BEGIN:VCALENDAR\r\n')
+        for index in range(count):
+            day = first_day + timedelta(days=rng.randrange(700))
+            f.write('BEGIN:VEVENT\r\n')
+            if index % 2:
+                f.write(f'DTSTART;VALUE=DATE:{day:%Y%m%d}\r\n')
+                f.write(f'DTEND;VALUE=DATE:{day + timedelta(days=rng.randint(1, 5)):%Y%m%d}\r\n')
+                f.write('X-THEME-SWITCHER:weekend\r\n')
+            else:
+                start = datetime.combine(day, datetime.min.time()) + timedelta(minutes=rng.randrange(1440))
+                end = start + timedelta(minutes=rng.randint(15, 240))
+                f.write(f'DTSTART:{start:%Y%m%dT%H%M%S}\r\n')
+                f.write(f'DTEND:{end:%Y%m%dT%H%M%S}\r\n')
+                f.write(f'X-THEME-SWITCHER:{rng.choice(["dark", "light"])}\r\n')
+            f.write(f'SUMMARY:例外 {index}\r\n')
+            f.write('END:VEVENT\r\n')
+        f.write('END:VCALENDAR\r\n')
+
+
+def linear_theme_at(intervals, base, now):
+    """对照组：逐条扫描原始区间，后出现的区间优先"""
+    theme = None
+    for start, end, action in intervals:
+        if start <= now < end:
+            theme = action
+    return theme or base.theme_at(now)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--events', type=int, default=5000)
+    parser.add_argument('--queries', type=int, default=2000)
+    args = parser.parse_args()
+
+    today = date.today()
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'exceptions.ics')
+        write_calendar(path, args.events, today)
+        size_kb = os.path.getsize(path) / 1024
+
+        weekday = DailySchedule.from_times('21:00', '07:00')
+        schedule = RuleSchedule(weekday, DailySchedule.from_times('23:00', '09:00'))
+        started = time.perf_counter()
+        imported = load_calendar(schedule, path, 'weekend', today=today)
+        schedule.build()
+        load_ms = (time.perf_counter() - started) * 1000
+
+        with open(path, 'r', encoding='utf-8') as f:
+            forced = [(e['start'], e['end'], e['action']) for e in iter_ics_events(f)
+                      if e['action'] in ('dark', 'light')]
+
+    rng = random.Random(7)
+    origin = datetime.combine(today, datetime.min.time())
+    points = [origin + timedelta(minutes=rng.randrange(700 * 1440)) for _ in range(args.queries)]
+
+    started = time.perf_counter()
+    for point in points:
+        schedule.theme_at(point)
+        schedule.next_event(point)
+    indexed_us = (time.perf_counter() - started) / len(points) * 1e6
+
+    started = time.perf_counter()
+    for point in points:
+        linear_theme_at(forced, weekday, point)
+    linear_us = (time.perf_counter() - started) / len(points) * 1e6
+
+    print(f"导入 {imported} 个例外（{size_kb:.0f} KB）: {load_ms:.1f} ms，"
+          f"索引分段 {len(schedule.day_rules)} 日期 / {len(schedule.forced)} 时段")
+    print(f"区间索引 theme_at + next_event: {indexed_us:8.2f} µs/次")
+    print(f"线性扫描 theme_at（对照）:       {linear_us:8.2f} µs/次")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+命令行模式启动耗时基准
+
+以子进程方式反复执行 theme_switcher.py --status / --set / --toggle，统计端到端
+耗时（--set 已是目标主题，不读取配置；--toggle 每次都实际切换），
+并与空解释器（python -c pass）和仅导入 tkinter 的耗时对比。源码运行时
+theme_switcher.py 本身每次都要重新编译（主脚本不写字节码缓存），打包后的程序
+没有这一步，因此另外测量预先编译的主程序（.pyc）和 python -m theme_cli（使用字节码
+缓存）；同时用
+-X importtime 确认命令行模式没有加载 tkinter、configparser 等不需要的模块。使用临时文件后端，
+不改动系统主题。
+
+检查：预编译主程序与 python -m theme_cli 的一次性命令中位数都低于目标（默认 50 ms），
+否则退出码为 1。
+
+用法: python benchmarks/bench_cli_startup.py [--rounds N] [--target 毫秒]
+"""
+import argparse
+import os
+import py_compile
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY = os.path.join(ROOT, 'theme_switcher.py')
+CLI_ENTRY = os.path.join(ROOT, 'theme_cli.py')
+TARGET_MS = 50
+# --status 不应加载的模块（只在对应命令或 --json 时才需要；基准用的文件后端以 JSON
+# 保存主题值，因此不检查 json，注册表后端读取时不导入它）
+STATUS_FORBIDDEN = ('tkinter', '_tkinter', 'socket', 'tempfile', 'configparser', 'threading', 'datetime',
+                    'subprocess')
+# --toggle 实际切换，但只读配置、不启动线程，同样不应加载这些模块
+TOGGLE_FORBIDDEN = ('tkinter', '_tkinter', 'socket', 'tempfile', 'configparser', 'threading', 'subprocess')
+
+
+def measure(command, rounds, env, cwd):
+    """执行 rounds 次命令，返回每次耗时（毫秒）"""
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        subprocess.run(command, env=env, cwd=cwd, stdout=subprocess.DEVNULL, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def loaded_modules(command, env, cwd):
+    """用 -X importtime 列出命令导入的模块"""
+    result = subprocess.run(command[:1] + ['-X', 'importtime'] + command[1:], env=env, cwd=cwd,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    return {line.rsplit('|', 1)[-1].strip() for line in result.stderr.splitlines() if '|' in line}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--target', type=float, default=TARGET_MS, help='一次性命令的目标耗时（毫秒）')
+    args = parser.parse_args()
+    problems = []
+
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, THEME_SWITCHER_STATE_FILE=os.path.join(workdir, 'state.json'),
+                   XDG_CONFIG_HOME=os.path.join(workdir, 'config'),
+                   THEME_SWITCHER_INSTANCE=f'bench-cli-{os.getpid()}')
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, env.get('PYTHONPATH')]))
+        # 预热要生成字节码缓存；环境禁止写入时每次都重新编译各模块，测得的不是实际启动耗时
+        env.pop('PYTHONDONTWRITEBYTECODE', None)
+        if sys.platform == 'win32':
+            print("注意：Windows 上命令行模式直接读写注册表，--set 会改变系统主题")
+        # 相当于打包后的主程序：字节码已编译好
+        compiled = os.path.join(workdir, 'theme_switcher.pyc')
+        py_compile.compile(ENTRY, cfile=compiled, doraise=True)
+        commands = [
+            ('python -c pass（对照）', [sys.executable, '-c', 'pass'], False),
+            ('import tkinter（对照）', [sys.executable, '-c', 'import tkinter'], False),
+            ('--status（源码）', [sys.executable, ENTRY, '--status'], False),
+            ('--status（预编译）', [sys.executable, compiled, '--status'], True),
+            ('theme_cli.py --status', [sys.executable, CLI_ENTRY, '--status'], False),
+            ('-m theme_cli --status', [sys.executable, '-m', 'theme_cli', '--status'], True),
+            ('--set light（源码）', [sys.executable, ENTRY, '--set', 'light', '--no-restart'], False),
+            ('--set light（预编译）', [sys.executable, compiled, '--set', 'light', '--no-restart'], True),
+            ('theme_cli.py --set light', [sys.executable, CLI_ENTRY, '--set', 'light', '--no-restart'], False),
+            ('-m theme_cli --set light', [sys.executable, '-m', 'theme_cli', '--set', 'light', '--no-restart'], True),
+            ('--toggle（预编译）', [sys.executable, compiled, '--toggle', '--no-restart'], True),
+        ]
+        # 预热：生成字节码缓存和状态文件
+        for _, command, _ in commands:
+            measure(command, 1, env, workdir)
+
+        print(f"{'命令':<28}{'中位数':>10}{'最小':>10}")
+        for label, command, checked in commands:
+            samples = measure(command, args.rounds, env, workdir)
+            median = statistics.median(samples)
+            mark = ''
+            if checked and median > args.target:
+                mark = '  超过目标'
+                problems.append(f'{label} 中位数 {median:.1f} ms')
+            print(f"{label:<28}{median:>8.1f}ms{min(samples):>8.1f}ms{mark}")
+
+        modules = loaded_modules([sys.executable, compiled, '--status'], env, workdir)
+        loaded = sorted(name for name in modules if name.split('.')[0] in STATUS_FORBIDDEN)
+        print(f"--status 导入模块 {len(modules)} 个，不需要的模块: {', '.join(loaded) or '无'}")
+        if loaded:
+            problems.append(f"--status 加载了 {', '.join(loaded)}")
+        modules = loaded_modules([sys.executable, compiled, '--toggle', '--no-restart'], env, workdir)
+        loaded = sorted(name for name in modules if name.split('.')[0] in TOGGLE_FORBIDDEN)
+        print(f"--toggle 导入模块 {len(modules)} 个，不需要的模块: {', '.join(loaded) or '无'}")
+        if loaded:
+            problems.append(f"--toggle 加载了 {', '.join(loaded)}")
+    print(f"目标: 一次性命令端到端 < {args.target:g} ms（直接运行 .py 时含编译该脚本的时间，只作参考）")
+    print(f"检查: {'；'.join(problems) or '通过'}")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+本地控制接口并发基准
+
+启动 ControlServer，请求交给一个模拟 Tk 主循环的线程执行（与界面一样经
+TkDispatcher 风格的队列投递）。大量并发客户端以长连接反复请求 /status，
+统计吞吐量、延迟，以及模拟主循环两次处理之间的最大间隔，确认控制接口
+不会阻塞主循环。
+
+用法: python benchmarks/bench_control_server.py [--clients N] [--requests N]
+"""
+import argparse
+import asyncio
+import collections
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from control_server import ControlServer  # noqa: E402
+
+TOKEN = 'bench-token'
+TICK = 0.005
+
+
+class FakeMainLoop:
+    """每 TICK 秒处理一次队列的“主循环”，记录相邻两次处理的最大间隔"""
+
+    def __init__(self):
+        self.queue = collections.deque()
+        self.max_gap = 0.0
+        self.running = True
+
+    def post(self, callback):
+        self.queue.append(callback)
+
+    def run(self):
+        last = time.perf_counter()
+        while self.running:
+            while self.queue:
+                self.queue.popleft()()
+            now = time.perf_counter()
+            self.max_gap = max(self.max_gap, now - last)
+            last = now
+            time.sleep(TICK)
+
+
+async def client(port, requests, latencies):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    request = (f"GET /status HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+               f"Authorization: Bearer {TOKEN}\r\n\r\n").encode('latin-1')
+    for _ in range(requests):
+        start = time.perf_counter()
+        writer.write(request)
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line == b'\r\n':
+                break
+            if line.lower().startswith(b'content-length:'):
+                length = int(line.split(b':')[1])
+        await reader.readexactly(length)
+        latencies.append((time.perf_counter() - start) * 1000)
+    writer.close()
+
+
+async def run_clients(port, clients, requests):
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, requests, latencies) for _ in range(clients)))
+    return latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=200, help='并发连接数')
+    parser.add_argument('--requests', type=int, default=50, help='每个连接的请求数')
+    args = parser.parse_args()
+
+    main_loop = FakeMainLoop()
+    threading.Thread(target=main_loop.run, daemon=True).start()
+
+    def dispatch(command, params, reply):
+        main_loop.post(lambda: reply({'theme': 'dark', 'command': command}))
+
+    server = ControlServer(dispatch, TOKEN, port=0)
+    server.start()
+    try:
+        latencies, elapsed = asyncio.run(run_clients(server.port, args.clients, args.requests))
+    finally:
+        server.stop()
+        main_loop.running = False
+
+    latencies.sort()
+    total = len(latencies)
+    print(f"并发连接 {args.clients}，共 {total} 个请求，用时 {elapsed:.2f} 秒（{total / elapsed:.0f} 请求/秒）")
+    print(f"延迟: 中位数 {statistics.median(latencies):.2f} ms，P95 {latencies[int(total * 0.95) - 1]:.2f} ms，"
+          f"最大 {latencies[-1]:.2f} ms")
+    print(f"模拟主循环最大处理间隔: {main_loop.max_gap * 1000:.1f} ms（空闲间隔 {TICK * 1000:.0f} ms）")
+    print(f"服务器统计: {server.stats}")
+
+
+if __name__ == '__main__':
+    main()
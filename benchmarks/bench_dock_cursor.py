@@ -0,0 +1,169 @@
+"""
+停靠光标检测基准：固定 100 ms 轮询 vs 自适应轮询 vs 推送式事件源
+
+窗口停靠在右侧并隐藏，用模拟光标测量两项指标：
+- 光标停在屏幕中央时每分钟的唤醒次数；
+- 光标以给定速度移向右边缘时，从进入触发条到收到显示通知的延迟。
+推送式事件源用 FakeCursorSource 按鼠标回报率（默认 125 Hz）推送位置，
+对应 Windows 上的低级鼠标钩子。
+
+用法: python benchmarks/bench_dock_cursor.py [--idle 秒] [--trials N] [--speed 像素/秒]
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cursor_source import FakeCursorSource, PollingCursorSource  # noqa: E402
+from docking import DockHitTester, Rect, compute_dock_zones  # noqa: E402
+
+SCREEN = Rect(0, 0, 1920, 1080)
+WINDOW = Rect.from_size(1920 - 180, 400, 180, 280)
+OFFSET = 5
+
+
+class LegacyPollingSource:
+    """旧实现：每 100 ms 读取一次光标位置"""
+
+    def __init__(self, get_position, interval=0.1):
+        self.get_position = get_position
+        self.interval = interval
+        self.wakeups = 0
+        self._stop_event = threading.Event()
+
+    def start(self, callback, distance=None):
+        self._stop_event.clear()
+        threading.Thread(target=self._loop, args=(callback,), daemon=True).start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _loop(self, callback):
+        while not self._stop_event.is_set():
+            self.wakeups += 1
+            callback(*self.get_position())
+            time.sleep(self.interval)
+
+
+class PushSource:
+    """按固定回报率推送位置的事件源；光标静止时不推送"""
+
+    def __init__(self, get_position, rate=125):
+        self.fake = FakeCursorSource()
+        self.get_position = get_position
+        self.period = 1 / rate
+        self._stop_event = threading.Event()
+
+    @property
+    def wakeups(self):
+        return self.fake.wakeups
+
+    def start(self, callback, distance=None):
+        self.fake.start(callback)
+        self._stop_event.clear()
+        threading.Thread(target=self._loop, daemon=True).start()
+
+    def stop(self):
+        self._stop_event.set()
+        self.fake.stop()
+
+    def _loop(self):
+        # 与鼠标钩子一样，只在光标移动时推送
+        last = self.get_position()
+        while not self._stop_event.wait(self.period):
+            position = self.get_position()
+            if position != last:
+                last = position
+                self.fake.move(*position)
+
+
+class CursorPath:
+    """模拟光标：start 时刻之前停在 (x, y)，之后以 speed 像素/秒向右移动"""
+
+    def __init__(self, x, y, speed=0, start=None):
+        self.x = x
+        self.y = y
+        self.speed = speed
+        self.start = time.perf_counter() if start is None else start
+
+    def position(self):
+        elapsed = max(0.0, time.perf_counter() - self.start)
+        return min(SCREEN.right - 1, int(self.x + self.speed * elapsed)), self.y
+
+    def time_at(self, x):
+        """光标到达横坐标 x 的时刻"""
+        return self.start + (x - self.x) / self.speed
+
+
+def make_tester(on_reveal):
+    tester = DockHitTester(on_reveal, lambda: None, lambda: None)
+    tester.set_zones(compute_dock_zones('right', WINDOW, SCREEN, OFFSET))
+    tester.set_hidden(True)
+    return tester
+
+
+def measure_idle(factory, seconds):
+    """光标静止在屏幕中央，返回每分钟唤醒次数"""
+    path = CursorPath(SCREEN.width // 2, SCREEN.height // 2)
+    source = factory(path.position)
+    tester = make_tester(lambda: None)
+    source.start(tester.on_cursor, tester.distance)
+    time.sleep(seconds)
+    source.stop()
+    return source.wakeups / seconds * 60
+
+
+def measure_reveal(factory, trials, speed):
+    """光标从屏幕中央移向右边缘，返回每次从进入触发条到收到通知的延迟（毫秒）"""
+    latencies = []
+    for trial in range(trials):
+        revealed = threading.Event()
+        stamp = []
+
+        def on_reveal():
+            stamp.append(time.perf_counter())
+            revealed.set()
+
+        # 每次起点略有不同，避免与轮询相位同步
+        path = CursorPath(SCREEN.width // 2 + trial * 37, WINDOW.top + 50, speed,
+                          start=time.perf_counter() + 0.2)
+        source = factory(path.position)
+        tester = make_tester(on_reveal)
+        source.start(tester.on_cursor, tester.distance)
+        enter_at = path.time_at(SCREEN.right - OFFSET)
+        revealed.wait(enter_at - time.perf_counter() + 2)
+        source.stop()
+        if stamp:
+            latencies.append(max(0.0, (stamp[0] - enter_at) * 1000))
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--idle', type=float, default=3.0, help='空闲测量时长（秒）')
+    parser.add_argument('--trials', type=int, default=8)
+    parser.add_argument('--speed', type=float, default=3000, help='光标移动速度（像素/秒）')
+    args = parser.parse_args()
+
+    sources = [
+        ('固定 100 ms 轮询（旧）', LegacyPollingSource),
+        ('自适应轮询', PollingCursorSource),
+        ('推送式（鼠标钩子）', PushSource),
+    ]
+    print(f"{'事件源':<22}{'空闲唤醒/分钟':>14}{'显示延迟中位数':>16}{'最大':>10}")
+    for label, factory in sources:
+        wakeups = measure_idle(factory, args.idle)
+        latencies = measure_reveal(factory, args.trials, args.speed)
+        if latencies:
+            print(f"{label:<22}{wakeups:>14.0f}{statistics.median(latencies):>14.1f}ms"
+                  f"{max(latencies):>8.1f}ms")
+        else:
+            print(f"{label:<22}{wakeups:>14.0f}{'未触发':>16}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+切换历史的写入与统计基准
+
+在临时目录中按时间顺序写入若干个月的切换记录（每天若干次，来源轮流为
+manual / schedule / external），段大小设得较小以产生多次轮换。测量追加
+速度，以及全量统计与只查最近几天的统计耗时和打开的段数。检查：段数不超过
+上限；日期范围查询跳过了旧段；统计的切换次数与写入一致；统计的内存峰值
+不随记录数增长（逐行读取，不把日志读入内存）。
+
+用法: python benchmarks/bench_history.py [--days N] [--per-day N] [--segment-kb N]
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history import HistoryLog, query  # noqa: E402
+
+SOURCES = ('manual', 'schedule', 'external')
+
+
+def write_records(log, start, days, per_day):
+    """从 start 起每天写入 per_day 条记录，返回 (条数, 耗时)"""
+    step = 86400 / per_day
+    theme = 'light'
+    count = 0
+    started = time.perf_counter()
+    for day in range(days):
+        for index in range(per_day):
+            new = 'dark' if theme == 'light' else 'light'
+            source = SOURCES[count % len(SOURCES)]
+            log.record(source, theme, new, None if source == 'external' else 0.012,
+                       restarted=count % 50 == 0, when=start + day * 86400 + index * step + 1)
+            theme = new
+            count += 1
+    return count, time.perf_counter() - started
+
+
+def measure_query(log, *args, **kwargs):
+    tracemalloc.start()
+    started = time.perf_counter()
+    rows = query(log, *args, **kwargs)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rows, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--days', type=int, default=120, help='写入的天数')
+    parser.add_argument('--per-day', type=int, default=24, help='每天的切换次数')
+    parser.add_argument('--segment-kb', type=int, default=16, help='每段的大小上限（KB）')
+    parser.add_argument('--segments', type=int, default=1000, help='保留的段数上限')
+    args = parser.parse_args()
+    problems = []
+
+    directory = tempfile.mkdtemp(prefix='theme-history-')
+    try:
+        log = HistoryLog(directory, max_bytes=args.segment_kb * 1024, max_segments=args.segments)
+        start = datetime.datetime(2025, 1, 1).timestamp()
+        count, elapsed = write_records(log, start, args.days, args.per_day)
+        now = start + args.days * 86400
+        segments = len(log.load_index()['segments'])
+        print(f"写入 {count} 条：{elapsed * 1000:.1f} ms（{count / elapsed:.0f} 条/秒），"
+              f"轮换 {log.stats['rotations']} 次，保留 {segments} 段")
+        if segments > args.segments:
+            problems.append('段数超过上限')
+
+        rows, full_time, full_peak = measure_query(log, 'day', now=now)
+        switches = sum(row['switches'] for row in rows)
+        full_segments = log.last_query_segments
+        print(f"全量按日统计：{full_time * 1000:.1f} ms，打开 {full_segments} 段，{len(rows)} 天，"
+              f"内存峰值 {full_peak / 1024:.1f} KB")
+        if not log.stats['pruned'] and switches != count:
+            problems.append(f'统计的切换次数 {switches} 与写入的 {count} 不一致')
+
+        since = datetime.date.fromtimestamp(now - 7 * 86400).isoformat()
+        rows, recent_time, _ = measure_query(log, 'day', since=since, now=now)
+        print(f"最近 7 天（--since {since}）：{recent_time * 1000:.1f} ms，打开 {log.last_query_segments} 段")
+        # 段数太少时（没有轮换）无段可跳
+        if full_segments > 2 and log.last_query_segments >= full_segments:
+            problems.append('日期范围查询没有跳过旧段')
+        if sum(row['switches'] for row in rows) != 7 * args.per_day:
+            problems.append('最近 7 天的切换次数不对')
+
+        weeks, week_time, _ = measure_query(log, 'week', now=now)
+        print(f"全量按周统计：{week_time * 1000:.1f} ms，{len(weeks)} 周")
+        if sum(row['switches'] for row in weeks) != switches:
+            problems.append('按周与按日统计的切换次数不一致')
+
+        # 同样的天数、四倍的记录：统计结果的条数不变，内存峰值也应基本不变
+        dense = HistoryLog(os.path.join(directory, 'dense'), max_bytes=args.segment_kb * 1024,
+                           max_segments=args.segments)
+        write_records(dense, start, args.days, args.per_day * 4)
+        _, dense_time, dense_peak = measure_query(dense, 'day', now=now)
+        print(f"每天 {args.per_day * 4} 次时全量按日统计：{dense_time * 1000:.1f} ms，"
+              f"内存峰值 {dense_peak / 1024:.1f} KB")
+        if dense_peak > full_peak * 1.5:
+            problems.append('统计的内存占用随记录数增长')
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    print(f"检查: {'；'.join(problems) or '通过'}")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
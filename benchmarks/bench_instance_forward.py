@@ -0,0 +1,80 @@
+"""
+单实例命令转发基准
+
+在本进程中启动 InstanceServer 模拟正在运行的实例，测量：
+- send_command 单次往返的耗时；
+- 再次启动 theme_cli.py --toggle 时转发给实例并退出的端到端耗时，
+  与空解释器（python -c pass）和没有实例时直接切换的耗时对比。
+使用独立的实例名和临时状态文件，不影响正在运行的程序和系统主题。
+
+用法: python benchmarks/bench_instance_forward.py [--rounds N]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from single_instance import InstanceServer, send_command  # noqa: E402
+
+CLI_ENTRY = os.path.join(ROOT, 'theme_cli.py')
+
+
+def measure(command, rounds, env, cwd):
+    """执行 rounds 次命令，返回每次耗时（毫秒）"""
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        subprocess.run(command, env=env, cwd=cwd, stdout=subprocess.DEVNULL, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summary(samples):
+    samples = sorted(samples)
+    return f"中位数 {statistics.median(samples):7.2f} ms   P95 {samples[int(len(samples) * 0.95) - 1]:7.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ.update(THEME_SWITCHER_INSTANCE=f'bench-{os.getpid()}', XDG_RUNTIME_DIR=workdir)
+        env = dict(os.environ, THEME_SWITCHER_STATE_FILE=os.path.join(workdir, 'state.json'),
+                   XDG_CONFIG_HOME=workdir, APPDATA=workdir)
+        toggle = [sys.executable, CLI_ENTRY, '--toggle', '--no-restart']
+        baseline = [sys.executable, '-c', 'pass']
+        measure(baseline, 1, env, workdir)
+        direct = measure(toggle, args.rounds, env, workdir)
+
+        received = []
+        server = InstanceServer(lambda message: received.append(message) or {'ok': True})
+        if not server.start():
+            print("无法启动监听，跳过基准")
+            return
+        try:
+            round_trips = []
+            for _ in range(args.rounds * 10):
+                start = time.perf_counter()
+                send_command({'command': 'ping'})
+                round_trips.append((time.perf_counter() - start) * 1000)
+            forwarded = measure(toggle, args.rounds, env, workdir)
+        finally:
+            server.stop()
+
+        print(f"{'send_command 往返':<28}{summary(round_trips)}")
+        print(f"{'python -c pass（对照）':<28}{summary(measure(baseline, args.rounds, env, workdir))}")
+        print(f"{'--toggle 无实例，直接切换':<28}{summary(direct)}")
+        print(f"{'--toggle 转发给实例':<28}{summary(forwarded)}")
+        print(f"实例收到转发命令 {len(received)} 条")
+
+
+if __name__ == '__main__':
+    main()
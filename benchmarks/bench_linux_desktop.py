@@ -0,0 +1,196 @@
+"""
+Linux 桌面后端（color-scheme）的切换与订阅基准
+
+用本地替身 store 模拟 dconf / gsettings：每次调用有固定延迟（相当于启动一次
+命令进程）。比较批量写入（dconf load，一次写入 color-scheme 与 gtk-theme）与
+逐键写入（gsettings set）的单次切换耗时和调用次数，并测量外部修改后状态缓存
+收到通知的延迟。检查：每次切换只写一次，重复设置同一主题不写入，订阅在
+空闲时不产生任何调用（不轮询），外部修改都被通知到。
+
+计时之前先对本地替身 store（MemoryDesktopStore）和替换了命令执行函数的
+dconf / gsettings store 做功能检查：读写 color-scheme、多个键一次写入、
+订阅收到外部修改且只关心 color-scheme、停止订阅后不再通知；dconf 一次
+load 写入多个键，gsettings 逐键写入。
+
+用法: python benchmarks/bench_linux_desktop.py [--switches N] [--latency 毫秒]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from linux_desktop import (COLOR_SCHEME, GTK_THEME, ColorSchemeThemeBackend, DconfStore,  # noqa: E402
+                           DesktopChangeSource, GSettingsStore, MemoryDesktopStore)
+from theme_controller import ThemeController  # noqa: E402
+from theme_state import ThemeStateCache  # noqa: E402
+
+
+class LatencyStore(MemoryDesktopStore):
+    """每次 read / write 等待 latency 秒；per_key 为 True 时像 gsettings 一样逐键写入"""
+
+    def __init__(self, latency, per_key=False):
+        super().__init__({'gtk-theme': 'Adwaita'})
+        self.latency = latency
+        self.per_key = per_key
+
+    def read(self, keys):
+        time.sleep(self.latency)
+        return super().read(keys)
+
+    def write(self, values):
+        if not self.per_key:
+            time.sleep(self.latency)
+            return super().write(values)
+        for key, value in values.items():
+            time.sleep(self.latency)
+            super().write({key: value})
+
+    def external_write(self, values):
+        # 外部程序的修改由监听线程异步送达，与 dconf watch 一致
+        threading.Thread(target=super().external_write, args=(values,), daemon=True).start()
+
+
+class FakeCompleted:
+    def __init__(self, stdout=''):
+        self.returncode = 0
+        self.stdout = stdout
+        self.stderr = ''
+
+
+class FakeCommand:
+    """代替 subprocess.run，记录每次调用的参数和输入"""
+
+    def __init__(self, stdout=''):
+        self.stdout = stdout
+        self.calls = []
+
+    def __call__(self, args, input=None, **kwargs):
+        self.calls.append((args, input))
+        return FakeCompleted(self.stdout)
+
+
+def check_stand_in_store():
+    """对本地替身 store 做功能检查，返回发现的问题"""
+    problems = []
+    store = MemoryDesktopStore({GTK_THEME: 'Adwaita'})
+    backend = ColorSchemeThemeBackend(store, gtk_theme_exists=lambda name: True)
+    if backend.read_theme() != 'light':
+        problems.append('默认 color-scheme 没有读作浅色')
+    backend.write_theme('dark')
+    if store.values[COLOR_SCHEME] != 'prefer-dark' or backend.read_theme() != 'dark':
+        problems.append('设置暗色后 color-scheme 不是 prefer-dark')
+    if store.writes != 1 or store.values[GTK_THEME] != 'Adwaita-dark':
+        problems.append('color-scheme 与 gtk-theme 没有在一次写入中修改')
+    backend.write_theme('light')
+    if store.values != {COLOR_SCHEME: 'default', GTK_THEME: 'Adwaita'} or store.writes != 2:
+        problems.append('设置浅色后键值不对')
+
+    # 没有对应的 -dark 变体时只修改 color-scheme
+    store = MemoryDesktopStore({GTK_THEME: 'Custom'})
+    ColorSchemeThemeBackend(store, gtk_theme_exists=lambda name: False).write_theme('dark')
+    if store.values != {COLOR_SCHEME: 'prefer-dark', GTK_THEME: 'Custom'}:
+        problems.append('没有变体时修改了 gtk-theme')
+
+    store = MemoryDesktopStore()
+    backend = ColorSchemeThemeBackend(store, gtk_theme_exists=lambda name: True)
+    state = ThemeStateCache(backend, DesktopChangeSource(store))
+    state.get()
+    changes = []
+    state.subscribe(lambda theme, origin: changes.append((theme, origin)))
+    state.start()
+    store.external_write({COLOR_SCHEME: 'prefer-dark'})
+    if changes != [('dark', 'external')] or state.get() != 'dark':
+        problems.append('订阅没有收到外部修改')
+    store.external_write({GTK_THEME: 'Yaru'})
+    if len(changes) != 1:
+        problems.append('修改其他键时也通知了')
+    state.stop()
+    store.external_write({COLOR_SCHEME: 'default'})
+    if len(changes) != 1 or store.watchers:
+        problems.append('停止订阅后仍收到通知')
+
+    run = FakeCommand()
+    DconfStore('dconf', run=run).write({COLOR_SCHEME: 'prefer-dark', GTK_THEME: 'Adwaita-dark'})
+    if len(run.calls) != 1 or run.calls[0][0][1] != 'load' or \
+            "color-scheme='prefer-dark'" not in run.calls[0][1] or "gtk-theme='Adwaita-dark'" not in run.calls[0][1]:
+        problems.append('dconf 没有一次 load 写入两个键')
+    run = FakeCommand("'prefer-dark'\n")
+    store = GSettingsStore('gsettings', run=run)
+    if store.read((COLOR_SCHEME,)) != {COLOR_SCHEME: 'prefer-dark'}:
+        problems.append('gsettings 读取的值不对')
+    store.write({COLOR_SCHEME: 'default', GTK_THEME: 'Adwaita'})
+    if [args[1] for args, _ in run.calls[1:]] != ['set', 'set']:
+        problems.append('gsettings 没有逐键写入')
+    return problems
+
+
+def measure_switches(store, switches):
+    backend = ColorSchemeThemeBackend(store, gtk_theme_exists=lambda name: True)
+    controller = ThemeController(backend)
+    controller.get_theme()
+    calls, writes = store.calls, store.writes
+    started = time.perf_counter()
+    for index in range(switches):
+        controller.state.refresh()
+        controller.set_theme('dark' if index % 2 == 0 else 'light')
+    elapsed = time.perf_counter() - started
+    return elapsed / switches, (store.calls - calls) / switches, (store.writes - writes) / switches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--switches', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=3.0, help='每次命令调用的延迟（毫秒）')
+    parser.add_argument('--changes', type=int, default=20, help='模拟的外部修改次数')
+    args = parser.parse_args()
+    latency = args.latency / 1000
+    problems = check_stand_in_store()
+    print(f"本地替身 store 功能检查: {'；'.join(problems) or '通过'}")
+
+    print(f"每次命令调用延迟 {args.latency:g} ms，切换 {args.switches} 次")
+    for label, per_key in (('批量写入（dconf load）', False), ('逐键写入（gsettings set）', True)):
+        per_switch, calls, writes = measure_switches(LatencyStore(latency, per_key), args.switches)
+        print(f"{label:<24}{per_switch * 1000:8.2f} ms/次  调用 {calls:.1f} 次/次  写入 {writes:.1f} 次/次")
+        if not per_key and writes != 1:
+            problems.append('批量写入时每次切换不止写一次')
+
+    store = LatencyStore(latency)
+    backend = ColorSchemeThemeBackend(store, gtk_theme_exists=lambda name: True)
+    backend.write_theme('dark')
+    writes = store.writes
+    backend.write_theme('dark')
+    if store.writes != writes:
+        problems.append('重复设置同一主题时写入了')
+
+    state = ThemeStateCache(backend, DesktopChangeSource(store))
+    state.get()
+    notified = threading.Semaphore(0)
+    state.subscribe(lambda theme, origin: notified.release())
+    state.start()
+    idle_calls = store.calls
+    time.sleep(0.2)
+    if store.calls != idle_calls:
+        problems.append('空闲时订阅产生了调用')
+    delays = []
+    for index in range(args.changes):
+        scheme = 'default' if index % 2 == 0 else 'prefer-dark'
+        started = time.perf_counter()
+        store.external_write({COLOR_SCHEME: scheme})
+        if not notified.acquire(timeout=1.0):
+            problems.append(f'第 {index + 1} 次外部修改没有收到通知')
+            break
+        delays.append(time.perf_counter() - started)
+    state.stop()
+    if delays:
+        delays.sort()
+        print(f"外部修改到收到通知: 中位数 {delays[len(delays) // 2] * 1000:.2f} ms，"
+              f"最大 {delays[-1] * 1000:.2f} ms（含一次重新读取）")
+    print(f"检查: {'；'.join(problems) or '通过'}")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+主题传播插件的并发与超时基准
+
+在临时目录中生成若干 JSON / 文本配置文件及对应插件，另加模拟慢速 I/O 的插件
+（每次写入前等待固定延迟）和一个永不结束的插件，比较并发运行的总耗时与
+各插件耗时之和（即逐个运行的耗时），并检查：切换后所有文件都被修改；
+再次应用同一主题时不写任何文件（修改时间不变）；不留下临时文件；
+挂起的插件按超时返回、不影响其他插件，仍在运行时下一次切换跳过它；
+修改同一 JSONC 文件（含注释）的多个插件依次运行，改动都保留、注释不丢失，
+同名键只改完整路径上的那个。
+
+用法: python benchmarks/bench_propagation.py [--files N] [--delay 毫秒] [--timeout 秒]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from propagation import (BUSY, CHANGED, STATUS_NAMES, TIMEOUT, UNCHANGED, JsonSettingPlugin,  # noqa: E402
+                         PropagationPlugin, PropagationRunner, TextReplacePlugin)
+
+THEMES = {'dark': 'Dark+', 'light': 'Light+'}
+
+
+class SlowPlugin(JsonSettingPlugin):
+    """写入前等待 delay 秒，模拟网络盘或慢速磁盘"""
+
+    def __init__(self, name, path, delay):
+        super().__init__(name, path, 'workbench.colorTheme', THEMES)
+        self.delay = delay
+
+    def apply(self, theme):
+        time.sleep(self.delay)
+        return super().apply(theme)
+
+
+class HungPlugin(PropagationPlugin):
+    """一直阻塞，直到 release 被设置"""
+
+    def __init__(self, name, timeout):
+        super().__init__(name, timeout)
+        self.release = threading.Event()
+
+    def apply(self, theme):
+        self.release.wait()
+        return False
+
+
+def create_plugins(directory, files, delay):
+    plugins = []
+    for index in range(files):
+        if index % 2:
+            path = os.path.join(directory, f'app{index}.conf')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(f"# app {index}\ntheme = light\nfont = 12\n")
+            plugins.append(TextReplacePlugin(f'text{index}', path, r'^theme\s*=.*$',
+                                             {'dark': 'theme = dark', 'light': 'theme = light'}))
+        else:
+            path = os.path.join(directory, f'settings{index}.json')
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'editor.fontSize': 14, 'workbench.colorTheme': THEMES['light']}, f, indent=4)
+            plugins.append(SlowPlugin(f'json{index}', path, delay))
+    return plugins
+
+
+def snapshot(plugins):
+    return {plugin.path: os.stat(plugin.path).st_mtime_ns for plugin in plugins}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=16, help='配置文件数')
+    parser.add_argument('--delay', type=float, default=50.0, help='慢速插件每次写入前的延迟（毫秒）')
+    parser.add_argument('--timeout', type=float, default=0.5, help='挂起插件的超时（秒）')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='theme-propagation-')
+    hung = HungPlugin('hung', args.timeout)
+    try:
+        plugins = create_plugins(directory, args.files, args.delay / 1000)
+        print(f"插件 {len(plugins)} 个，慢速插件延迟 {args.delay:g} ms")
+        problems = []
+
+        runner = PropagationRunner(plugins)
+        report = runner.run('dark')
+        serial = sum(result.duration for result in report.results)
+        print(f"{'插件':<12}{'状态':<10}{'耗时':>10}")
+        for line in report.lines():
+            print(line)
+        print(f"并发总耗时 {report.elapsed * 1000:.1f} ms，各插件耗时之和 {serial * 1000:.1f} ms"
+              f"（加速 {serial / report.elapsed:.1f} 倍）")
+        if report.count(CHANGED) != len(plugins):
+            problems.append('不是所有文件都被修改')
+
+        before = snapshot(plugins)
+        report = runner.run('dark')
+        print(f"再次应用同一主题：{report.count(UNCHANGED)} 个无需修改，用时 {report.elapsed * 1000:.1f} ms")
+        if report.count(UNCHANGED) != len(plugins) or snapshot(plugins) != before:
+            problems.append('再次应用同一主题时写入了文件')
+
+        runner = PropagationRunner(plugins + [hung])
+        report = runner.run('light')
+        print(f"加入挂起插件（超时 {args.timeout:g} 秒）：用时 {report.elapsed * 1000:.1f} ms，"
+              f"其余插件修改 {report.count(CHANGED)} 个")
+        if report.results[-1].status != TIMEOUT:
+            problems.append('挂起的插件没有超时')
+        if report.count(CHANGED) != len(plugins):
+            problems.append('挂起的插件影响了其他插件')
+        if report.elapsed > args.timeout + 0.25:
+            problems.append('运行时间超过超时')
+        report = runner.run('dark')
+        print(f"挂起插件仍在运行时再次切换：用时 {report.elapsed * 1000:.1f} ms，该插件{STATUS_NAMES[report.results[-1].status]}")
+        if report.results[-1].status != BUSY:
+            problems.append('仍在运行的插件没有被跳过')
+        if report.elapsed > args.timeout:
+            problems.append('跳过的插件拖慢了运行')
+
+        problems += check_shared_file(directory)
+
+        leftovers = [name for name in os.listdir(directory) if name.endswith('.tmp')]
+        if leftovers:
+            problems.append(f'留下临时文件: {", ".join(leftovers)}')
+        print(f"检查: {'；'.join(problems) or '通过'}")
+        return 1 if problems else 0
+    finally:
+        hung.release.set()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def check_shared_file(directory):
+    """多个慢速插件同时修改同一个含注释的 settings.json"""
+    path = os.path.join(directory, 'shared.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{\n    // 注释\n    "nested": {"editor.theme": "none"},\n'
+                + ''.join(f'    "editor.theme{index}": "light",\n' for index in range(4))
+                + '    "editor.theme": "light",\n}\n')
+    plugins = [SlowPlugin(f'shared{index}', path, 0.01) for index in range(4)]
+    for index, plugin in enumerate(plugins):
+        plugin.keys = [f'editor.theme{index}']
+    plugins.append(SlowPlugin('shared', path, 0.01))
+    plugins[-1].keys = ['editor.theme']
+    report = PropagationRunner(plugins).run('dark')
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    print(f"同一文件的 {len(plugins)} 个插件：{report.count(CHANGED)} 个已修改，用时 {report.elapsed * 1000:.1f} ms")
+    problems = []
+    if report.count(CHANGED) != len(plugins) or text.count(THEMES['dark']) != len(plugins):
+        problems.append('修改同一文件的插件互相覆盖')
+    if '// 注释' not in text or '"editor.theme": "none"' not in text:
+        problems.append('修改含注释的文件时丢失注释或改错了同名键')
+    return problems
+
+
+if __name__ == '__main__':
+    sys.exit(main())
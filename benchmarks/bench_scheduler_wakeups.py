@@ -0,0 +1,93 @@
+"""
+调度器唤醒次数基准：旧的阶梯式调度器 vs 单计时器调度器
+
+在虚拟时间上回放若干天，统计每天的计时器唤醒次数，并测量单次唤醒时
+计算下一个事件的耗时（旧版每次重新 split(':') 解析并构造 datetime）。
+
+用法: python benchmarks/bench_scheduler_wakeups.py [--days N] [--dark HH:MM] [--light HH:MM]
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schedule_simulator import simulate  # noqa: E402
+from scheduler import DailySchedule  # noqa: E402
+
+
+def legacy_next_event(now, dark_time, light_time):
+    """v1.6.3 schedule_next_event 中的下一事件计算（逐次解析时间字符串）"""
+    dark_time_obj = now.replace(hour=int(dark_time.split(':')[0]), minute=int(dark_time.split(':')[1]),
+                                second=0, microsecond=0)
+    light_time_obj = now.replace(hour=int(light_time.split(':')[0]), minute=int(light_time.split(':')[1]),
+                                 second=0, microsecond=0)
+    events_today = [t for t in (dark_time_obj, light_time_obj) if t > now]
+    if events_today:
+        return min(events_today)
+    return min(dark_time_obj + timedelta(days=1), light_time_obj + timedelta(days=1))
+
+
+def legacy_check_interval(delay_seconds):
+    """v1.6.3 的渐进式逼近阶梯；返回 None 表示立即执行任务"""
+    if delay_seconds <= 1:
+        return None
+    elif delay_seconds <= 10:
+        return 1
+    elif delay_seconds <= 60:
+        return 10
+    elif delay_seconds <= 600:
+        return 60
+    elif delay_seconds <= 3600:
+        return 600
+    return min(delay_seconds / 2, 3600)
+
+
+def simulate_legacy(start, days, dark_time, light_time):
+    """返回 (唤醒次数, 执行次数)"""
+    now, end = start, start + timedelta(days=days)
+    wakeups = fired = 0
+    while now < end:
+        wakeups += 1
+        delay = (legacy_next_event(now, dark_time, light_time) - now).total_seconds()
+        interval = legacy_check_interval(delay)
+        if interval is None:
+            fired += 1
+            # 执行任务后 1 秒重新调度
+            interval = 1
+        now += timedelta(seconds=interval)
+    return wakeups, fired
+
+
+def simulate_single_timer(start, days, schedule):
+    """用虚拟时钟驱动真实的 ThemeScheduler，返回 (唤醒次数, 执行次数)"""
+    result = simulate(schedule, start, start + timedelta(days=days))
+    return result.wakeups, len(result.events)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--dark', default='21:04')
+    parser.add_argument('--light', default='06:00')
+    args = parser.parse_args()
+
+    start = datetime(2024, 1, 1, 12, 0, 0)
+    schedule = DailySchedule.from_times(args.dark, args.light)
+
+    legacy_wakeups, legacy_fired = simulate_legacy(start, args.days, args.dark, args.light)
+    new_wakeups, new_fired = simulate_single_timer(start, args.days, schedule)
+    print(f"回放 {args.days} 天，暗色 {args.dark} / 浅色 {args.light}")
+    print(f"阶梯式调度器: 每天唤醒 {legacy_wakeups / args.days:7.1f} 次（执行 {legacy_fired} 次）")
+    print(f"单计时器调度器: 每天唤醒 {new_wakeups / args.days:7.1f} 次（执行 {new_fired} 次）")
+
+    number = 20000
+    legacy_cost = timeit.timeit(lambda: legacy_next_event(start, args.dark, args.light), number=number)
+    new_cost = timeit.timeit(lambda: schedule.next_event(start), number=number)
+    print(f"单次计算下一事件: 旧 {legacy_cost / number * 1e6:.2f} µs / 新 {new_cost / number * 1e6:.2f} µs")
+
+
+if __name__ == '__main__':
+    main()
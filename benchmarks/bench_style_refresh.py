@@ -0,0 +1,81 @@
+"""
+界面着色基准：每次全量 configure vs 配色登记表差量推送
+
+用记录调用次数的假控件模拟主界面、定时模块、蒙版和时间选择器的 28 个
+控件，统计主题未变的刷新与主题切换时的 configure 调用次数、推送的选项数
+和每次刷新耗时。不需要图形环境。
+
+用法: python benchmarks/bench_style_refresh.py [--refreshes N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ui_style import StyleRegistry  # noqa: E402
+
+# 与界面中的登记一致：角色 -> 控件数量
+WIDGET_ROLES = [
+    ('window', 2), ('frame', 8), ('label', 6), ('icon', 2), ('button', 3),
+    ('dialog_button', 2), ('close_button', 1), ('check', 1), ('indicator', 1),
+    ('mask', 1), ('mask_label', 1),
+]
+
+
+class FakeWidget:
+    """记录 configure 调用的假控件；每次调用模拟一次 Tcl 往返"""
+
+    calls = 0
+    options = 0
+
+    def configure(self, **options):
+        FakeWidget.calls += 1
+        FakeWidget.options += len(options)
+        # Tk 的 configure 会把每个选项转成 Tcl 命令参数
+        " ".join(f"-{key} {value}" for key, value in options.items())
+
+
+def legacy_refresh(widgets, registry, theme):
+    """旧实现：每次刷新都对每个控件推送全部颜色选项"""
+    styles = registry.styles[registry.resolve(theme)]
+    for widget, role in widgets:
+        widget.configure(**styles[role])
+
+
+def measure(refresh, refreshes, themes):
+    FakeWidget.calls = FakeWidget.options = 0
+    start = time.perf_counter()
+    for index in range(refreshes):
+        refresh(themes[index % len(themes)])
+    elapsed = (time.perf_counter() - start) * 1e6 / refreshes
+    return FakeWidget.calls / refreshes, FakeWidget.options / refreshes, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--refreshes', type=int, default=20000)
+    args = parser.parse_args()
+
+    registry = StyleRegistry()
+    widgets = [(FakeWidget(), role) for role, count in WIDGET_ROLES for _ in range(count)]
+    for widget, role in widgets:
+        registry.register(widget, role)
+    registry.apply('light')
+
+    cases = [
+        ('主题未变', ['light']),
+        ('每次切换主题', ['dark', 'light']),
+    ]
+    print(f"控件数: {len(widgets)}")
+    print(f"{'场景':<12}{'实现':<10}{'configure/次':>14}{'选项/次':>10}{'耗时/次':>12}")
+    for label, themes in cases:
+        for name, refresh in [('全量（旧）', lambda theme: legacy_refresh(widgets, registry, theme)),
+                              ('差量', registry.apply)]:
+            calls, options, micros = measure(refresh, args.refreshes, themes)
+            print(f"{label:<12}{name:<10}{calls:>14.1f}{options:>10.1f}{micros:>10.2f}µs")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+主题切换延迟基准：旧脚本路径 vs 进程内后端
+
+Windows 上对比 toggle_theme.bat 与 WinRegThemeBackend（会真实切换主题，
+每轮切换偶数次以恢复原状态）；其他平台用等价的 sh 进程链模拟脚本路径，
+与 FileThemeBackend 对比。
+
+用法: python benchmarks/bench_theme_backend.py [--rounds N]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from theme_backend import (FileThemeBackend, ScriptThemeBackend,  # noqa: E402
+                           WinRegThemeBackend, winreg)
+
+# 与 toggle_theme.bat 相同的进程结构：一个 shell + 两次读取 + 两次写入
+POSIX_TOGGLE_SCRIPT = r"""
+state="$1"
+cat "$state" > /dev/null
+if cat "$state" | grep -q '"AppsUseLightTheme": 1'; then v=0; else v=1; fi
+printf '{"AppsUseLightTheme": %s, "SystemUsesLightTheme": %s}' $v $v | tee "$state.tmp" > /dev/null
+mv "$state.tmp" "$state"
+"""
+
+
+def measure(func, rounds):
+    """执行 rounds 次 func，返回每次耗时（毫秒）"""
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{label:<12} 中位数 {statistics.median(samples):9.3f} ms   "
+          f"p95 {p95:9.3f} ms   ({len(samples)} 次)")
+    return statistics.median(samples)
+
+
+def build_backends(workdir):
+    """返回 (脚本后端, 进程内后端)"""
+    if winreg is not None:
+        repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        in_process = WinRegThemeBackend()
+        script = ScriptThemeBackend([os.path.join(repo_root, 'toggle_theme.bat')], in_process,
+                                    creationflags=subprocess.CREATE_NO_WINDOW)
+        return script, in_process
+    state_file = os.path.join(workdir, 'theme_state.json')
+    in_process = FileThemeBackend(state_file)
+    in_process.write_theme('light')
+    script = ScriptThemeBackend(['sh', '-c', POSIX_TOGGLE_SCRIPT, 'toggle', state_file], in_process)
+    return script, in_process
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=40, help="每条路径的切换次数（取偶数）")
+    args = parser.parse_args()
+    rounds = args.rounds + args.rounds % 2
+
+    with tempfile.TemporaryDirectory() as workdir:
+        script, in_process = build_backends(workdir)
+        original = in_process.read_theme()
+        try:
+            print(f"平台后端: {in_process.name}，每条路径切换 {rounds} 次")
+            script_median = report('脚本路径', measure(script.toggle_theme, rounds))
+            backend_median = report('进程内路径', measure(in_process.toggle_theme, rounds))
+            if backend_median > 0:
+                print(f"加速比: {script_median / backend_median:.1f}x")
+        finally:
+            if original in ('light', 'dark'):
+                in_process.write_theme(original)
+
+
+if __name__ == '__main__':
+    main()
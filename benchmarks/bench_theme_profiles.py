@@ -0,0 +1,148 @@
+"""
+主题方案批量写入的延迟基准
+
+比较现有的两值切换（toggle_theme：读取后写入两个主题值）与方案批量写入
+（apply_profile）的单次耗时：只含主题的方案、含强调色/透明效果等的完整方案、
+已是目标值时的重复应用（只读取比较、不写入），以及注入失败后的回滚路径。
+方案按控制器的用法传入已知的当前主题。Windows 上使用
+HKCU\\Software\\ThemeSwitcherBench 下的临时键，结束后删除；其他系统使用
+MemoryThemeBackend。两种后端都检查只含主题的方案不慢于两值切换，
+以及回滚后所有值与写入前一致。
+
+用法: python benchmarks/bench_theme_profiles.py [--iterations N] [--memory]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from theme_backend import PERSONALIZE_KEY, MemoryThemeBackend, winreg  # noqa: E402
+from theme_profiles import ProfileError, ThemeProfile, apply_profile  # noqa: E402
+
+SCRATCH_KEY = r"Software\ThemeSwitcherBench"
+# 批量写入允许的误差（计时抖动）
+TOLERANCE = 1.10
+
+
+def create_backend(memory):
+    if memory or winreg is None:
+        return MemoryThemeBackend()
+    from theme_backend import WinRegThemeBackend
+    return WinRegThemeBackend(subkey=SCRATCH_KEY + '\\' + PERSONALIZE_KEY)
+
+
+def delete_tree(root, path):
+    with winreg.OpenKey(root, path) as key:
+        children = []
+        while True:
+            try:
+                children.append(winreg.EnumKey(key, len(children)))
+            except OSError:
+                break
+    for child in children:
+        delete_tree(root, path + '\\' + child)
+    winreg.DeleteKey(root, path)
+
+
+def measure(funcs, iterations, rounds=15):
+    """
+    各函数交替运行 rounds 轮，每轮 iterations 次，返回各自最快一轮的平均单次
+    耗时（微秒）；交替运行使机器负载的波动同样影响每一项
+    """
+    best = [None] * len(funcs)
+    for _ in range(rounds):
+        for position, func in enumerate(funcs):
+            started = time.perf_counter()
+            for index in range(iterations):
+                func(index)
+            elapsed = time.perf_counter() - started
+            best[position] = elapsed if best[position] is None else min(best[position], elapsed)
+    return [elapsed / iterations * 1e6 for elapsed in best]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=2000, help='每轮的次数')
+    parser.add_argument('--memory', action='store_true', help='在 Windows 上也使用内存后端')
+    args = parser.parse_args()
+
+    backend = create_backend(args.memory)
+    themes = ('dark', 'light')
+    theme_only = {theme: ThemeProfile(f'{theme}-only', theme) for theme in themes}
+    full = {theme: ThemeProfile(f'{theme}-full', theme, accent_color=(0x00, 0x78, 0xD4),
+                                color_prevalence=theme == 'dark', transparency=theme == 'light')
+            for theme in themes}
+    print(f"后端: {backend.name}，每项 {args.iterations} 次")
+    try:
+        # 第 i 次写入 themes[i % 2]，当前主题为另一个；参数预先算好，不计入耗时
+        only_args = [(backend, theme_only[theme], previous) for theme, previous in zip(themes, reversed(themes))]
+        full_args = [(backend, full[theme], previous) for theme, previous in zip(themes, reversed(themes))]
+        labels = ('两值切换 toggle_theme', '方案（仅主题）', '方案（完整）', '方案重复应用（无变化）')
+        timings = measure([
+            lambda i: backend.toggle_theme(),
+            lambda i: apply_profile(*only_args[i & 1]),
+            lambda i: apply_profile(*full_args[i & 1]),
+            lambda i: apply_profile(backend, full['dark'], 'dark'),
+        ], args.iterations)
+        for label, micros in zip(labels, timings):
+            print(f"{label:<24}{micros:10.1f} µs/次")
+
+        problems = []
+        if timings[1] > timings[0] * TOLERANCE:
+            problems.append('仅主题的方案慢于两值切换')
+        problems += check_rollback(backend, full)
+    finally:
+        if backend.name == 'winreg':
+            delete_tree(winreg.HKEY_CURRENT_USER, SCRATCH_KEY)
+    print(f"检查: {'；'.join(problems) or '通过'}")
+    return 1 if problems else 0
+
+
+def check_rollback(backend, profiles):
+    """从 light 方案出发，让 dark 方案的最后一个键写入后校验失败，确认所有键都恢复原值"""
+    apply_profile(backend, profiles['light'])
+    profile = profiles['dark']
+    before = read_all(backend, profile)
+    last_key = list(profile.registry_batch())[-1]
+    write_key = backend.write_key
+    pending = [True]
+
+    def failing_write_key(subkey, values, snapshot, known=None):
+        changes = write_key(subkey, values, snapshot, known)
+        if subkey == last_key and pending:
+            pending.pop()
+            raise OSError(f"写入后校验失败: {subkey}（注入）")
+        return changes
+
+    backend.write_key = failing_write_key
+    started = time.perf_counter()
+    try:
+        apply_profile(backend, profile)
+        return ['注入的失败没有被报告']
+    except ProfileError as e:
+        print(f"{'失败并回滚':<24}{(time.perf_counter() - started) * 1e6:10.1f} µs/次")
+        if e.rollback_error:
+            return [f'回滚失败: {e.rollback_error}']
+    finally:
+        del backend.write_key
+    if read_all(backend, profile) != before:
+        return ['回滚后的值与写入前不一致']
+    return []
+
+
+def read_all(backend, profile):
+    """方案涉及的所有值的当前值"""
+    if isinstance(backend, MemoryThemeBackend):
+        return {subkey: {name: backend.keys.get(subkey, {}).get(name) for name in batch}
+                for subkey, batch in profile.registry_batch().items()}
+    values = {}
+    for subkey, batch in profile.registry_batch().items():
+        with winreg.OpenKey(winreg.HKEY_CURRENT_USER, backend.user_prefix + subkey) as key:
+            values[subkey] = {name: backend._query(key, name) for name in batch}
+    return values
+
+
+if __name__ == '__main__':
+    sys.exit(main())
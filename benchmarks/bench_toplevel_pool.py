@@ -0,0 +1,144 @@
+"""
+临时窗口基准：每次新建/销毁 Toplevel vs 复用窗口池
+
+分别测量停靠指示条每次显示、时间选择器每次打开的耗时，并在多次
+隐藏/显示循环后统计 Tk 中的控件数量，确认复用方式下控件数保持不变。
+需要图形环境（Windows 桌面或 X11 显示）。
+
+用法: python benchmarks/bench_toplevel_pool.py [--cycles N]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tkinter as tk  # noqa: E402
+from tkinter import ttk  # noqa: E402
+
+from window_pool import ToplevelPool  # noqa: E402
+
+COLORS = ({'bg': '#2b2b2b', 'fg': '#ffffff'}, {'bg': '#f0f0f0', 'fg': '#000000'})
+HOUR_VALUES = tuple(f"{i:02d}" for i in range(24))
+MINUTE_VALUES = tuple(f"{i:02d}" for i in range(60))
+
+
+def build_indicator(window):
+    window.overrideredirect(True)
+    window.attributes('-topmost', True)
+
+
+def build_picker(window, hours=HOUR_VALUES, minutes=MINUTE_VALUES):
+    """与界面中的时间选择器相同的控件结构"""
+    frame = tk.Frame(window)
+    frame.pack(fill='both', expand=True, padx=20, pady=20)
+    title = tk.Label(frame, text="设置暗色模式时间")
+    title.pack()
+    time_frame = tk.Frame(frame)
+    time_frame.pack()
+    hour_var = tk.StringVar(master=window)
+    minute_var = tk.StringVar(master=window)
+    tk.Label(time_frame, text="小时:").grid(row=0, column=0)
+    ttk.Combobox(time_frame, textvariable=hour_var, values=hours, width=5,
+                 state="readonly").grid(row=0, column=1)
+    tk.Label(time_frame, text="分钟:").grid(row=0, column=2)
+    ttk.Combobox(time_frame, textvariable=minute_var, values=minutes, width=5,
+                 state="readonly").grid(row=0, column=3)
+    button_frame = tk.Frame(frame)
+    button_frame.pack()
+    tk.Button(button_frame, text="确认").pack(side='left')
+    tk.Button(button_frame, text="取消").pack(side='left')
+    return {'frame': frame, 'hour_var': hour_var, 'minute_var': minute_var}
+
+
+def count_widgets(widget):
+    return 1 + sum(count_widgets(child) for child in widget.winfo_children())
+
+
+def legacy_indicator(root, index):
+    window = tk.Toplevel(root)
+    build_indicator(window)
+    window.config(bg=COLORS[index % 2]['bg'])
+    window.geometry(f"5x280+{1915 - index % 3}+400")
+    root.update_idletasks()
+    window.destroy()
+
+
+def pooled_indicator(root, pool, index):
+    window, _ = pool.acquire('indicator')
+    window.config(bg=COLORS[index % 2]['bg'])
+    window.geometry(f"5x280+{1915 - index % 3}+400")
+    pool.show('indicator')
+    root.update_idletasks()
+    pool.release('indicator')
+
+
+def legacy_picker(root, index):
+    window = tk.Toplevel(root)
+    window.geometry("250x150+100+100")
+    # 旧实现每次打开都重新生成候选值列表
+    content = build_picker(window, [f"{i:02d}" for i in range(24)], [f"{i:02d}" for i in range(60)])
+    content['hour_var'].set(HOUR_VALUES[index % 24])
+    content['minute_var'].set(MINUTE_VALUES[index % 60])
+    root.update_idletasks()
+    window.destroy()
+
+
+def pooled_picker(root, pool, index):
+    window, content = pool.acquire('picker')
+    window.geometry("250x150+100+100")
+    content['frame'].config(bg=COLORS[index % 2]['bg'])
+    content['hour_var'].set(HOUR_VALUES[index % 24])
+    content['minute_var'].set(MINUTE_VALUES[index % 60])
+    pool.show('picker')
+    root.update_idletasks()
+    pool.release('picker')
+
+
+def measure(root, step, cycles):
+    """返回每次操作耗时（毫秒）列表和循环结束后的控件数"""
+    timings = []
+    for index in range(cycles):
+        start = time.perf_counter()
+        step(index)
+        timings.append((time.perf_counter() - start) * 1000)
+    root.update()
+    return timings, count_widgets(root)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cycles', type=int, default=2000, help='隐藏/显示循环次数')
+    args = parser.parse_args()
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"无法创建 Tk 窗口，跳过基准: {e}")
+        return
+    root.withdraw()
+    pool = ToplevelPool(root)
+    pool.register('indicator', build_indicator)
+    pool.register('picker', build_picker)
+
+    cases = [
+        ('停靠指示条 新建/销毁（旧）', lambda i: legacy_indicator(root, i)),
+        ('停靠指示条 窗口池', lambda i: pooled_indicator(root, pool, i)),
+        ('时间选择器 新建/销毁（旧）', lambda i: legacy_picker(root, i)),
+        ('时间选择器 窗口池', lambda i: pooled_picker(root, pool, i)),
+    ]
+    print(f"初始控件数: {count_widgets(root)}")
+    print(f"{'场景':<24}{'中位数':>10}{'P95':>10}{'循环后控件数':>14}")
+    for label, step in cases:
+        timings, widgets = measure(root, step, args.cycles)
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        print(f"{label:<24}{statistics.median(timings):>8.3f}ms{p95:>8.3f}ms{widgets:>14}")
+    print(f"窗口池: 创建 {pool.stats['created']} 次，复用 {pool.stats['reused']} 次")
+    root.destroy()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+运行跟踪开销基准
+
+比较同一操作在三种情况下的单次耗时：不包裹 span、跟踪关闭时包裹 span、
+跟踪开启时包裹 span；并以 MemoryThemeBackend.read_theme（已插桩）和
+count() 测量关闭/开启跟踪时热点路径的实际开销。
+
+用法: python benchmarks/bench_tracing_overhead.py [--iterations N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tracing  # noqa: E402
+from theme_backend import MemoryThemeBackend  # noqa: E402
+
+
+def work():
+    return None
+
+
+def bare():
+    work()
+
+
+def wrapped():
+    with tracing.span('bench.work', source='bench'):
+        work()
+
+
+def per_call(func, iterations):
+    """取 5 轮中最快一轮的平均单次耗时（微秒）"""
+    return min(timeit.repeat(func, number=iterations, repeat=5)) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200000)
+    args = parser.parse_args()
+    backend = MemoryThemeBackend()
+
+    def counter():
+        tracing.count('bench.events')
+
+    rows = [('不包裹 span', per_call(bare, args.iterations))]
+    tracing.TRACER.enabled = False
+    rows += [('span，跟踪关闭', per_call(wrapped, args.iterations)),
+             ('read_theme，跟踪关闭', per_call(backend.read_theme, args.iterations)),
+             ('count，跟踪关闭', per_call(counter, args.iterations))]
+    tracing.enable()
+    rows += [('span，跟踪开启', per_call(wrapped, args.iterations)),
+             ('read_theme，跟踪开启', per_call(backend.read_theme, args.iterations)),
+             ('count，跟踪开启', per_call(counter, args.iterations))]
+    tracing.TRACER.enabled = False
+
+    for label, micros in rows:
+        print(f"{label:<24}{micros:8.3f} µs/次")
+    summary = tracing.TRACER.summary()
+    print(f"环形缓冲区: 保留 {summary['buffered']} 条（容量 {tracing.TRACER.capacity}），丢弃 {summary['dropped']} 条")
+
+
+if __name__ == '__main__':
+    main()
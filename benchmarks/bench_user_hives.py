@@ -0,0 +1,58 @@
+"""
+批量设置所有用户主题的吞吐量基准
+
+用 FakeHiveSource 模拟数百个用户配置单元（每次注册表读写有固定延迟，
+离线配置单元另有挂载延迟），并注入挂载失败和拒绝访问，比较不同线程数下的
+总耗时与吞吐量，并检查：失败只影响注入的配置单元，其余全部处于目标主题，
+挂载与卸载次数一致，同时挂载数不超过线程数。
+
+用法: python benchmarks/bench_user_hives.py [--hives N] [--offline 比例] [--latency 毫秒]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from user_hives import USER_SID_PREFIX, FakeHiveSource, apply_to_hives  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--hives', type=int, default=400, help='配置单元总数')
+    parser.add_argument('--offline', type=float, default=0.25, help='离线配置单元所占比例')
+    parser.add_argument('--latency', type=float, default=2.0, help='每次注册表读写的延迟（毫秒）')
+    parser.add_argument('--mount-latency', type=float, default=15.0, help='挂载离线配置单元的延迟（毫秒）')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    offline = int(args.hives * args.offline)
+    loaded = args.hives - offline
+    # 每 40 个注入一个拒绝访问（选需要切换的，写入时才失败），每 25 个离线配置单元注入一个被占用
+    denied = {f"{USER_SID_PREFIX}1000-{index}" for index in range(1, loaded, 40)}
+    locked = {f"{USER_SID_PREFIX}2000-{index}" for index in range(0, offline, 25)}
+    print(f"配置单元 {args.hives} 个（离线 {offline} 个），读写延迟 {args.latency} ms，"
+          f"挂载延迟 {args.mount_latency} ms，注入失败 {len(denied) + len(locked)} 个")
+    print(f"{'线程数':>6}{'总耗时':>12}{'吞吐量':>14}{'失败':>6}{'最大同时挂载':>14}  检查")
+    for workers in args.workers:
+        source = FakeHiveSource(loaded, offline, args.latency / 1000, args.mount_latency / 1000,
+                                locked=locked, denied=denied)
+        report = apply_to_hives(source, 'dark', workers=workers)
+        failed = {result.hive.sid for result in report.failed}
+        wrong = [hive.sid for hive in source.hives
+                 if hive.sid not in failed and source.theme_of(hive.sid) != 'dark']
+        problems = []
+        if failed != denied | locked:
+            problems.append('失败的配置单元与注入的不一致')
+        if wrong:
+            problems.append(f'{len(wrong)} 个未切换')
+        if source.stats['mounts'] != source.stats['unmounts'] or source.mounted:
+            problems.append('挂载与卸载不匹配')
+        if source.max_mounted > workers:
+            problems.append('同时挂载数超过线程数')
+        print(f"{workers:>6}{report.elapsed * 1000:>10.0f}ms{args.hives / report.elapsed:>10.0f} 个/秒"
+              f"{len(failed):>6}{source.max_mounted:>14}  {'；'.join(problems) or '通过'}")
+
+
+if __name__ == '__main__':
+    main()
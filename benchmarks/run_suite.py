@@ -0,0 +1,391 @@
+"""
+基准套件：用假平台后端在任何系统上测量核心路径，并与基线对比
+
+注册表、光标、显示器和外部进程都换成假后端（MemoryThemeBackend、
+FakeCursorSource、FakeMonitorProvider、FakeBroadcaster 与下面的
+FakeProcessRunner），界面刷新默认使用记录调用的假控件，--tk 时改用真实的
+Tk 控件（无显示器时可在 Xvfb 下运行）。覆盖：
+
+    theme_read   读取主题（内存 / 文件后端、状态缓存）
+    toggle       切换延迟（广播生效、广播失败回退重启、已是目标主题）
+    scheduler    下一个事件计算（固定 / 规则 / 日出日落）、布置计时器、全年回放
+    dock         光标命中测试、显示器布局与热区计算
+    ui_refresh   界面着色刷新
+
+结果写入 JSON 文件；--compare 与保存的基线对比，耗时超过阈值或计数增加
+即标记为回归并以退出码 1 结束，可直接用于 CI。几微秒的耗时受机器负载影响
+较大：耗时须同时超过比例阈值和最小绝对差（--min-delta）才算变慢，变慢的
+项目再复测几轮取最快值，仍然变慢才记为回归。
+
+用法: python benchmarks/run_suite.py [--output FILE] [--compare BASELINE] [--threshold 0.3]
+                                     [--min-delta 2] [--only 名称 ...] [--repeat N] [--tk]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import timeit
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calendar_rules import RuleSchedule  # noqa: E402
+from cursor_source import FakeCursorSource  # noqa: E402
+from docking import DockHitTester, Rect, compute_dock_zones, docked_window_rect  # noqa: E402
+from monitors import FakeMonitorProvider  # noqa: E402
+from schedule_simulator import ZoneInfo, simulate  # noqa: E402
+from scheduler import DailySchedule, ThemeScheduler  # noqa: E402
+from solar import SolarSchedule  # noqa: E402
+from theme_apply import BroadcastApplyStrategy, FakeBroadcaster  # noqa: E402
+from theme_backend import FileThemeBackend, MemoryThemeBackend  # noqa: E402
+from theme_controller import ThemeController  # noqa: E402
+from theme_state import ThemeStateCache  # noqa: E402
+from ui_style import StyleRegistry  # noqa: E402
+
+SCHEMA = 1
+DEFAULT_OUTPUT = 'bench_results.json'
+DEFAULT_THRESHOLD = 0.3
+# 耗时至少变化这么多微秒才与比例阈值一起判定回归/改进
+DEFAULT_MIN_DELTA_US = 2.0
+# 初次对比变慢的耗时项目复测的次数
+CONFIRM_RUNS = 3
+# 全年回放使用固定时区，唤醒次数不随运行机器的时区变化
+SIMULATION_ZONE = 'Europe/Berlin' if ZoneInfo else None
+# 与界面中的登记一致：角色 -> 控件数量
+WIDGET_ROLES = [
+    ('window', 2), ('frame', 8), ('label', 6), ('icon', 2), ('button', 3),
+    ('dialog_button', 2), ('close_button', 1), ('check', 1), ('indicator', 1),
+    ('mask', 1), ('mask_label', 1),
+]
+# 三台显示器：主屏、右侧竖置且位置偏下的副屏、左侧副屏
+MONITORS = [Rect(0, 0, 1920, 1080), Rect(1920, 200, 3000, 2120), Rect(-1280, 0, 0, 1024)]
+
+
+class FakeProcessRunner:
+    """代替重启资源管理器等外部进程，只记录调用次数"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def run(self):
+        self.calls += 1
+
+
+class StubWidget:
+    """记录 configure 调用的假控件，不需要图形环境"""
+
+    def __init__(self, counter):
+        self.counter = counter
+
+    def configure(self, **options):
+        self.counter['calls'] += 1
+
+
+class FakeTimer:
+    def call_later(self, delay_ms, callback):
+        return 1
+
+    def cancel(self, handle):
+        pass
+
+
+class Suite:
+    def __init__(self, repeat=5):
+        self.repeat = repeat
+        self.metrics = {}
+        # 界面刷新实际使用的控件：stub 或 tk
+        self.ui = 'stub'
+        # 指标名 -> 被测函数，供复测
+        self.funcs = {}
+
+    def time(self, name, func):
+        """记录 func 单次耗时（微秒）：自动确定每轮次数，取 repeat 轮中最快一轮"""
+        timer = timeit.Timer(func)
+        number, _ = timer.autorange()
+        best = min(timer.repeat(self.repeat, number)) / number
+        self.metrics[name] = {'value': round(best * 1e6, 4), 'unit': 'us'}
+        self.funcs[name] = func
+
+    def retime(self, name):
+        """复测一次，保留较快的结果（被测对象的状态可能已变化，只用于耗时类指标）"""
+        previous = self.metrics[name]['value']
+        self.time(name, self.funcs[name])
+        self.metrics[name]['value'] = min(previous, self.metrics[name]['value'])
+
+    def count(self, name, value):
+        """记录确定性的计数，任何增加都视为回归"""
+        self.metrics[name] = {'value': value, 'unit': 'count'}
+
+
+def bench_theme_read(suite, workdir, options):
+    backend = MemoryThemeBackend('dark')
+    suite.time('theme_read.memory_backend', backend.read_theme)
+    file_backend = FileThemeBackend(os.path.join(workdir, 'state.json'))
+    file_backend.write_theme('dark')
+    suite.time('theme_read.file_backend', file_backend.read_theme)
+    state = ThemeStateCache(backend)
+    state.get()
+    suite.time('theme_read.state_cache', state.get)
+    state.read_count = 0
+    for _ in range(1000):
+        state.get()
+    suite.count('theme_read.backend_reads_per_1000_cached', state.read_count)
+
+
+def bench_toggle(suite, workdir, options):
+    backend = MemoryThemeBackend('light')
+    controller = ThemeController(backend, BroadcastApplyStrategy(FakeBroadcaster()))
+    suite.time('toggle.broadcast', controller.toggle)
+
+    process = FakeProcessRunner()
+    fallback = ThemeController(MemoryThemeBackend('light'),
+                               BroadcastApplyStrategy(FakeBroadcaster(succeed=False), process.run))
+    suite.time('toggle.broadcast_failed_restart', lambda: fallback.toggle(restart=True))
+
+    theme = controller.get_theme()
+    suite.time('toggle.noop', lambda: controller.set_theme(theme))
+    backend.write_count = 0
+    process.calls = 0
+    for _ in range(1000):
+        controller.set_theme(theme, source='schedule')
+    suite.count('toggle.noop_writes_per_1000', backend.write_count)
+    for _ in range(100):
+        fallback.toggle(restart=False)
+    suite.count('toggle.restarts_per_100_without_restart', process.calls)
+
+
+def bench_scheduler(suite, workdir, options):
+    now = datetime(2024, 6, 14, 13, 30)
+    daily = DailySchedule.from_times('20:00', '06:00')
+    suite.time('scheduler.daily_next_event', lambda: daily.next_event(now))
+
+    rules = RuleSchedule(daily, DailySchedule.from_times('22:00', '08:00'))
+    for month in range(1, 13):
+        first = date(2024, month, 1)
+        rules.add_exception(first, first + timedelta(days=3), 'weekend')
+        rules.add_exception(datetime(2024, month, 15, 9), datetime(2024, month, 15, 17), 'dark')
+    rules.build()
+    suite.time('scheduler.rules_next_event', lambda: rules.next_event(now))
+
+    solar = SolarSchedule(31.23, 121.47, cache_dir=workdir)
+    solar.next_event(now)
+    suite.time('scheduler.solar_next_event', lambda: solar.next_event(now))
+
+    scheduler = ThemeScheduler(FakeTimer(), lambda theme: None)
+    scheduler.set_schedule(daily)
+    suite.time('scheduler.arm', scheduler.arm)
+
+    def replay_year():
+        return simulate(daily, datetime(2024, 1, 1), datetime(2025, 1, 1), zone=SIMULATION_ZONE)
+
+    suite.count('scheduler.wakeups_per_year', replay_year().wakeups)
+    suite.time('scheduler.simulate_year', replay_year)
+
+
+def bench_dock(suite, workdir, options):
+    provider = FakeMonitorProvider(MONITORS)
+    layout = provider.get_layout()
+    monitor = layout.monitors[1]
+
+    def recompute():
+        window = docked_window_rect('left', monitor, 180, 280, monitor.left, monitor.top + 400)
+        return compute_dock_zones('left', window, monitor, 5, layout.is_interior(monitor, 'left', window))
+
+    suite.time('dock.compute_zones', recompute)
+    suite.time('dock.layout_build', lambda: provider.set_monitors(MONITORS))
+
+    reveals = []
+    tester = DockHitTester(lambda: reveals.append(1), lambda: None, lambda: None)
+    tester.set_zones(recompute())
+    tester.set_hidden(True)
+    source = FakeCursorSource()
+    source.start(tester.on_cursor, tester.distance)
+    suite.time('dock.hit_test_hidden', lambda: source.move(2500, 900))
+    tester.set_hidden(False)
+    suite.time('dock.hit_test_shown', lambda: source.move(2500, 900))
+
+    # 光标从屏幕中央扫到触发条再离开：隐藏状态下只应通知一次
+    tester.set_hidden(True)
+    del reveals[:]
+    for x in list(range(2500, 1919, -5)) + list(range(1920, 2500, 5)):
+        source.move(x, 700)
+    suite.count('dock.missed_or_duplicate_reveals', abs(len(reveals) - 1))
+
+
+def build_tk_widgets(registry):
+    import tkinter as tk
+    root = tk.Tk()
+    root.withdraw()
+    widgets = []
+    for role, count in WIDGET_ROLES:
+        for _ in range(count):
+            if role == 'window':
+                widget = tk.Toplevel(root)
+                widget.withdraw()
+            elif role == 'frame':
+                widget = tk.Frame(root)
+            elif role in ('button', 'dialog_button', 'close_button'):
+                widget = tk.Button(root)
+            elif role == 'check':
+                widget = tk.Checkbutton(root)
+            else:
+                widget = tk.Label(root)
+            registry.register(widget, role)
+            widgets.append(widget)
+    return root
+
+
+def bench_ui_refresh(suite, workdir, options):
+    counter = {'calls': 0}
+    registry = StyleRegistry()
+    root = None
+    if options.tk:
+        import tkinter as tk
+        try:
+            root = build_tk_widgets(registry)
+            suite.ui = 'tk'
+        except tk.TclError as e:
+            print(f"  无法创建 Tk 窗口（{e}），改用假控件")
+    if root is None:
+        for role, count in WIDGET_ROLES:
+            for _ in range(count):
+                registry.register(StubWidget(counter), role)
+    registry.apply('light')
+    suite.time('ui_refresh.same_theme', lambda: registry.apply('light'))
+
+    themes = ['dark', 'light']
+    state = {'index': 0}
+
+    def switch():
+        state['index'] ^= 1
+        registry.apply(themes[state['index']])
+
+    suite.time('ui_refresh.switch_theme', switch)
+    registry.apply('light')
+    before = registry.stats['configure_calls']
+    registry.apply('light')
+    suite.count('ui_refresh.configure_calls_same_theme', registry.stats['configure_calls'] - before)
+    before = registry.stats['configure_calls']
+    registry.apply('dark')
+    suite.count('ui_refresh.configure_calls_switch', registry.stats['configure_calls'] - before)
+    if root is not None:
+        root.destroy()
+
+
+CASES = [
+    ('theme_read', bench_theme_read),
+    ('toggle', bench_toggle),
+    ('scheduler', bench_scheduler),
+    ('dock', bench_dock),
+    ('ui_refresh', bench_ui_refresh),
+]
+
+
+def compare(current, baseline, threshold, min_delta=DEFAULT_MIN_DELTA_US):
+    """
+    返回 [(指标, 基线值, 当前值, 状态)]，状态为 回归 / 改进 / 持平 / 新增 / 缺失；
+    耗时须同时超过比例阈值和 min_delta 微秒才算变化
+    """
+    rows = []
+    for name in sorted(set(current) | set(baseline)):
+        if name not in baseline:
+            rows.append((name, None, current[name]['value'], '新增'))
+            continue
+        if name not in current:
+            rows.append((name, baseline[name]['value'], None, '缺失'))
+            continue
+        old, new = baseline[name]['value'], current[name]['value']
+        if current[name]['unit'] == 'count':
+            status = '回归' if new > old else '改进' if new < old else '持平'
+        elif new > old * (1 + threshold) and new - old > min_delta:
+            status = '回归'
+        elif new < old / (1 + threshold) and old - new > min_delta:
+            status = '改进'
+        else:
+            status = '持平'
+        rows.append((name, old, new, status))
+    return rows
+
+
+def format_value(value, unit):
+    if value is None:
+        return '-'
+    return f"{value:.3f} µs" if unit == 'us' else str(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help=f'结果文件（默认 {DEFAULT_OUTPUT}）')
+    parser.add_argument('--compare', metavar='BASELINE', help='与基线结果文件对比')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='耗时超过基线的比例阈值，默认 0.3（即慢 30%%）')
+    parser.add_argument('--min-delta', type=float, default=DEFAULT_MIN_DELTA_US,
+                        help=f'耗时至少变化的微秒数，默认 {DEFAULT_MIN_DELTA_US:g}')
+    parser.add_argument('--only', nargs='+', choices=[name for name, _ in CASES], help='只运行指定项目')
+    parser.add_argument('--repeat', type=int, default=5, help='每项测量轮数，取最快一轮')
+    parser.add_argument('--tk', action='store_true', help='界面刷新使用真实 Tk 控件（需要显示器或 Xvfb）')
+    args = parser.parse_args()
+
+    suite = Suite(args.repeat)
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, case in CASES:
+            if args.only and name not in args.only:
+                continue
+            print(f"运行 {name} ...")
+            case(suite, workdir, args)
+
+    results = {
+        'schema': SCHEMA,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'ui': suite.ui,
+        'metrics': suite.metrics,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"共 {len(suite.metrics)} 项指标，用时 {time.perf_counter() - started:.1f} 秒，结果已写入 {args.output}")
+
+    if not args.compare:
+        for name, metric in sorted(suite.metrics.items()):
+            print(f"  {name:<48}{format_value(metric['value'], metric['unit']):>14}")
+        return 0
+
+    with open(args.compare, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('schema') != SCHEMA:
+        print(f"基线文件格式版本不同（{baseline.get('schema')}），无法对比")
+        return 2
+    expected = baseline['metrics']
+    if args.only:
+        # 只运行部分项目时，未运行的项目不算缺失
+        expected = {name: metric for name, metric in expected.items() if name.split('.')[0] in args.only}
+    rows = compare(suite.metrics, expected, args.threshold, args.min_delta)
+    suspects = [name for name, _, _, status in rows if status == '回归' and name in suite.funcs]
+    if suspects:
+        # 变慢的耗时项目复测，排除偶发的机器负载
+        print(f"复测 {len(suspects)} 项变慢的耗时 ...")
+        for name in suspects:
+            for _ in range(CONFIRM_RUNS):
+                suite.retime(name)
+        rows = compare(suite.metrics, expected, args.threshold, args.min_delta)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"与基线 {args.compare}（{baseline.get('created')}，Python {baseline.get('python')}）对比：")
+    for name, old, new, status in rows:
+        unit = (suite.metrics.get(name) or expected[name])['unit']
+        print(f"  {name:<48}{format_value(old, unit):>14}{format_value(new, unit):>14}  {status}")
+    regressions = [row for row in rows if row[3] == '回归']
+    if regressions:
+        print(f"发现 {len(regressions)} 项回归")
+        return 1
+    print("未发现回归")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
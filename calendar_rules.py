@@ -0,0 +1,411 @@
+"""
+日历与例外规则
+
+在固定时间之外支持：工作日/周末不同的切换时间、按日期范围生效的时间，
+以及从本地 .ics 文件导入的例外（节假日、值班周等）。
+
+.ics 按行流式解析，不整体读入内存；所有规则归并为互不重叠、按起点排序的
+区间索引（IntervalIndex），“某时刻应处的主题”和“下一次变化”都只需二分
+查找，即使有成千上万条例外也是对数时间。RuleSchedule 与 DailySchedule
+提供相同的 next_event / theme_at 接口，可直接交给调度器。
+"""
+import bisect
+import heapq
+import os
+from datetime import date, datetime, timedelta, timezone
+
+from scheduler import DailySchedule
+
+# .ics 例外可用的动作：强制主题，或让当天按周末/工作日规则切换
+FORCED_ACTIONS = ('dark', 'light')
+DAY_ACTIONS = ('weekend', 'weekday')
+ACTION_PROPERTY = 'X-THEME-SWITCHER'
+# 重复事件展开的时间范围
+RECURRENCE_HORIZON_DAYS = 2 * 366
+
+
+class IntervalIndex:
+    """
+    区间索引：add() 收集可能重叠的 [start, end) 区间，build() 按优先级
+    扫描合并为互不重叠的分段；find / next_boundary 均为二分查找。
+    同优先级时后加入的区间生效。
+    """
+
+    def __init__(self):
+        self._pending = []
+        self.starts = []
+        self.ends = []
+        self.values = []
+
+    def add(self, start, end, value, priority=0):
+        if start < end:
+            self._pending.append((start, end, priority, len(self._pending), value))
+
+    def build(self):
+        """扫描线归并，复杂度 O(n log n)"""
+        boundaries = sorted(set([item[0] for item in self._pending] + [item[1] for item in self._pending]))
+        by_start = sorted(self._pending, key=lambda item: item[0])
+        active = []
+        starts, ends, values = [], [], []
+        index = 0
+        for left, right in zip(boundaries, boundaries[1:]):
+            while index < len(by_start) and by_start[index][0] <= left:
+                start, end, priority, seq, value = by_start[index]
+                heapq.heappush(active, (-priority, -seq, end, value))
+                index += 1
+            while active and active[0][2] <= left:
+                heapq.heappop(active)
+            if not active:
+                continue
+            value = active[0][3]
+            if ends and ends[-1] == left and values[-1] == value:
+                ends[-1] = right
+            else:
+                starts.append(left)
+                ends.append(right)
+                values.append(value)
+        self.starts, self.ends, self.values = starts, ends, values
+        self._pending = []
+        return self
+
+    def find(self, point):
+        """返回覆盖 point 的分段 (start, end, value)，没有则返回 None"""
+        index = bisect.bisect_right(self.starts, point) - 1
+        if index >= 0 and point < self.ends[index]:
+            return self.starts[index], self.ends[index], self.values[index]
+        return None
+
+    def next_boundary(self, point):
+        """返回大于 point 的最近分段边界（起点或终点），没有则返回 None"""
+        index = bisect.bisect_right(self.starts, point)
+        candidates = []
+        if index < len(self.starts):
+            candidates.append(self.starts[index])
+        if index > 0 and self.ends[index - 1] > point:
+            candidates.append(self.ends[index - 1])
+        return min(candidates) if candidates else None
+
+    def __len__(self):
+        return len(self.starts)
+
+
+def _unfold_lines(lines):
+    """合并 .ics 中以空白开头的折行"""
+    current = None
+    for raw in lines:
+        line = raw.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def parse_ics_datetime(params, value):
+    """
+    解析 DTSTART / DTEND，返回 (本地 naive datetime 或 date, 是否全天)。
+    带 Z 的 UTC 时间转换为本地时间，TZID 在可用时按 zoneinfo 转换。
+    """
+    value = value.strip()
+    if params.get('VALUE') == 'DATE' or len(value) == 8:
+        return datetime.strptime(value, '%Y%m%d').date(), True
+    if value.endswith('Z'):
+        utc = datetime.strptime(value, '%Y%m%dT%H%M%SZ').replace(tzinfo=timezone.utc)
+        return datetime.fromtimestamp(utc.timestamp()), False
+    local = datetime.strptime(value, '%Y%m%dT%H%M%S')
+    tzid = params.get('TZID')
+    if tzid:
+        try:
+            from zoneinfo import ZoneInfo
+            return datetime.fromtimestamp(local.replace(tzinfo=ZoneInfo(tzid)).timestamp()), False
+        except Exception:
+            pass
+    return local, False
+
+
+def _split_property(line):
+    """'DTSTART;TZID=Asia/Shanghai:20240101T090000' -> ('DTSTART', {'TZID': ...}, '20240101T090000')"""
+    head, _, value = line.partition(':')
+    parts = head.split(';')
+    params = {}
+    for part in parts[1:]:
+        key, _, param_value = part.partition('=')
+        params[key.upper()] = param_value
+    return parts[0].upper(), params, value
+
+
+def iter_ics_events(lines):
+    """
+    流式解析 VEVENT，逐个产出 dict：start, end, all_day, summary, action, rrule。
+    lines 可以是打开的文件对象，整个文件不会被读入内存。
+    """
+    event = None
+    for line in _unfold_lines(lines):
+        if line == 'BEGIN:VEVENT':
+            event = {}
+            continue
+        if event is None:
+            continue
+        if line == 'END:VEVENT':
+            if 'start' in event:
+                if 'end' not in event:
+                    event['end'] = event['start'] + timedelta(days=1) if event['all_day'] else event['start']
+                yield event
+            event = None
+            continue
+        name, params, value = _split_property(line)
+        try:
+            if name == 'DTSTART':
+                event['start'], event['all_day'] = parse_ics_datetime(params, value)
+            elif name == 'DTEND':
+                event['end'], _ = parse_ics_datetime(params, value)
+        except ValueError:
+            # 无法识别的时间格式，丢弃该事件
+            event = None
+            continue
+        if name == 'SUMMARY':
+            event['summary'] = value
+        elif name == ACTION_PROPERTY:
+            event['action'] = value.strip().lower()
+        elif name == 'RRULE':
+            event['rrule'] = dict(part.partition('=')[::2] for part in value.split(';') if part)
+
+
+def expand_occurrences(event, window_start, window_end):
+    """
+    按 RRULE（支持 FREQ=DAILY/WEEKLY/YEARLY 及 INTERVAL、COUNT、UNTIL）
+    展开事件，只产出与 [window_start, window_end) 相交的 (start, end)。
+    INTERVAL / COUNT 格式错误时在产出任何时段之前抛出 ValueError。
+    """
+    start, end = event['start'], event['end']
+    rule = event.get('rrule')
+    if not rule:
+        end_day = end.date() if isinstance(end, datetime) else end
+        start_day = start.date() if isinstance(start, datetime) else start
+        if end_day >= window_start and start_day < window_end:
+            yield start, end
+        return
+    freq = rule.get('FREQ')
+    interval = int(rule.get('INTERVAL') or 1)
+    if interval < 1:
+        # INTERVAL=0 会原地重复同一天，永远到不了窗口末尾
+        raise ValueError(f"INTERVAL 必须为正整数: {rule['INTERVAL']}")
+    count = int(rule['COUNT']) if rule.get('COUNT') else None
+    until = None
+    if rule.get('UNTIL'):
+        try:
+            until, _ = parse_ics_datetime({}, rule['UNTIL'])
+        except ValueError:
+            until = None
+    duration = end - start
+    occurrence = 0
+    current = start
+    while True:
+        if count is not None and occurrence >= count:
+            return
+        current_day = current if isinstance(current, date) and not isinstance(current, datetime) else current.date()
+        if until is not None and current_day > (until if not isinstance(until, datetime) else until.date()):
+            return
+        if current_day >= window_end:
+            return
+        if current_day + timedelta(days=max(duration.days, 1)) >= window_start:
+            yield current, current + duration
+        occurrence += 1
+        if freq == 'DAILY':
+            current += timedelta(days=interval)
+        elif freq == 'WEEKLY':
+            current += timedelta(weeks=interval)
+        elif freq == 'YEARLY':
+            try:
+                current = current.replace(year=current.year + interval)
+            except ValueError:
+                # 2 月 29 日在平年顺延到 3 月 1 日
+                current = current.replace(year=current.year + interval, month=3, day=1)
+        else:
+            return
+
+
+class RuleSchedule:
+    """
+    规则日程。优先级从低到高：
+    工作日/周末时间 < 配置中的日期范围 < .ics 中按周末/工作日处理的日期 < .ics 强制主题的时段
+    """
+
+    def __init__(self, weekday, weekend=None):
+        self.weekday = weekday
+        self.weekend = weekend or weekday
+        # 日期 -> DailySchedule 或 'weekend' / 'weekday'
+        self.day_rules = IntervalIndex()
+        # 本地时间 -> 'dark' / 'light'
+        self.forced = IntervalIndex()
+        self._day_cache = {}
+
+    def add_date_range(self, first_day, last_day, schedule, priority=0):
+        """first_day 到 last_day（含）按 schedule 切换"""
+        self.day_rules.add(first_day, last_day + timedelta(days=1), schedule, priority)
+
+    def add_exception(self, start, end, action, priority=1):
+        """添加例外：start/end 为 date（全天）或 datetime"""
+        if action in FORCED_ACTIONS:
+            if not isinstance(start, datetime):
+                start = datetime.combine(start, datetime.min.time())
+            if not isinstance(end, datetime):
+                end = datetime.combine(end, datetime.min.time())
+            self.forced.add(start, end, action)
+        elif action in DAY_ACTIONS:
+            if isinstance(start, datetime):
+                start = start.date()
+            if isinstance(end, datetime):
+                # 以非零点结束的时段覆盖结束当天
+                end = end.date() + timedelta(days=1) if end.time() != datetime.min.time() else end.date()
+            self.day_rules.add(start, end, action, priority)
+        else:
+            raise ValueError(f"未知的例外动作: {action!r}")
+
+    def build(self):
+        self.day_rules.build()
+        self.forced.build()
+        self._day_cache.clear()
+        return self
+
+    def schedule_for_day(self, day):
+        """返回某天生效的 DailySchedule"""
+        segment = self.day_rules.find(day)
+        rule = segment[2] if segment else None
+        if rule == 'weekend' or (rule is None and day.weekday() >= 5):
+            return self.weekend
+        if rule == 'weekday' or rule is None:
+            return self.weekday
+        return rule
+
+    def _day_events(self, day):
+        events = self._day_cache.get(day)
+        if events is None:
+            midnight = datetime.combine(day, datetime.min.time())
+            events = [(midnight + timedelta(seconds=second), theme)
+                      for second, theme in self.schedule_for_day(day).events]
+            if len(self._day_cache) > 64:
+                self._day_cache.clear()
+            self._day_cache[day] = events
+        return events
+
+    def _base_theme_at(self, now):
+        day = now.date()
+        passed = [theme for when, theme in self._day_events(day) if when <= now]
+        if passed:
+            return passed[-1]
+        return self._day_events(day - timedelta(days=1))[-1][1]
+
+    def _next_base_event(self, now):
+        day = now.date()
+        for when, theme in self._day_events(day):
+            if when > now:
+                return when, theme
+        return self._day_events(day + timedelta(days=1))[0]
+
+    def theme_at(self, now):
+        segment = self.forced.find(now)
+        if segment:
+            return segment[2]
+        return self._base_theme_at(now)
+
+    def next_event(self, now):
+        """下一个事件：强制时段的边界，或未被强制时段覆盖的日常事件"""
+        base = self._next_base_event(now)
+        boundary = self.forced.next_boundary(now)
+        if boundary is not None and (boundary <= base[0] or self.forced.find(base[0]) is not None):
+            return boundary, self.theme_at(boundary)
+        return base
+
+    def next_change(self, now, max_steps=1000):
+        """下一次主题真正发生变化的时刻 (datetime, 主题)，跳过不改变主题的事件"""
+        current = self.theme_at(now)
+        when = now
+        for _ in range(max_steps):
+            when, theme = self.next_event(when)
+            if theme != current:
+                return when, theme
+        return None
+
+
+def parse_date_ranges(text):
+    """
+    解析日期范围配置，每项形如 '2024-07-01..2024-08-31 22:00 05:30'
+    （暗色时间在前），多项以分号或换行分隔。
+    """
+    ranges = []
+    for item in text.replace('\n', ';').split(';'):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            span, dark_time, light_time = item.split()
+            first, last = span.split('..')
+            ranges.append((datetime.strptime(first, '%Y-%m-%d').date(),
+                           datetime.strptime(last, '%Y-%m-%d').date(),
+                           DailySchedule.from_times(dark_time, light_time)))
+        except ValueError:
+            raise ValueError(f"日期范围格式不正确: {item!r}")
+    return ranges
+
+
+def parse_calendar_files(text, base_dir='.'):
+    """解析 'holidays.ics|weekend; oncall.ics|dark'，返回 [(路径, 默认动作)]"""
+    files = []
+    for item in text.replace('\n', ';').split(';'):
+        item = item.strip()
+        if not item:
+            continue
+        path, _, action = item.partition('|')
+        action = (action or 'weekend').strip().lower()
+        if action not in FORCED_ACTIONS + DAY_ACTIONS:
+            raise ValueError(f"未知的例外动作: {action!r}")
+        path = os.path.expandvars(os.path.expanduser(path.strip()))
+        files.append((path if os.path.isabs(path) else os.path.join(base_dir, path), action))
+    return files
+
+
+def load_calendar(schedule, path, default_action, today=None, priority=1):
+    """流式导入一个 .ics 文件的例外，返回导入的事件数"""
+    today = today or date.today()
+    window_start = today - timedelta(days=1)
+    window_end = today + timedelta(days=RECURRENCE_HORIZON_DAYS)
+    count = 0
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for event in iter_ics_events(f):
+            action = event.get('action') or default_action
+            if action not in FORCED_ACTIONS + DAY_ACTIONS:
+                continue
+            try:
+                occurrences = list(expand_occurrences(event, window_start, window_end))
+            except (ValueError, OverflowError) as e:
+                # 一个事件的 RRULE 写错只跳过该事件，不影响同一文件中的其他事件
+                print(f"跳过日历事件 {event.get('summary') or event['start']}: {path}: RRULE 格式错误: {e}")
+                continue
+            for start, end in occurrences:
+                schedule.add_exception(start, end, action, priority)
+                count += 1
+    return count
+
+
+def build_rule_schedule(section, dark_time, light_time, base_dir='.'):
+    """
+    根据配置中的 ScheduleRules 段构建 RuleSchedule。
+    dark_time / light_time 为工作日时间；weekend_dark_time / weekend_light_time
+    未设置时周末沿用工作日时间。
+    """
+    weekday = DailySchedule.from_times(dark_time, light_time)
+    weekend = DailySchedule.from_times(section.get('weekend_dark_time', dark_time),
+                                       section.get('weekend_light_time', light_time))
+    schedule = RuleSchedule(weekday, weekend)
+    for first, last, daily in parse_date_ranges(section.get('ranges', '')):
+        schedule.add_date_range(first, last, daily)
+    for index, (path, action) in enumerate(parse_calendar_files(section.get('calendar_files', ''), base_dir)):
+        try:
+            load_calendar(schedule, path, action, priority=1 + index)
+        except OSError as e:
+            print(f"读取日历失败: {path}: {e}")
+    return schedule.build()
@@ -0,0 +1,343 @@
+"""
+配置存储 - 不依赖 Tk，界面与守护模式共用
+
+ConfigStore 在内存中保存解析后的配置和文件的最近内容：
+- update(settings) 内容与磁盘相同时不写文件；连续修改在 delay_ms 内合并为一次写入；
+- 写入先写临时文件再替换（见 settings.write_text_atomic）；
+- check_reload() 只比较文件的修改时间和大小，外部编辑后才重新解析。
+
+一次性命令只读不写，用 read_settings() 读取：程序自己写出的简单格式直接逐行
+解析，不导入 configparser（连同 re、enum 约 12 ms）；含续行、插值等其他写法时
+仍交给 configparser。
+
+配置文件放在固定的用户目录（Windows 为 %APPDATA%\\ThemeSwitcher，其他平台为
+~/.config/theme_switcher），不再随启动时的当前目录变化；旧版本放在当前目录或
+程序目录下的 config.ini 会在首次启动时迁移过来。
+"""
+import os
+import sys
+
+from settings import Settings, render_config, settings_from_config, update_config, write_text_atomic
+
+CONFIG_NAME = 'config.ini'
+# 连续修改合并写入的等待时间
+WRITE_DELAY_MS = 500
+# 检查外部编辑的间隔
+RELOAD_INTERVAL_MS = 2000
+
+
+def default_config_path():
+    """当前用户的配置文件路径"""
+    if sys.platform == 'win32':
+        base = os.environ.get('APPDATA') or os.path.join(os.path.expanduser('~'), 'AppData', 'Roaming')
+        return os.path.join(base, 'ThemeSwitcher', CONFIG_NAME)
+    base = os.environ.get('XDG_CONFIG_HOME') or os.path.join(os.path.expanduser('~'), '.config')
+    return os.path.join(base, 'theme_switcher', CONFIG_NAME)
+
+
+def legacy_config_paths():
+    """旧版本写配置的位置：当前目录和程序所在目录"""
+    if getattr(sys, 'frozen', False):
+        app_dir = os.path.dirname(sys.executable)
+    else:
+        app_dir = os.path.dirname(os.path.abspath(__file__))
+    paths = []
+    for directory in (os.getcwd(), app_dir):
+        path = os.path.join(directory, CONFIG_NAME)
+        if path not in paths:
+            paths.append(path)
+    return paths
+
+
+def _absolute_calendar_files(text, base_dir):
+    """把 calendar_files 中的相对路径改为绝对路径，迁移后仍指向原来的 .ics"""
+    entries = []
+    for entry in text.split(';'):
+        entry = entry.strip()
+        if not entry:
+            continue
+        path, sep, action = entry.partition('|')
+        path = path.strip()
+        if not os.path.isabs(path):
+            path = os.path.join(base_dir, path)
+        entries.append(path + sep + action)
+    return '; '.join(entries)
+
+
+def migrate_legacy_config(path, candidates=None):
+    """用户目录中还没有配置时，复制第一个找到的旧配置；返回迁移来源或 None"""
+    if os.path.exists(path):
+        return None
+    for legacy in legacy_config_paths() if candidates is None else candidates:
+        if not os.path.isfile(legacy):
+            continue
+        import configparser
+        config = configparser.ConfigParser()
+        try:
+            config.read(legacy, encoding='utf-8')
+            if config.has_option('ScheduleRules', 'calendar_files'):
+                config['ScheduleRules']['calendar_files'] = _absolute_calendar_files(
+                    config['ScheduleRules']['calendar_files'], os.path.dirname(os.path.abspath(legacy)))
+            write_text_atomic(path, render_config(config))
+        except (OSError, configparser.Error) as e:
+            print(f"迁移配置失败: {e}")
+            return None
+        print(f"已将配置从 {legacy} 迁移到 {path}")
+        return legacy
+    return None
+
+
+def resolve_config_path(path=None):
+    """命令行指定的路径优先；否则使用用户目录，必要时迁移旧配置"""
+    if path:
+        return path
+    path = default_config_path()
+    migrate_legacy_config(path)
+    return path
+
+
+BOOLEAN_STATES = {'1': True, 'yes': True, 'true': True, 'on': True,
+                  '0': False, 'no': False, 'false': False, 'off': False}
+
+
+class SimpleSection:
+    """parse_simple 结果中的一个配置段，提供 settings_from_config 用到的 SectionProxy 方法"""
+
+    def __init__(self, name, values):
+        self.name = name
+        self.values = values
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __getitem__(self, option):
+        return self.values[option]
+
+    def keys(self):
+        return self.values.keys()
+
+    def items(self):
+        return self.values.items()
+
+    def get(self, option, fallback=None):
+        return self.values.get(option.lower(), fallback)
+
+    def _convert(self, option, fallback, convert):
+        value = self.values.get(option.lower())
+        return fallback if value is None else convert(value)
+
+    def getint(self, option, fallback=None):
+        return self._convert(option, fallback, int)
+
+    def getfloat(self, option, fallback=None):
+        return self._convert(option, fallback, float)
+
+    def getboolean(self, option, fallback=None):
+        def convert(value):
+            if value.lower() not in BOOLEAN_STATES:
+                raise ValueError(f"Not a boolean: {value}")
+            return BOOLEAN_STATES[value.lower()]
+        return self._convert(option, fallback, convert)
+
+
+class SimpleConfig:
+    """parse_simple 的结果，提供 settings_from_config 用到的 ConfigParser 方法"""
+
+    def __init__(self, sections):
+        self._sections = sections
+
+    def __contains__(self, name):
+        return name in self._sections
+
+    def __getitem__(self, name):
+        return self._sections[name]
+
+    def sections(self):
+        return list(self._sections)
+
+    def items(self, name, raw=False):
+        return list(self._sections[name].items())
+
+
+def parse_simple(text):
+    """
+    逐行解析 configparser 写出的格式（[段]、键 = 值、整行注释）；遇到续行、插值、
+    DEFAULT 段、重复的段或键等需要 configparser 处理的写法时返回 None
+    """
+    sections = {}
+    values = None
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped[0] in '#;':
+            continue
+        if line[0].isspace() or '%' in line:
+            return None
+        if stripped[0] == '[':
+            name = stripped[1:-1]
+            if stripped[-1] != ']' or not name or name in sections or name == 'DEFAULT':
+                return None
+            values = {}
+            sections[name] = SimpleSection(name, values)
+            continue
+        positions = [index for index in (stripped.find('='), stripped.find(':')) if index >= 0]
+        if values is None or not positions:
+            return None
+        option = stripped[:min(positions)].strip().lower()
+        if not option or option in values:
+            return None
+        values[option] = stripped[min(positions) + 1:].strip()
+    return SimpleConfig(sections)
+
+
+def read_settings(path):
+    """只读地读取设置（一次性命令用）；与 ConfigStore.load() 的结果相同"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+    except OSError:
+        return Settings()
+    config = parse_simple(text)
+    if config is None:
+        return ConfigStore(path).load()
+    errors = []
+    settings = settings_from_config(config, errors)
+    for error in errors:
+        print(f"配置项格式错误，该项使用默认值: {error}")
+    return settings
+
+
+class ConfigStore:
+    """
+    配置文件的内存缓存。timer 提供 call_later(delay_ms, callback) / cancel(handle)
+    （TkTimer 或 LoopTimer），为 None 时 update() 立即写入。
+    """
+
+    def __init__(self, path, timer=None, delay_ms=WRITE_DELAY_MS):
+        self.path = path
+        self.timer = timer
+        self.delay_ms = delay_ms
+        # configparser 只在读取文件时导入，一次性命令用 read_settings() 可以不加载它
+        self.config = None
+        self.settings = Settings()
+        # 磁盘上文件的最近内容及其 (修改时间, 大小)
+        self._disk_text = None
+        self._disk_stamp = None
+        # 等待写入的内容
+        self._pending = None
+        self._timer_handle = None
+        # 文件无法解析时的错误描述；不为 None 时不写文件
+        self.error = None
+        self.stats = {'reads': 0, 'writes': 0, 'skipped': 0, 'coalesced': 0, 'reloads': 0}
+
+    def _stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read(self):
+        """
+        读取并解析文件；文件不存在时使用默认设置。个别取值错误时只有这些项
+        使用默认值，其余配置段原样保留；文件整体无法解析时使用默认设置，并且
+        在文件修正之前不保存修改，以免只写回部分配置段而丢掉其他内容。
+        """
+        self.stats['reads'] += 1
+        self._disk_stamp = self._stamp()
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                text = f.read()
+        except OSError:
+            text = ''
+        self._disk_text = text
+        self.error = None
+        import configparser
+        config = configparser.ConfigParser()
+        errors = []
+        try:
+            config.read_string(text)
+            settings = settings_from_config(config, errors)
+        except configparser.Error as e:
+            print(f"配置文件格式错误，使用默认设置，修正前不保存修改: {e}")
+            self.error = str(e)
+            settings = Settings()
+        for error in errors:
+            print(f"配置项格式错误，该项使用默认值: {error}")
+        self.config = config
+        self.settings = settings
+        return settings
+
+    def load(self):
+        return self._read()
+
+    def update(self, settings):
+        """记录新的设置；与磁盘内容相同则不写，否则延迟写入。返回是否需要写入"""
+        self.settings = settings
+        if self.error is not None:
+            self.stats['skipped'] += 1
+            return False
+        if self.config is None:
+            import configparser
+            self.config = configparser.ConfigParser()
+        update_config(self.config, settings)
+        text = render_config(self.config)
+        if text == self._disk_text:
+            # 改回了磁盘上的内容：取消尚未执行的写入
+            self._cancel_timer()
+            self._pending = None
+            self.stats['skipped'] += 1
+            return False
+        if text == self._pending:
+            self.stats['skipped'] += 1
+            return False
+        if self._pending is not None:
+            self.stats['coalesced'] += 1
+        self._pending = text
+        if self.timer is None:
+            self.flush()
+        elif self._timer_handle is None:
+            self._timer_handle = self.timer.call_later(self.delay_ms, self._on_timer)
+        return True
+
+    def _on_timer(self):
+        self._timer_handle = None
+        self.flush()
+
+    def _cancel_timer(self):
+        if self._timer_handle is not None:
+            self.timer.cancel(self._timer_handle)
+            self._timer_handle = None
+
+    @property
+    def dirty(self):
+        return self._pending is not None
+
+    def flush(self):
+        """立即写入等待中的修改；失败时保留，等下一次写入重试"""
+        self._cancel_timer()
+        if self._pending is None:
+            return
+        try:
+            write_text_atomic(self.path, self._pending)
+        except OSError as e:
+            print(f"保存配置失败: {e}")
+            return
+        self.stats['writes'] += 1
+        self._disk_text = self._pending
+        self._disk_stamp = self._stamp()
+        self._pending = None
+
+    def check_reload(self):
+        """文件被外部修改时重新解析并返回新设置，否则返回 None"""
+        stamp = self._stamp()
+        if stamp == self._disk_stamp:
+            return None
+        if self._pending is not None:
+            # 本地还有未写入的修改，以本地为准，稍后的写入会覆盖外部修改
+            return None
+        previous = self._disk_text
+        settings = self._read()
+        if self._disk_text == previous:
+            return None
+        self.stats['reloads'] += 1
+        return settings
@@ -0,0 +1,235 @@
+"""
+本地控制接口
+
+供演示模式、录屏、截图任务等外部工具调用的 HTTP/JSON 接口，只监听
+127.0.0.1，每个请求须带令牌（Authorization: Bearer <令牌>）：
+
+    GET  /status      当前主题与界面状态
+    POST /toggle      切换到相反主题
+    POST /set         设置主题，参数 theme=dark|light
+    GET  /schedule    定时设置与下一次切换
+    POST /schedule    修改定时设置，参数 enabled / dark_time / light_time
+    GET  /metrics     各模块的运行统计
+    GET  /trace       运行跟踪，参数 format=prometheus|jsonl（文本响应，需以 --trace 启动）
+
+参数可放在查询字符串或 JSON 请求体中。服务器在独立线程的 asyncio 事件循环中
+运行，可同时处理大量连接；具体操作通过 dispatch(command, params, reply) 交给
+程序执行（界面经调度队列回到 Tk 线程），完成后调用 reply(payload, status)，
+不会阻塞 Tk 主循环。
+"""
+import asyncio
+import hmac
+import json
+import threading
+from urllib.parse import parse_qsl, urlsplit
+
+from settings import DEFAULT_CONTROL_PORT
+
+# 等待程序完成操作的上限（切换主题可能需要重启资源管理器）
+REPLY_TIMEOUT = 40
+# 保持连接的空闲上限
+IDLE_TIMEOUT = 30
+MAX_BODY = 64 * 1024
+MAX_HEADERS = 64
+
+ROUTES = {
+    ('GET', '/status'): 'status',
+    ('POST', '/toggle'): 'toggle',
+    ('POST', '/set'): 'set',
+    ('GET', '/schedule'): 'schedule',
+    ('POST', '/schedule'): 'update_schedule',
+    ('GET', '/metrics'): 'metrics',
+    ('GET', '/trace'): 'trace',
+}
+REASONS = {200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 404: 'Not Found',
+           405: 'Method Not Allowed', 413: 'Payload Too Large', 414: 'URI Too Long',
+           431: 'Request Header Fields Too Large', 500: 'Internal Server Error',
+           503: 'Service Unavailable', 504: 'Gateway Timeout'}
+
+
+class BadRequest(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class ControlServer:
+    """port 为 0 时由系统分配端口，启动后从 port 属性读取"""
+
+    def __init__(self, dispatch, token, port=DEFAULT_CONTROL_PORT, host='127.0.0.1', reply_timeout=REPLY_TIMEOUT):
+        if not token:
+            raise ValueError("控制接口需要令牌")
+        self.dispatch = dispatch
+        self.token = token.encode('utf-8')
+        self.host = host
+        self.port = port
+        self.reply_timeout = reply_timeout
+        self.stats = {'connections': 0, 'active': 0, 'max_active': 0, 'requests': 0,
+                      'unauthorized': 0, 'errors': 0, 'timeouts': 0}
+        self._loop = None
+        self._stopping = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._start_error = None
+
+    def start(self):
+        """在后台线程中启动；端口被占用等错误以 OSError 抛出"""
+        self._thread = threading.Thread(target=self._run, name='ThemeSwitcherControl', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._start_error:
+            raise self._start_error
+
+    def stop(self):
+        if self._loop and self._stopping:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+            self._thread.join(2)
+
+    def _run(self):
+        try:
+            asyncio.run(self._serve())
+        except OSError as e:
+            self._start_error = e
+            self._ready.set()
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        async with server:
+            await self._stopping.wait()
+
+    async def _handle_connection(self, reader, writer):
+        self.stats['connections'] += 1
+        self.stats['active'] += 1
+        self.stats['max_active'] = max(self.stats['max_active'], self.stats['active'])
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), IDLE_TIMEOUT)
+                except BadRequest as e:
+                    self.stats['errors'] += 1
+                    writer.write(self._response(e.status, {'error': str(e)}, keep_alive=False))
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                status, payload = await self._respond(method, target, headers, body)
+                writer.write(self._response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.stats['active'] -= 1
+            writer.close()
+
+    @staticmethod
+    async def _read_line(reader, status, message):
+        """读取一行；超过 StreamReader 的长度上限时以 status 拒绝请求"""
+        try:
+            return await reader.readline()
+        except (ValueError, asyncio.LimitOverrunError):
+            raise BadRequest(message, status)
+
+    async def _read_request(self, reader):
+        """读取一个请求，返回 (方法, 目标, 头部, 请求体)；连接已关闭时返回 None"""
+        line = await self._read_line(reader, 414, "请求行过长")
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode('latin-1').split()
+        except ValueError:
+            raise BadRequest("请求行格式错误")
+        headers = {}
+        while True:
+            line = await self._read_line(reader, 431, "请求头过长")
+            if line in (b'\r\n', b'\n', b''):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise BadRequest("请求头过多")
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise BadRequest("Content-Length 格式错误")
+        if length < 0:
+            raise BadRequest("Content-Length 不能为负数")
+        if length > MAX_BODY:
+            raise BadRequest("请求体过大", 413)
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target, headers, body
+
+    def _authorized(self, headers):
+        scheme, _, token = headers.get('authorization', '').partition(' ')
+        if scheme.lower() != 'bearer':
+            token = headers.get('x-auth-token', '')
+        return hmac.compare_digest(token.strip().encode('utf-8'), self.token)
+
+    async def _respond(self, method, target, headers, body):
+        self.stats['requests'] += 1
+        if not self._authorized(headers):
+            self.stats['unauthorized'] += 1
+            return 401, {'error': '令牌无效'}
+        url = urlsplit(target)
+        command = ROUTES.get((method, url.path))
+        if command is None:
+            if any(path == url.path for _, path in ROUTES):
+                return 405, {'error': f"{url.path} 不支持 {method}"}
+            return 404, {'error': f"未知路径: {url.path}"}
+        params = dict(parse_qsl(url.query))
+        if body:
+            try:
+                data = json.loads(body.decode('utf-8'))
+            except ValueError:
+                return 400, {'error': '请求体不是有效的 JSON'}
+            if not isinstance(data, dict):
+                return 400, {'error': '请求体必须是 JSON 对象'}
+            params.update(data)
+        return await self._call(command, params)
+
+    async def _call(self, command, params):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def resolve(result):
+            if not future.done():
+                future.set_result(result)
+
+        def reply(payload, status=200):
+            # 可在任意线程调用；服务器已停止时丢弃
+            try:
+                loop.call_soon_threadsafe(resolve, (status, payload))
+            except RuntimeError:
+                pass
+
+        try:
+            self.dispatch(command, params, reply)
+            return await asyncio.wait_for(future, self.reply_timeout)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            return 504, {'error': '程序未在规定时间内完成操作'}
+        except Exception as e:
+            self.stats['errors'] += 1
+            return 500, {'error': str(e)}
+
+    @staticmethod
+    def _response(status, payload, keep_alive):
+        # 字符串按纯文本返回（如 Prometheus 文本格式），其余序列化为 JSON
+        if isinstance(payload, str):
+            body = payload.encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        else:
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            content_type = 'application/json; charset=utf-8'
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Cache-Control: no-store\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        return head.encode('latin-1') + body
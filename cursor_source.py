@@ -0,0 +1,254 @@
+"""
+光标位置事件源
+
+停靠窗口需要知道光标何时接近屏幕边缘。事件源以 start(callback, distance)
+启动，在自己的线程中以 callback(x, y) 报告光标位置：
+
+- Win32MouseHookSource: 低级鼠标钩子（WH_MOUSE_LL），光标不动时线程不唤醒；
+- PollingCursorSource: 自适应轮询，光标离热区越远间隔越长；
+- TimerPollingCursorSource: 同样的自适应轮询，但由计时器（如 Tk 的 after）
+  在界面线程中采样，用于只能在 Tk 线程读取光标位置的平台；
+- FakeCursorSource: 手动推送位置，用于测试和基准。
+
+distance(x, y) 返回光标到热区的距离（像素），仅轮询源用它计算间隔。
+"""
+import sys
+import threading
+
+WH_MOUSE_LL = 14
+WM_MOUSEMOVE = 0x0200
+WM_QUIT = 0x0012
+
+
+class FakeCursorSource:
+    """手动推送位置的事件源，move() 在调用方线程中同步回调"""
+
+    def __init__(self):
+        self.callback = None
+        self.wakeups = 0
+
+    def start(self, callback, distance=None):
+        self.callback = callback
+
+    def stop(self):
+        self.callback = None
+
+    @property
+    def running(self):
+        return self.callback is not None
+
+    def move(self, x, y):
+        if self.callback:
+            self.wakeups += 1
+            self.callback(x, y)
+
+
+class PollingCursorSource:
+    """
+    自适应轮询：间隔 = 距离 / speed，限制在 [min_interval, max_interval] 秒之间。
+    speed 取光标的快速移动速度（像素/秒），保证光标到达热区前至少再采样一次。
+    """
+
+    def __init__(self, get_position, min_interval=0.03, max_interval=0.5, speed=4000):
+        self.get_position = get_position
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.speed = speed
+        self.wakeups = 0
+        self._stop_event = None
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self, callback, distance=None):
+        if self._thread:
+            return
+        # 每次启动使用新的停止事件，避免刚停止的旧线程被重新放行
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._poll_loop, args=(callback, distance, self._stop_event),
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._stop_event:
+            self._stop_event.set()
+        self._thread = None
+
+    def interval_for(self, dist):
+        if dist is None:
+            return self.max_interval
+        return min(self.max_interval, max(self.min_interval, dist / self.speed))
+
+    def _poll_loop(self, callback, distance, stop_event):
+        while not stop_event.is_set():
+            self.wakeups += 1
+            try:
+                x, y = self.get_position()
+                callback(x, y)
+            except Exception as e:
+                print(f"光标检测失败: {e}")
+                break
+            stop_event.wait(self.interval_for(distance(x, y) if distance else None))
+
+
+class TimerPollingCursorSource(PollingCursorSource):
+    """
+    在计时器线程中轮询：timer 提供 call_later(delay_ms, callback) / cancel(handle)。
+    配合 TkTimer 时 get_position 和 callback 都在 Tk 线程中执行，可以调用 Tk 接口。
+    """
+
+    def __init__(self, timer, get_position, **kwargs):
+        super().__init__(get_position, **kwargs)
+        self.timer = timer
+        self._handle = None
+        self._poll = None
+
+    @property
+    def running(self):
+        return self._poll is not None
+
+    def start(self, callback, distance=None):
+        if self._poll:
+            return
+        self._poll = lambda: self._tick(callback, distance)
+        self._handle = self.timer.call_later(0, self._poll)
+
+    def stop(self):
+        if self._handle is not None:
+            self.timer.cancel(self._handle)
+        self._handle = None
+        self._poll = None
+
+    def _tick(self, callback, distance):
+        self._handle = None
+        poll = self._poll
+        if poll is None:
+            return
+        self.wakeups += 1
+        try:
+            x, y = self.get_position()
+            callback(x, y)
+        except Exception as e:
+            print(f"光标检测失败: {e}")
+            self._poll = None
+            return
+        # 回调中可能已停止或重新启动
+        if self._poll is poll:
+            delay = self.interval_for(distance(x, y) if distance else None)
+            self._handle = self.timer.call_later(max(1, int(delay * 1000)), poll)
+
+
+class Win32MouseHookSource:
+    """低级鼠标钩子：在专用线程中安装 WH_MOUSE_LL 并运行消息循环"""
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+        self._ctypes = ctypes
+        self._wintypes = wintypes
+        self._user32 = ctypes.WinDLL('user32', use_last_error=True)
+        self._kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        self._hook_proc_type = ctypes.WINFUNCTYPE(wintypes.LPARAM, ctypes.c_int, wintypes.WPARAM, wintypes.LPARAM)
+        self._user32.SetWindowsHookExW.restype = wintypes.HHOOK
+        self._user32.SetWindowsHookExW.argtypes = (ctypes.c_int, self._hook_proc_type,
+                                                   wintypes.HINSTANCE, wintypes.DWORD)
+        self._user32.CallNextHookEx.restype = wintypes.LPARAM
+        self._user32.CallNextHookEx.argtypes = (wintypes.HHOOK, ctypes.c_int, wintypes.WPARAM, wintypes.LPARAM)
+        self._user32.UnhookWindowsHookEx.argtypes = (wintypes.HHOOK,)
+        self._user32.PostThreadMessageW.argtypes = (wintypes.DWORD, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM)
+        self._kernel32.GetModuleHandleW.restype = wintypes.HMODULE
+        self.wakeups = 0
+        self._thread = None
+        self._thread_id = None
+        self._hook_failed = False
+        self._ready = threading.Event()
+        # 钩子安装失败时退回自适应轮询
+        self._fallback = None
+
+    @property
+    def running(self):
+        return self._thread is not None or self._fallback is not None
+
+    def start(self, callback, distance=None):
+        if self.running:
+            return
+        self._ready.clear()
+        self._hook_failed = False
+        self._thread = threading.Thread(target=self._hook_loop, args=(callback,), daemon=True)
+        self._thread.start()
+        self._ready.wait(1.0)
+        if self._hook_failed:
+            self._fallback = PollingCursorSource(win32_cursor_position)
+            self._fallback.start(callback, distance)
+
+    def stop(self):
+        if self._fallback:
+            self._fallback.stop()
+            self._fallback = None
+        if self._thread_id:
+            self._user32.PostThreadMessageW(self._thread_id, WM_QUIT, 0, 0)
+        self._thread = None
+        self._thread_id = None
+
+    def _hook_loop(self, callback):
+        ctypes = self._ctypes
+        wintypes = self._wintypes
+
+        class MSLLHOOKSTRUCT(ctypes.Structure):
+            _fields_ = [('pt', wintypes.POINT), ('mouseData', wintypes.DWORD), ('flags', wintypes.DWORD),
+                        ('time', wintypes.DWORD), ('dwExtraInfo', ctypes.c_void_p)]
+
+        def hook_proc(code, wparam, lparam):
+            # 钩子回调必须尽快返回，这里只做数值比较，界面操作由回调投递到 Tk 线程
+            if code >= 0 and wparam == WM_MOUSEMOVE:
+                self.wakeups += 1
+                info = ctypes.cast(lparam, ctypes.POINTER(MSLLHOOKSTRUCT)).contents
+                try:
+                    callback(info.pt.x, info.pt.y)
+                except Exception as e:
+                    print(f"光标事件处理失败: {e}")
+            return self._user32.CallNextHookEx(None, code, wparam, lparam)
+
+        proc = self._hook_proc_type(hook_proc)
+        hook = self._user32.SetWindowsHookExW(WH_MOUSE_LL, proc, self._kernel32.GetModuleHandleW(None), 0)
+        if not hook:
+            print(f"安装鼠标钩子失败: {ctypes.get_last_error()}")
+            self._hook_failed = True
+            self._thread = None
+            self._ready.set()
+            return
+        self._thread_id = self._kernel32.GetCurrentThreadId()
+        self._ready.set()
+        msg = wintypes.MSG()
+        try:
+            while self._user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+                self._user32.TranslateMessage(ctypes.byref(msg))
+                self._user32.DispatchMessageW(ctypes.byref(msg))
+        finally:
+            self._user32.UnhookWindowsHookEx(hook)
+
+
+def win32_cursor_position():
+    """通过 GetCursorPos 读取光标位置"""
+    import ctypes
+    from ctypes import wintypes
+    point = wintypes.POINT()
+    ctypes.windll.user32.GetCursorPos(ctypes.byref(point))
+    return point.x, point.y
+
+
+def create_default_cursor_source(get_position=None, timer=None):
+    """
+    Windows 上使用鼠标钩子；其他平台对 get_position 自适应轮询。
+    给出 timer 时在计时器线程中轮询（get_position 需要在 Tk 线程中调用时）。
+    """
+    if sys.platform == 'win32':
+        try:
+            return Win32MouseHookSource()
+        except (OSError, AttributeError):
+            return PollingCursorSource(win32_cursor_position)
+    if timer is not None:
+        return TimerPollingCursorSource(timer, get_position or win32_cursor_position)
+    return PollingCursorSource(get_position or win32_cursor_position)
@@ -0,0 +1,169 @@
+"""
+停靠热区计算与命中测试
+
+窗口停靠、移动或改变大小时计算一次热区并缓存：隐藏时的显示触发条
+（reveal）和展开后的窗口区域（window）。光标线程只读取缓存的 DockZones
+做纯数值比较，不调用任何 Tk 接口；只有状态真正变化时才通知界面。
+"""
+
+
+class Rect:
+    """屏幕矩形，左上闭、右下开"""
+
+    def __init__(self, left, top, right, bottom):
+        self.left = left
+        self.top = top
+        self.right = right
+        self.bottom = bottom
+
+    @classmethod
+    def from_size(cls, x, y, width, height):
+        return cls(x, y, x + width, y + height)
+
+    @property
+    def width(self):
+        return self.right - self.left
+
+    @property
+    def height(self):
+        return self.bottom - self.top
+
+    def contains(self, x, y):
+        return self.left <= x < self.right and self.top <= y < self.bottom
+
+    def distance(self, x, y):
+        """点到矩形的距离（切比雪夫距离），在矩形内为 0"""
+        dx = max(self.left - x, 0, x - self.right + 1)
+        dy = max(self.top - y, 0, y - self.bottom + 1)
+        return max(dx, dy)
+
+    def boundary_distance(self, x, y):
+        """点到矩形边界的距离：在矩形内时为到最近一条边的距离"""
+        if not self.contains(x, y):
+            return self.distance(x, y)
+        return min(x - self.left, self.right - 1 - x, y - self.top, self.bottom - 1 - y)
+
+    def __eq__(self, other):
+        return isinstance(other, Rect) and (self.left, self.top, self.right, self.bottom) == \
+            (other.left, other.top, other.right, other.bottom)
+
+    def __repr__(self):
+        return f"Rect({self.left}, {self.top}, {self.right}, {self.bottom})"
+
+
+class DockZones:
+    """
+    一次停靠的热区：side 为停靠边，monitor 为所在显示器，window 为展开后的
+    窗口区域，reveal 为显示触发条。interior 表示停靠在与其他显示器相接的内侧边，
+    此时窗口无法滑出屏幕隐藏，需要整体隐藏。
+    """
+
+    def __init__(self, side, window, reveal, monitor=None, interior=False):
+        self.side = side
+        self.window = window
+        self.reveal = reveal
+        self.monitor = monitor
+        self.interior = interior
+
+
+def docked_window_rect(side, monitor, width, height, x, y):
+    """把位于 (x, y) 的窗口贴到 monitor 的 side 边，另一方向限制在显示器范围内"""
+    x = min(max(x, monitor.left), monitor.right - width)
+    y = min(max(y, monitor.top), monitor.bottom - height)
+    if side == 'left':
+        x = monitor.left
+    elif side == 'right':
+        x = monitor.right - width
+    elif side == 'top':
+        y = monitor.top
+    elif side == 'bottom':
+        y = monitor.bottom - height
+    else:
+        raise ValueError(f"未知停靠边: {side}")
+    return Rect.from_size(x, y, width, height)
+
+
+def compute_dock_zones(side, window, screen, offset, interior=False):
+    """
+    根据展开后的窗口区域 window、所在显示器 screen 和触发条宽度 offset 计算热区。
+    触发条沿停靠边，长度与窗口相同。
+    """
+    if side == 'left':
+        reveal = Rect(screen.left, window.top, screen.left + offset, window.bottom)
+    elif side == 'right':
+        reveal = Rect(screen.right - offset, window.top, screen.right, window.bottom)
+    elif side == 'top':
+        reveal = Rect(window.left, screen.top, window.right, screen.top + offset)
+    elif side == 'bottom':
+        reveal = Rect(window.left, screen.bottom - offset, window.right, screen.bottom)
+    else:
+        raise ValueError(f"未知停靠边: {side}")
+    return DockZones(side, window, reveal, screen, interior)
+
+
+def hidden_position(zones):
+    """隐藏时窗口左上角的位置：只在触发条处留出 offset 宽的一条"""
+    window, reveal = zones.window, zones.reveal
+    if zones.side == 'left':
+        return reveal.right - window.width, window.top
+    if zones.side == 'right':
+        return reveal.left, window.top
+    if zones.side == 'top':
+        return window.left, reveal.bottom - window.height
+    return window.left, reveal.top
+
+
+class DockHitTester:
+    """
+    在光标线程中判断显示/隐藏。
+    on_reveal() 在隐藏状态下光标进入触发条时调用一次；展开状态下光标离开或
+    回到窗口区域时分别调用 on_leave() / on_enter()。回调应只把操作投递到 Tk 线程。
+    """
+
+    def __init__(self, on_reveal, on_leave, on_enter):
+        self.on_reveal = on_reveal
+        self.on_leave = on_leave
+        self.on_enter = on_enter
+        # 由 Tk 线程整体替换，光标线程只读取引用
+        self.zones = None
+        self.hidden = False
+        self._revealing = False
+        self._inside = None
+        self.events = 0
+
+    def set_zones(self, zones):
+        self.zones = zones
+        self._inside = None
+
+    def set_hidden(self, hidden):
+        """窗口隐藏或展开后由 Tk 线程调用，重置边沿检测状态"""
+        self.hidden = hidden
+        self._revealing = False
+        self._inside = None
+
+    def on_cursor(self, x, y):
+        self.events += 1
+        zones = self.zones
+        if zones is None:
+            return
+        if self.hidden:
+            if not self._revealing and zones.reveal.contains(x, y):
+                self._revealing = True
+                self.on_reveal()
+            return
+        inside = zones.window.contains(x, y)
+        if inside != self._inside:
+            self._inside = inside
+            if inside:
+                self.on_enter()
+            else:
+                self.on_leave()
+
+    def distance(self, x, y):
+        """光标到下一次可能触发状态变化的位置的距离，供自适应轮询计算间隔"""
+        zones = self.zones
+        if zones is None:
+            return None
+        if self.hidden:
+            return zones.reveal.distance(x, y)
+        return zones.window.boundary_distance(x, y)
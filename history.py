@@ -0,0 +1,351 @@
+"""
+切换历史
+
+每次主题切换追加一行紧凑的 JSON 到历史文件：
+
+    {"t":1760000000.123,"s":"schedule","o":"light","n":"dark","d":12.5,"r":false}
+
+t 为时间戳，s 为来源（manual / schedule / cli / ipc / control / external），
+o / n 为切换前后的主题，d 为耗时（毫秒，外部修改为 null），r 表示是否重启了
+资源管理器。
+
+当前段 history.jsonl 超过 max_bytes 后改名为 history-<序号>.jsonl 并记入
+索引 history-index.json（各段的首末时间和条数），段数超过 max_segments 时
+删除最旧的段。按日期范围查询时，根据索引跳过整段不在范围内的旧段；
+统计逐行读取，内存占用与日志大小无关。追加记录时直接拼出 JSON 文本，json
+（连同 re、enum 约 10 ms）在轮换和查询时、datetime 在统计时才导入，一次性
+命令不加载它们。
+"""
+import _thread
+import os
+import time
+
+from settings import config_base_dir, write_text_atomic
+
+HISTORY_DIR = 'history'
+ACTIVE_NAME = 'history.jsonl'
+INDEX_NAME = 'history-index.json'
+SEGMENT_PREFIX = 'history-'
+SEGMENT_SUFFIX = '.jsonl'
+DEFAULT_MAX_BYTES = 256 * 1024
+DEFAULT_MAX_SEGMENTS = 20
+PERIODS = ('day', 'week')
+THEMES = ('dark', 'light')
+# 本进程写入后这段时间内，变更通知报告的同一主题视为自己的写入，不记为外部修改
+EXTERNAL_GRACE = 2.0
+
+
+class HistoryLog:
+    """只追加的切换历史，按大小分段轮换"""
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, max_segments=DEFAULT_MAX_SEGMENTS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_segments = max_segments
+        self.active_path = os.path.join(directory, ACTIVE_NAME)
+        self.index_path = os.path.join(directory, INDEX_NAME)
+        # 与 theme_state 相同，不为一把锁导入 threading
+        self._lock = _thread.allocate_lock()
+        self.stats = {'records': 0, 'rotations': 0, 'pruned': 0, 'errors': 0}
+        # 上一次查询打开的段数（含当前段）
+        self.last_query_segments = 0
+
+    def record(self, source, old, new, duration=None, restarted=False, when=None):
+        """追加一条记录；写入失败只计数和提示，不影响切换"""
+        entry = {'t': round(time.time() if when is None else when, 3), 's': source, 'o': old, 'n': new,
+                 'd': None if duration is None else round(duration * 1000, 3), 'r': bool(restarted)}
+        line = format_entry(entry) + '\n'
+        with self._lock:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(self.active_path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+                    size = f.tell()
+                self.stats['records'] += 1
+                if size >= self.max_bytes:
+                    self._rotate()
+            except OSError as e:
+                self.stats['errors'] += 1
+                print(f"写入切换历史失败: {e}")
+
+    def _rotate(self):
+        import json
+        index = self.load_index()
+        first, last, count = scan_segment(self.active_path)
+        name = f"{SEGMENT_PREFIX}{index['next']:05d}{SEGMENT_SUFFIX}"
+        os.replace(self.active_path, os.path.join(self.directory, name))
+        index['segments'].append({'file': name, 'first': first, 'last': last, 'count': count})
+        index['next'] += 1
+        while len(index['segments']) > self.max_segments:
+            old = index['segments'].pop(0)
+            try:
+                os.remove(os.path.join(self.directory, old['file']))
+            except FileNotFoundError:
+                pass
+            self.stats['pruned'] += 1
+        write_text_atomic(self.index_path, json.dumps(index, indent=1))
+        self.stats['rotations'] += 1
+
+    def load_index(self):
+        """读取段索引；不存在或损坏时扫描各段重建"""
+        import json
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if isinstance(index.get('segments'), list) and isinstance(index.get('next'), int):
+                return index
+        except (OSError, ValueError, AttributeError):
+            pass
+        return self.rebuild_index()
+
+    def rebuild_index(self):
+        segments = []
+        try:
+            names = sorted(name for name in os.listdir(self.directory)
+                           if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+                           and name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)].isdigit())
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            first, last, count = scan_segment(os.path.join(self.directory, name))
+            segments.append({'file': name, 'first': first, 'last': last, 'count': count})
+        next_number = int(names[-1][len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]) + 1 if names else 1
+        return {'segments': segments, 'next': next_number}
+
+    def records(self, start=None, end=None):
+        """按时间顺序逐条产生 [start, end) 内的记录；整段不在范围内的旧段不打开"""
+        index = self.load_index()
+        paths = [os.path.join(self.directory, segment['file']) for segment in index['segments']
+                 if not ((start is not None and segment['last'] is not None and segment['last'] < start)
+                         or (end is not None and segment['first'] is not None and segment['first'] >= end))]
+        self.last_query_segments = len(paths) + 1
+        for path in paths + [self.active_path]:
+            for entry in read_segment(path):
+                if (start is None or entry['t'] >= start) and (end is None or entry['t'] < end):
+                    yield entry
+
+
+def format_entry(entry):
+    """
+    与 json.dumps(entry, separators=(',', ':')) 相同的文本。取值只有数字、布尔、None
+    和来源/主题名，直接拼接；出现其他字符串时才交给 json
+    """
+    parts = []
+    for key, value in entry.items():
+        if value is None:
+            text = 'null'
+        elif isinstance(value, bool):
+            text = 'true' if value else 'false'
+        elif isinstance(value, (int, float)) and value == value and abs(value) != float('inf'):
+            text = repr(value)
+        elif isinstance(value, str) and value.isidentifier() and len(value.encode('utf-8')) == len(value):
+            text = f'"{value}"'
+        else:
+            import json
+            return json.dumps(entry, separators=(',', ':'))
+        parts.append(f'"{key}":{text}')
+    return '{' + ','.join(parts) + '}'
+
+
+def read_segment(path):
+    """逐行读取一个段，跳过损坏的行（如写入中途断电留下的半行）"""
+    import json
+    try:
+        f = open(path, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        return
+    with f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict) and isinstance(entry.get('t'), (int, float)):
+                yield entry
+
+
+def scan_segment(path):
+    """(首条时间, 末条时间, 条数)，空段为 (None, None, 0)"""
+    first = last = None
+    count = 0
+    for entry in read_segment(path):
+        if first is None:
+            first = entry['t']
+        last = entry['t']
+        count += 1
+    return first, last, count
+
+
+def bucket_start(moment, period):
+    """moment（本地时间 datetime）所在的日 / 周（周一开始）的起点"""
+    import datetime
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == 'week':
+        day -= datetime.timedelta(days=day.weekday())
+    return day
+
+
+def bucket_label(start, period):
+    if period == 'week':
+        year, week, _ = start.isocalendar()
+        return f"{year}-W{week:02d}"
+    return start.strftime('%Y-%m-%d')
+
+
+def next_bucket(start, period):
+    # 按日历日期前进再取零点，夏令时切换的那天也落在正确的零点
+    import datetime
+    days = 7 if period == 'week' else 1
+    return bucket_start(start + datetime.timedelta(days=days, hours=12), period)
+
+
+class Bucket:
+    def __init__(self, label):
+        self.label = label
+        self.switches = 0
+        self.sources = {}
+        self.to_theme = {theme: 0 for theme in THEMES}
+        self.timed = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.restarts = 0
+        self.seconds = {theme: 0.0 for theme in THEMES}
+
+    def add(self, entry):
+        self.switches += 1
+        source = entry.get('s', 'unknown')
+        self.sources[source] = self.sources.get(source, 0) + 1
+        if entry.get('n') in self.to_theme:
+            self.to_theme[entry['n']] += 1
+        if entry.get('d') is not None:
+            self.timed += 1
+            self.total_ms += entry['d']
+            self.max_ms = max(self.max_ms, entry['d'])
+        if entry.get('r'):
+            self.restarts += 1
+
+    def to_dict(self):
+        return {'period': self.label, 'switches': self.switches, 'sources': dict(self.sources),
+                'to_dark': self.to_theme['dark'], 'to_light': self.to_theme['light'],
+                'avg_ms': round(self.total_ms / self.timed, 3) if self.timed else None,
+                'max_ms': round(self.max_ms, 3), 'restarts': self.restarts,
+                'dark_hours': round(self.seconds['dark'] / 3600, 3),
+                'light_hours': round(self.seconds['light'] / 3600, 3)}
+
+
+def aggregate(entries, period='day', start=None, end=None):
+    """
+    把按时间排序的记录流汇总为每日 / 每周统计，返回 [Bucket.to_dict()]。
+    各模式的时长按相邻两次切换之间的主题计算，跨越日 / 周边界的区间拆分计入；
+    start / end（时间戳）给出时，首条记录之前和末条记录之后的时间也计入。
+    只保留各时间段的累计值，不保存记录本身。
+    """
+    import datetime
+    if period not in PERIODS:
+        raise ValueError(f"未知的统计周期: {period}（可选 {', '.join(PERIODS)}）")
+    buckets = {}
+    theme = None
+    since = start
+
+    def bucket_for(moment):
+        begin = bucket_start(moment, period)
+        label = bucket_label(begin, period)
+        if label not in buckets:
+            buckets[label] = Bucket(label)
+        return buckets[label]
+
+    def add_interval(theme, begin, finish):
+        if theme not in THEMES or begin is None or finish <= begin:
+            return
+        moment = datetime.datetime.fromtimestamp(begin)
+        while True:
+            boundary = next_bucket(bucket_start(moment, period), period).timestamp()
+            segment_end = min(boundary, finish)
+            bucket_for(moment).seconds[theme] += segment_end - moment.timestamp()
+            if segment_end >= finish:
+                return
+            moment = datetime.datetime.fromtimestamp(boundary)
+
+    for entry in entries:
+        moment = entry['t']
+        # 第一条记录之前处于它的原主题
+        add_interval(theme if theme is not None else entry.get('o'), since, moment)
+        bucket_for(datetime.datetime.fromtimestamp(moment)).add(entry)
+        theme = entry.get('n')
+        since = moment
+    if end is not None:
+        add_interval(theme, since, end)
+    return [buckets[label].to_dict() for label in sorted(buckets)]
+
+
+def parse_date(text):
+    """'YYYY-MM-DD' -> 当天本地零点的时间戳；格式错误时抛出 ValueError"""
+    import datetime
+    try:
+        return datetime.datetime.strptime(text, '%Y-%m-%d').timestamp()
+    except ValueError:
+        raise ValueError(f"日期格式应为 YYYY-MM-DD: {text!r}")
+
+
+def query(log, period='day', since=None, until=None, now=None):
+    """
+    统计 [since, until] 日期范围（含首尾两天）内的切换，返回 [统计]。
+    since / until 为 'YYYY-MM-DD' 或 None；until 为空时统计到 now。
+    """
+    start = parse_date(since) if since else None
+    end = parse_date(until) + 86400 if until else None
+    now = time.time() if now is None else now
+    end = now if end is None else min(end, now)
+    return aggregate(log.records(start, end), period, start, end)
+
+
+def format_table(rows):
+    """统计结果的文本表格"""
+    lines = [f"{'时间段':<9}{'切换':>6}{'手动':>6}{'定时':>6}{'外部':>6}{'平均耗时':>12}{'重启':>6}"
+             f"{'暗色时长':>10}{'浅色时长':>10}"]
+    for row in rows:
+        sources = row['sources']
+        manual = sum(count for source, count in sources.items() if source not in ('schedule', 'external'))
+        average = f"{row['avg_ms']:.1f} ms" if row['avg_ms'] is not None else '-'
+        lines.append(f"{row['period']:<12}{row['switches']:>8}{manual:>8}{sources.get('schedule', 0):>8}"
+                     f"{sources.get('external', 0):>8}{average:>16}{row['restarts']:>8}"
+                     f"{row['dark_hours']:>13.1f}h{row['light_hours']:>13.1f}h")
+    if len(lines) == 1:
+        lines.append('（没有记录）')
+    return lines
+
+
+def create_history_log(settings, config_path):
+    """按配置创建 HistoryLog（放在配置文件旁的 history 目录）；未启用时返回 None"""
+    if not settings.history_enabled:
+        return None
+    return HistoryLog(os.path.join(config_base_dir(config_path), HISTORY_DIR),
+                      max_bytes=settings.history_max_kb * 1024, max_segments=settings.history_segments)
+
+
+class HistoryRecorder:
+    """
+    把 ThemeController 的切换和状态缓存报告的外部修改写入 HistoryLog。
+    本进程刚写入的主题在 EXTERNAL_GRACE 秒内再被报告时视为自己的写入（注册表 /
+    dconf 的变更通知也会报告本进程的修改）。
+    """
+
+    def __init__(self, log):
+        self.log = log
+        self._last_local = (None, 0.0)
+
+    def expect(self, theme):
+        """本进程即将写入 theme（在写入前调用，变更通知可能先于 on_switch 到达）"""
+        self._last_local = (theme, time.monotonic())
+
+    def on_switch(self, source, old, new, duration, restarted):
+        self.expect(new)
+        self.log.record(source, old, new, duration, restarted)
+
+    def on_state_changed(self, theme, origin):
+        if origin != 'external' or theme not in THEMES:
+            return
+        last_theme, at = self._last_local
+        if theme == last_theme and time.monotonic() - at < EXTERNAL_GRACE:
+            return
+        self.log.record('external', 'dark' if theme == 'light' else 'light', theme)
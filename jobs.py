@@ -0,0 +1,154 @@
+"""
+后台任务执行器
+
+切换主题、重启资源管理器等耗时操作在独立的工作线程中执行，不阻塞
+Tk 主循环；完成（成功、失败或超时）后通过 dispatch 把回调送回 Tk 线程，
+界面据此立即解锁，而不是按固定时长猜测。
+
+同一 key 的任务在开始执行前重复提交时合并为一个：使用最新提交的函数，
+回调全部保留，因此连续点击不会排起多次资源管理器重启。
+"""
+import collections
+import threading
+import time
+
+import tracing
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+TIMEOUT = 'timeout'
+
+
+class Job:
+    """一次后台任务及其结果"""
+
+    def __init__(self, key, func, timeout=None):
+        self.key = key
+        self.func = func
+        self.timeout = timeout
+        self.callbacks = []
+        self.state = PENDING
+        self.result = None
+        self.error = None
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.state in (DONE, FAILED, TIMEOUT)
+
+    @property
+    def duration(self):
+        """执行耗时（秒），尚未结束时为 None"""
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+
+class JobRunner:
+    """
+    单工作线程的任务执行器，任务按提交顺序串行执行。
+    dispatch(callback) 负责把 callback 安排到 Tk 线程执行。
+    """
+
+    def __init__(self, dispatch, name='ThemeSwitcherJobs'):
+        self.dispatch = dispatch
+        self.name = name
+        self._queue = collections.deque()
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+        self.running = None
+        self.stats = {'submitted': 0, 'coalesced': 0, 'done': 0, 'failed': 0, 'timeouts': 0}
+
+    def submit(self, key, func, on_done=None, timeout=None):
+        """
+        提交任务并返回 Job。若同 key 的任务仍在排队，则合并进该任务。
+        on_done(job) 在 Tk 线程中调用；timeout 秒后仍未完成时以 TIMEOUT 状态回调。
+        """
+        with self._cond:
+            self.stats['submitted'] += 1
+            job = self._pending.get(key)
+            if job is not None:
+                self.stats['coalesced'] += 1
+                job.func = func
+                job.timeout = timeout
+            else:
+                job = Job(key, func, timeout)
+                self._pending[key] = job
+                self._queue.append(job)
+                self._cond.notify()
+            if on_done:
+                job.callbacks.append(on_done)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker_loop, name=self.name, daemon=True)
+                self._thread.start()
+        return job
+
+    def is_busy(self, key=None):
+        """是否有任务在执行或排队；给出 key 时只看该 key"""
+        with self._cond:
+            if key is None:
+                return bool(self._queue) or self.running is not None
+            return key in self._pending or (self.running is not None and self.running.key == key)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                job = self._queue.popleft()
+                del self._pending[job.key]
+                self.running = job
+                job.state = RUNNING
+                job.started_at = time.monotonic()
+
+            watchdog = None
+            if job.timeout:
+                watchdog = threading.Timer(job.timeout, self._finish, (job, TIMEOUT))
+                watchdog.daemon = True
+                watchdog.start()
+            try:
+                with tracing.span('job.run', key=job.key):
+                    result = job.func()
+            except Exception as e:
+                job.error = e
+                self._finish(job, FAILED)
+            else:
+                self._finish(job, DONE, result)
+            finally:
+                if watchdog:
+                    watchdog.cancel()
+                with self._cond:
+                    self.running = None
+
+    def _finish(self, job, state, result=None):
+        # 超时与正常完成可能竞争，只有第一次生效
+        with self._cond:
+            if job.finished:
+                return
+            job.state = state
+            job.result = result
+            job.finished_at = time.monotonic()
+            self.stats['timeouts' if state == TIMEOUT else state] += 1
+            callbacks = list(job.callbacks)
+        if callbacks:
+            self.dispatch(lambda: self._run_callbacks(job, callbacks))
+
+    def _run_callbacks(self, job, callbacks):
+        for callback in callbacks:
+            try:
+                callback(job)
+            except Exception as e:
+                print(f"任务回调失败: {e}")
@@ -0,0 +1,310 @@
+"""
+Linux 桌面主题后端
+
+GNOME 及遵循 freedesktop 外观约定的桌面用 org.gnome.desktop.interface 的
+color-scheme 键（'prefer-dark' / 'default'）表示浅色/暗色偏好，XDG 桌面门户
+（org.freedesktop.appearance color-scheme）也由它得出；GTK3 应用另看 gtk-theme
+（如 Adwaita / Adwaita-dark）。ColorSchemeThemeBackend 把这些键映射为与注册表
+相同的主题值，调度器、停靠窗口和配置无需区分平台。
+
+键值存储（store）提供 read(keys)、write(values) 和 watch(callback)：
+
+- DconfStore: dconf dump 一次读取全部键，dconf load 一次写入多个键，
+  dconf watch 订阅变化（阻塞读取输出，不轮询）；
+- GSettingsStore: 没有 dconf 命令时使用 gsettings（gsettings monitor 订阅）。
+  gsettings 没有批量写入，一次切换按修改的键数调用 gsettings set（最多两次），
+  "一次切换只写一次"只对 dconf 成立；
+- MemoryDesktopStore: 本地替身，记录调用次数，可模拟外部修改，用于在没有
+  桌面会话的环境中运行整个程序和基准。
+"""
+import os
+
+import tracing
+from theme_backend import THEME_VALUE_NAMES, ThemeBackend, theme_to_value
+
+SCHEMA = 'org.gnome.desktop.interface'
+DCONF_DIR = '/org/gnome/desktop/interface/'
+COLOR_SCHEME = 'color-scheme'
+GTK_THEME = 'gtk-theme'
+# 未设置时的默认值（dconf dump 只列出修改过的键）
+DEFAULTS = {COLOR_SCHEME: 'default', GTK_THEME: 'Adwaita'}
+SCHEME_VALUES = {'dark': 'prefer-dark', 'light': 'default'}
+DARK_SUFFIX = '-dark'
+# GTK 内置的主题，不在主题目录中
+BUILTIN_GTK_THEMES = ('Adwaita', 'Adwaita-dark', 'HighContrast', 'HighContrastInverse')
+COMMAND_TIMEOUT = 5
+
+
+def format_gvariant_string(text):
+    return "'" + text.replace('\\', '\\\\').replace("'", "\\'") + "'"
+
+
+def parse_gvariant_string(text):
+    """GVariant 文本格式的字符串（'...' 或 "..."）转为 str；不是字符串时原样返回"""
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in '\'"':
+        chars = []
+        escaped = False
+        for char in text[1:-1]:
+            if escaped or char != '\\':
+                chars.append(char)
+                escaped = False
+            else:
+                escaped = True
+        return ''.join(chars)
+    return text
+
+
+def gtk_theme_dirs():
+    home = os.path.expanduser('~')
+    data_home = os.environ.get('XDG_DATA_HOME') or os.path.join(home, '.local', 'share')
+    data_dirs = (os.environ.get('XDG_DATA_DIRS') or '/usr/local/share:/usr/share').split(':')
+    return [os.path.join(home, '.themes'), os.path.join(data_home, 'themes')] + \
+        [os.path.join(path, 'themes') for path in data_dirs if path]
+
+
+def gtk_theme_exists(name):
+    if name in BUILTIN_GTK_THEMES:
+        return True
+    return any(os.path.isdir(os.path.join(path, name)) for path in gtk_theme_dirs())
+
+
+def gtk_theme_variant(current, theme, exists=gtk_theme_exists):
+    """
+    当前 GTK 主题对应 theme 的变体（Yaru <-> Yaru-dark）；
+    变体不存在时返回 None，只修改 color-scheme。
+    """
+    base = current[:-len(DARK_SUFFIX)] if current.endswith(DARK_SUFFIX) else current
+    variant = base + DARK_SUFFIX if theme == 'dark' else base
+    if variant == current:
+        return current
+    return variant if exists(variant) else None
+
+
+class ColorSchemeThemeBackend(ThemeBackend):
+    """
+    通过 color-scheme（及 gtk-theme）读写浅色/暗色偏好，一次切换只调用一次 store.write
+    （store 能否一次写入多个键见各 store 的说明）
+    """
+    name = 'color-scheme'
+
+    def __init__(self, store, gtk_theme_exists=gtk_theme_exists):
+        self.store = store
+        self.gtk_theme_exists = gtk_theme_exists
+
+    def read_values(self):
+        scheme = self.store.read((COLOR_SCHEME,)).get(COLOR_SCHEME, DEFAULTS[COLOR_SCHEME])
+        return {name: theme_to_value('dark' if scheme == SCHEME_VALUES['dark'] else 'light')
+                for name in THEME_VALUE_NAMES}
+
+    def write_values(self, values):
+        # 两个注册表值在桌面上对应同一个偏好
+        theme = 'light' if values.get('AppsUseLightTheme', values.get('SystemUsesLightTheme')) == 1 else 'dark'
+        current = self.store.read((COLOR_SCHEME, GTK_THEME))
+        batch = {COLOR_SCHEME: SCHEME_VALUES[theme]}
+        gtk_theme = gtk_theme_variant(current.get(GTK_THEME, DEFAULTS[GTK_THEME]), theme, self.gtk_theme_exists)
+        if gtk_theme is not None:
+            batch[GTK_THEME] = gtk_theme
+        changes = {key: value for key, value in batch.items() if current.get(key, DEFAULTS[key]) != value}
+        if changes:
+            self.store.write(changes)
+
+
+class StoreWatch:
+    """watch() 返回的订阅，stop() 结束监听进程"""
+
+    def __init__(self, process):
+        self.process = process
+
+    def stop(self):
+        if self.process.poll() is None:
+            self.process.terminate()
+
+
+class CommandStore:
+    """
+    dconf / gsettings 命令的公共部分：运行命令和监听输出。
+    subprocess 在第一次调用命令时才导入，不增加 --status 等一次性命令的启动时间。
+    """
+    name = None
+
+    def __init__(self, executable, run=None, popen=None):
+        self.executable = executable
+        self.run = run
+        self.popen = popen
+        self.calls = 0
+
+    def command(self, *args, stdin=None):
+        import subprocess
+        if self.run is None:
+            self.run = subprocess.run
+        self.calls += 1
+        try:
+            with tracing.span('process.spawn', script=self.name):
+                completed = self.run((self.executable,) + args, input=stdin, stdout=subprocess.PIPE,
+                                     stderr=subprocess.PIPE, universal_newlines=True, timeout=COMMAND_TIMEOUT)
+        except subprocess.SubprocessError as e:
+            raise OSError(f"{self.name} {args[0]} 失败: {e}") from e
+        tracing.count('process.spawns')
+        if completed.returncode != 0:
+            raise OSError(f"{self.name} {args[0]} 失败: {completed.stderr.strip() or completed.returncode}")
+        return completed.stdout
+
+    def watch(self, callback):
+        """启动监听进程，callback(keys) 在监听线程中收到发生变化的键"""
+        import subprocess
+        import threading
+        if self.popen is None:
+            self.popen = subprocess.Popen
+        process = self.popen((self.executable,) + self.watch_args(), stdout=subprocess.PIPE,
+                             stderr=subprocess.DEVNULL, universal_newlines=True)
+        thread = threading.Thread(target=self._watch_loop, args=(process, callback),
+                                  name=f'ThemeSwitcher-{self.name}-watch', daemon=True)
+        thread.start()
+        return StoreWatch(process)
+
+    def _watch_loop(self, process, callback):
+        for line in process.stdout:
+            key = self.parse_watch_line(line)
+            if key:
+                callback({key})
+        process.stdout.close()
+
+
+class DconfStore(CommandStore):
+    name = 'dconf'
+
+    def read(self, keys):
+        values = {}
+        for line in self.command('dump', DCONF_DIR).splitlines():
+            key, sep, value = line.partition('=')
+            if sep and key in keys:
+                values[key] = parse_gvariant_string(value)
+        return values
+
+    def write(self, values):
+        # 一次 dconf load 写入所有键，桌面只收到一次变更
+        lines = ['[/]'] + [f"{key}={format_gvariant_string(value)}" for key, value in values.items()]
+        self.command('load', DCONF_DIR, stdin='\n'.join(lines) + '\n')
+
+    def watch_args(self):
+        return ('watch', DCONF_DIR)
+
+    def parse_watch_line(self, line):
+        # 输出为 "键路径" 一行、"  值" 一行、空行
+        if line.startswith(DCONF_DIR):
+            return line.strip()[len(DCONF_DIR):]
+        return None
+
+
+class GSettingsStore(CommandStore):
+    """gsettings 没有批量写入，逐键设置：write 对每个键各调用一次 gsettings set"""
+    name = 'gsettings'
+
+    def read(self, keys):
+        return {key: parse_gvariant_string(self.command('get', SCHEMA, key)) for key in keys}
+
+    def write(self, values):
+        for key, value in values.items():
+            self.command('set', SCHEMA, key, format_gvariant_string(value))
+
+    def watch_args(self):
+        return ('monitor', SCHEMA)
+
+    def parse_watch_line(self, line):
+        # 输出为 "键: 值"
+        key, sep, _ = line.partition(':')
+        return key.strip() if sep else None
+
+
+class MemoryWatch:
+    def __init__(self, store, callback):
+        self.store = store
+        self.callback = callback
+
+    def stop(self):
+        if self.callback in self.store.watchers:
+            self.store.watchers.remove(self.callback)
+
+
+class MemoryDesktopStore:
+    """本地替身：键值保存在内存中，calls 记录读写次数，external_write 模拟其他程序修改"""
+    name = 'memory'
+
+    def __init__(self, values=None):
+        self.values = dict(DEFAULTS, **(values or {}))
+        self.watchers = []
+        self.calls = 0
+        self.writes = 0
+        import threading
+        self._lock = threading.Lock()
+
+    def read(self, keys):
+        with self._lock:
+            self.calls += 1
+            return {key: self.values[key] for key in keys if key in self.values}
+
+    def write(self, values):
+        with self._lock:
+            self.calls += 1
+            self.writes += 1
+            self.values.update(values)
+        self._notify(values)
+
+    def watch(self, callback):
+        self.watchers.append(callback)
+        return MemoryWatch(self, callback)
+
+    def external_write(self, values):
+        """模拟设置面板或其他工具修改键值（不计入本进程的调用次数）"""
+        with self._lock:
+            self.values.update(values)
+        self._notify(values)
+
+    def _notify(self, values):
+        for callback in list(self.watchers):
+            callback(set(values))
+
+
+class DesktopChangeSource:
+    """订阅 store 的变化，color-scheme 改变时通知状态缓存（接口同 theme_state 的通知源）"""
+
+    def __init__(self, store):
+        self.store = store
+        self._watch = None
+
+    def start(self, callback):
+        if self._watch is None:
+            self._watch = self.store.watch(lambda keys: callback() if COLOR_SCHEME in keys else None)
+
+    def stop(self):
+        if self._watch is not None:
+            self._watch.stop()
+            self._watch = None
+
+
+def find_executable(name):
+    """在 PATH 中查找命令（同 shutil.which，避免为此导入 shutil）"""
+    for directory in os.environ.get('PATH', os.defpath).split(os.pathsep):
+        path = os.path.join(directory, name)
+        if directory and os.path.isfile(path) and os.access(path, os.X_OK):
+            return path
+    return None
+
+
+def create_desktop_store():
+    """
+    选择 store：THEME_SWITCHER_DESKTOP_STORE 可指定 memory / dconf / gsettings；
+    未指定时，有桌面会话（D-Bus 会话总线）则按 dconf、gsettings 的顺序选择，都没有时返回 None。
+    """
+    requested = os.environ.get('THEME_SWITCHER_DESKTOP_STORE')
+    if requested == 'memory':
+        return MemoryDesktopStore()
+    if not requested and not os.environ.get('DBUS_SESSION_BUS_ADDRESS'):
+        return None
+    for store_class in (DconfStore, GSettingsStore):
+        if requested in (None, '', store_class.name):
+            executable = find_executable(store_class.name)
+            if executable:
+                return store_class(executable)
+    return None
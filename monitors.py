@@ -0,0 +1,206 @@
+"""
+显示器布局
+
+MonitorLayout 是某一时刻所有显示器工作区（不含任务栏）的只读快照，建立时
+就为每台显示器的每条边算好相邻显示器（用于判断内侧边），停靠吸附和热区计算
+只查这份索引。布局由提供者缓存，只在显示配置或工作区变化时重新枚举：
+
+- Win32MonitorProvider: EnumDisplayMonitors，隐藏窗口监听 WM_DISPLAYCHANGE 和
+  工作区变化（WM_SETTINGCHANGE / SPI_SETWORKAREA）；
+- TkScreenProvider: 非 Windows 平台，把 Tk 报告的屏幕当作单台显示器；
+- FakeMonitorProvider: 任意矩形，用于测试和基准。
+"""
+import sys
+
+from docking import Rect
+
+SIDES = ('left', 'right', 'top', 'bottom')
+MONITORINFOF_PRIMARY = 0x00000001
+
+
+def _overlaps(a_start, a_end, b_start, b_end):
+    return a_start < b_end and b_start < a_end
+
+
+class MonitorLayout:
+    """显示器布局快照；monitors[0] 为主显示器"""
+
+    def __init__(self, monitors):
+        if not monitors:
+            raise ValueError("至少需要一台显示器")
+        self.monitors = list(monitors)
+        # neighbors[(序号, 边)] = 与该边相接的其他显示器
+        self.neighbors = {}
+        for index, monitor in enumerate(self.monitors):
+            for side in SIDES:
+                self.neighbors[(index, side)] = [other for other in self.monitors
+                                                 if other is not monitor and self._touches(monitor, side, other)]
+
+    @staticmethod
+    def _touches(monitor, side, other):
+        if side == 'left':
+            return other.right == monitor.left and _overlaps(monitor.top, monitor.bottom, other.top, other.bottom)
+        if side == 'right':
+            return other.left == monitor.right and _overlaps(monitor.top, monitor.bottom, other.top, other.bottom)
+        if side == 'top':
+            return other.bottom == monitor.top and _overlaps(monitor.left, monitor.right, other.left, other.right)
+        return other.top == monitor.bottom and _overlaps(monitor.left, monitor.right, other.left, other.right)
+
+    @property
+    def primary(self):
+        return self.monitors[0]
+
+    def monitor_at(self, x, y):
+        """包含该点的显示器，不在任何显示器上时返回 None"""
+        for monitor in self.monitors:
+            if monitor.contains(x, y):
+                return monitor
+        return None
+
+    def nearest(self, x, y):
+        """包含该点或离该点最近的显示器"""
+        return min(self.monitors, key=lambda monitor: monitor.distance(x, y))
+
+    def is_interior(self, monitor, side, span):
+        """monitor 的 side 边在 span（窗口区域）范围内是否与其他显示器相接"""
+        index = self.monitors.index(monitor)
+        for other in self.neighbors[(index, side)]:
+            if side in ('left', 'right'):
+                if _overlaps(span.top, span.bottom, other.top, other.bottom):
+                    return True
+            elif _overlaps(span.left, span.right, other.left, other.right):
+                return True
+        return False
+
+    def snap(self, window, threshold):
+        """
+        拖动结束时判断吸附：在窗口中心所在（或最近）的显示器上，按左、右、上、下
+        的顺序找第一条与窗口相距不超过 threshold 的边。返回 (边, 显示器) 或 (None, None)。
+        """
+        monitor = self.nearest((window.left + window.right) // 2, (window.top + window.bottom) // 2)
+        if window.left <= monitor.left + threshold:
+            return 'left', monitor
+        if window.right >= monitor.right - threshold:
+            return 'right', monitor
+        if window.top <= monitor.top + threshold:
+            return 'top', monitor
+        if window.bottom >= monitor.bottom - threshold:
+            return 'bottom', monitor
+        return None, None
+
+    def __eq__(self, other):
+        return isinstance(other, MonitorLayout) and self.monitors == other.monitors
+
+
+class FakeMonitorProvider:
+    """由调用方给定显示器矩形；set_monitors() 模拟显示配置变化"""
+
+    def __init__(self, monitors):
+        self.layout = MonitorLayout(monitors)
+        self.on_change = None
+        self.enumerations = 1
+
+    def get_layout(self):
+        return self.layout
+
+    def start(self, on_change):
+        self.on_change = on_change
+
+    def stop(self):
+        self.on_change = None
+
+    def set_monitors(self, monitors):
+        self.layout = MonitorLayout(monitors)
+        self.enumerations += 1
+        if self.on_change:
+            self.on_change()
+
+
+class TkScreenProvider:
+    """非 Windows 平台：以 Tk 报告的屏幕大小作为唯一的显示器（须在 Tk 线程创建）"""
+
+    def __init__(self, root):
+        self.layout = MonitorLayout([Rect(0, 0, root.winfo_screenwidth(), root.winfo_screenheight())])
+
+    def get_layout(self):
+        return self.layout
+
+    def start(self, on_change):
+        pass
+
+    def stop(self):
+        pass
+
+
+class Win32MonitorProvider:
+    """EnumDisplayMonitors 枚举各显示器的工作区，显示配置或工作区变化后重新枚举并通知"""
+
+    def __init__(self):
+        self.enumerations = 0
+        self.window = None
+        self.layout = self.enumerate()
+
+    def enumerate(self):
+        import ctypes
+        from ctypes import wintypes
+
+        class MONITORINFO(ctypes.Structure):
+            _fields_ = [('cbSize', wintypes.DWORD), ('rcMonitor', wintypes.RECT),
+                        ('rcWork', wintypes.RECT), ('dwFlags', wintypes.DWORD)]
+
+        user32 = ctypes.windll.user32
+        monitor_enum_proc = ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.HMONITOR, wintypes.HDC,
+                                               ctypes.POINTER(wintypes.RECT), wintypes.LPARAM)
+        found = []
+
+        def callback(hmonitor, hdc, rect, data):
+            info = MONITORINFO()
+            info.cbSize = ctypes.sizeof(MONITORINFO)
+            user32.GetMonitorInfoW(hmonitor, ctypes.byref(info))
+            # 工作区：停靠的窗口不应压在任务栏上
+            bounds = info.rcWork
+            found.append((not info.dwFlags & MONITORINFOF_PRIMARY,
+                          Rect(bounds.left, bounds.top, bounds.right, bounds.bottom)))
+            return True
+
+        user32.EnumDisplayMonitors(None, None, monitor_enum_proc(callback), 0)
+        self.enumerations += 1
+        if not found:
+            raise OSError("没有枚举到显示器")
+        # 主显示器排在最前，其余按位置排序
+        found.sort(key=lambda item: (item[0], item[1].left, item[1].top))
+        return MonitorLayout([rect for _, rect in found])
+
+    def get_layout(self):
+        return self.layout
+
+    def start(self, on_change):
+        from system_events import SPI_SETWORKAREA, WM_DISPLAYCHANGE, WM_SETTINGCHANGE, SystemEventWindow
+
+        def on_display_change(wparam, lparam):
+            self.layout = self.enumerate()
+            on_change()
+
+        def on_setting_change(wparam, lparam):
+            # 任务栏移动或自动隐藏时显示配置不变，只有工作区变了
+            if wparam == SPI_SETWORKAREA:
+                on_display_change(wparam, lparam)
+
+        self.window = SystemEventWindow({WM_DISPLAYCHANGE: on_display_change,
+                                         WM_SETTINGCHANGE: on_setting_change},
+                                        class_name='ThemeSwitcherDisplayWindow')
+        self.window.start()
+
+    def stop(self):
+        if self.window:
+            self.window.stop()
+
+
+def create_default_monitor_provider(root):
+    """Windows 上枚举真实显示器，其他平台使用 Tk 报告的屏幕"""
+    if sys.platform == 'win32':
+        try:
+            return Win32MonitorProvider()
+        except (OSError, AttributeError) as e:
+            print(f"枚举显示器失败: {e}")
+    return TkScreenProvider(root)
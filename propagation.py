@@ -0,0 +1,353 @@
+"""
+主题传播插件
+
+不少工具不跟随 Windows 的主题设置，而是读取自己的配置文件（编辑器的
+settings.json、终端配置、Electron 应用等）。每次主题实际切换后，
+PropagationRunner 并发运行配置的插件，把对应的设置改为当前主题：
+
+    [Propagation:vscode]
+    type = json
+    path = %APPDATA%\\Code\\User\\settings.json
+    # 嵌套的键用 / 分隔，如 profiles/defaults/colorScheme
+    key = workbench.colorTheme
+    dark = Default Dark Modern
+    light = Default Light Modern
+    # 超时（秒），默认 5
+    timeout = 5
+
+    [Propagation:app]
+    type = replace
+    path = ~/.config/app/app.conf
+    # 正则表达式（多行模式），匹配的整段文本替换为 dark / light 的值
+    pattern = ^theme\\s*=.*$
+    dark = theme = dark
+    light = theme = light
+
+每个插件在独立的线程中运行并单独计时；超时的插件记为 timeout，不再等待
+（它仍在运行时，下一次切换跳过该插件）。修改同一文件的插件依次运行，
+不会互相覆盖。文件只在内容确实变化时才写入，并先写临时文件再替换，
+不会留下写了一半的配置。
+"""
+import json
+import os
+import re
+import stat
+import threading
+import time
+
+import tracing
+from settings import write_text_atomic
+
+DEFAULT_TIMEOUT = 5.0
+SECTION_PREFIX = 'Propagation:'
+KEY_SEPARATOR = '/'
+BOM = '\ufeff'
+
+CHANGED = 'changed'
+UNCHANGED = 'unchanged'
+FAILED = 'failed'
+TIMEOUT = 'timeout'
+BUSY = 'busy'
+
+STATUS_NAMES = {CHANGED: '已修改', UNCHANGED: '无需修改', FAILED: '失败', TIMEOUT: '超时', BUSY: '上次仍在运行'}
+
+# JSONC（带注释、尾随逗号的 JSON）：先匹配字符串，使字符串中的 // 和 , 保持原样
+JSONC_COMMENT = re.compile(r'("(?:[^"\\\n]|\\.)*")|//[^\n]*|/\*.*?\*/', re.S)
+JSONC_TRAILING_COMMA = re.compile(r'("(?:[^"\\\n]|\\.)*")|,(\s*[}\]])')
+
+
+def strip_jsonc(text):
+    """去掉注释和尾随逗号，字符串内容不变，结果可交给 json 解析"""
+    text = JSONC_COMMENT.sub(lambda match: match.group(1) or ' ', text)
+    return JSONC_TRAILING_COMMA.sub(lambda match: match.group(1) or match.group(2), text)
+
+
+def edit_file(path, transform):
+    """
+    读取 path，transform(text) 返回新内容（换行符统一为 \\n）；内容不同时原子写入
+    并返回 True。保留原文件的换行符、UTF-8 BOM 和权限。
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        text = f.read()
+    newline = '\r\n' if '\r\n' in text else '\n'
+    bom = text[:1] == BOM
+    body = (text[1:] if bom else text).replace('\r\n', '\n')
+    new_body = transform(body)
+    if new_body == body:
+        return False
+    write_text_atomic(path, (BOM if bom else '') + new_body, newline=newline,
+                      mode=stat.S_IMODE(os.stat(path).st_mode))
+    return True
+
+
+class PropagationPlugin:
+    """插件基类：apply(theme) 把主题传播到某个应用，有修改时返回 True，失败时抛出异常"""
+
+    def __init__(self, name, timeout=DEFAULT_TIMEOUT):
+        self.name = name
+        self.timeout = timeout
+
+    def apply(self, theme):
+        raise NotImplementedError
+
+
+class JsonSettingPlugin(PropagationPlugin):
+    """
+    把 JSON 配置文件中 key 的值设为 values[theme]。
+    键已存在时原地替换该值，保留注释和格式（VS Code 的 settings.json 是允许
+    注释和尾随逗号的 JSONC）；替换后重新解析，确认改动的正是完整键路径上的
+    值、其余内容不变。纯 JSON 中键不存在时解析整个文件后写入（格式按 4 空格
+    缩进重排）；JSONC 无法在保留注释的同时添加键，报错而不修改。
+    """
+
+    def __init__(self, name, path, key, values, timeout=DEFAULT_TIMEOUT):
+        super().__init__(name, timeout)
+        self.path = path
+        self.keys = key.split(KEY_SEPARATOR)
+        self.values = values
+
+    def apply(self, theme):
+        return edit_file(self.path, lambda text: self.transform(text, self.values[theme]))
+
+    def transform(self, text, value):
+        jsonc = False
+        try:
+            data = json.loads(text) if text.strip() else {}
+        except ValueError:
+            jsonc = True
+            try:
+                data = json.loads(strip_jsonc(text))
+            except ValueError as e:
+                raise ValueError(f"无法解析 {self.path}: {e}")
+        if self.lookup(data) == value:
+            return text
+        expected = self.updated(data, value)
+        # 同名的键可能出现在其他对象或注释中：逐个尝试，以重新解析的结果为准
+        pattern = r'("%s"\s*:\s*)("(?:[^"\\]|\\.)*"|[^\s,{}\[\]/]+)' % re.escape(self.keys[-1])
+        for match in re.finditer(pattern, text):
+            replaced = text[:match.start(2)] + json.dumps(value, ensure_ascii=False) + text[match.end(2):]
+            try:
+                if json.loads(strip_jsonc(replaced) if jsonc else replaced) == expected:
+                    return replaced
+            except ValueError:
+                continue
+        if jsonc:
+            raise ValueError(f"{self.path} 含注释或尾随逗号，找不到可原地替换的 "
+                             f"{KEY_SEPARATOR.join(self.keys)}，为保留注释不修改该文件")
+        return json.dumps(expected, ensure_ascii=False, indent=4) + '\n'
+
+    def updated(self, data, value):
+        """data 的副本，按 keys 设为 value；路径上有非对象时抛出 ValueError"""
+        data = json.loads(json.dumps(data))
+        if not isinstance(data, dict):
+            raise ValueError(f"{self.path} 的顶层不是对象")
+        node = data
+        for key in self.keys[:-1]:
+            node = node.setdefault(key, {})
+            if not isinstance(node, dict):
+                raise ValueError(f"{self.path} 中的 {key} 不是对象")
+        node[self.keys[-1]] = value
+        return data
+
+    def lookup(self, data):
+        """data 中按 keys 取到的值，不存在时为 None"""
+        for key in self.keys:
+            if not isinstance(data, dict):
+                return None
+            data = data.get(key)
+        return data
+
+
+class TextReplacePlugin(PropagationPlugin):
+    """把文本文件中匹配 pattern（多行模式）的内容替换为 values[theme]；没有匹配时报错"""
+
+    def __init__(self, name, path, pattern, values, timeout=DEFAULT_TIMEOUT):
+        super().__init__(name, timeout)
+        self.path = path
+        self.pattern = re.compile(pattern, re.MULTILINE)
+        self.values = values
+
+    def apply(self, theme):
+        return edit_file(self.path, lambda text: self.transform(text, self.values[theme]))
+
+    def transform(self, text, value):
+        new_text, count = self.pattern.subn(lambda match: value, text)
+        if not count:
+            raise ValueError(f"{self.path} 中没有匹配 {self.pattern.pattern} 的内容")
+        return new_text
+
+
+PLUGIN_TYPES = {'json': JsonSettingPlugin, 'replace': TextReplacePlugin}
+
+
+def plugin_from_options(name, options):
+    """从 Propagation:<名称> 段的键值创建插件；配置错误时抛出 ValueError"""
+    plugin_type = options.get('type', 'json')
+    if plugin_type not in PLUGIN_TYPES:
+        raise ValueError(f"插件 {name} 的类型无效: {plugin_type}（可选 {', '.join(PLUGIN_TYPES)}）")
+    target = 'key' if plugin_type == 'json' else 'pattern'
+    missing = [option for option in ('path', target, 'dark', 'light') if not options.get(option)]
+    if missing:
+        raise ValueError(f"插件 {name} 缺少设置: {', '.join(missing)}")
+    try:
+        timeout = float(options.get('timeout', DEFAULT_TIMEOUT))
+    except ValueError:
+        raise ValueError(f"插件 {name} 的超时无效: {options['timeout']!r}")
+    if timeout <= 0:
+        raise ValueError(f"插件 {name} 的超时应大于 0")
+    path = os.path.expanduser(os.path.expandvars(options['path']))
+    values = {'dark': options['dark'], 'light': options['light']}
+    try:
+        return PLUGIN_TYPES[plugin_type](name, path, options[target], values, timeout=timeout)
+    except re.error as e:
+        raise ValueError(f"插件 {name} 的正则表达式无效: {e}")
+
+
+def build_plugins(settings):
+    """按配置创建插件列表；任一插件配置错误时抛出 ValueError"""
+    return [plugin_from_options(name, options) for name, options in settings.propagation.items()]
+
+
+class PluginResult:
+    def __init__(self, plugin):
+        self.plugin = plugin
+        self.status = None
+        self.error = None
+        self.duration = 0.0
+
+    def to_dict(self):
+        return {'plugin': self.plugin.name, 'status': self.status, 'error': self.error,
+                'duration_ms': round(self.duration * 1000, 3)}
+
+
+class PropagationReport:
+    """一次传播的结果：逐个插件的状态与耗时"""
+
+    def __init__(self, theme, results, elapsed):
+        self.theme = theme
+        self.results = results
+        self.elapsed = elapsed
+
+    def count(self, status):
+        return sum(1 for result in self.results if result.status == status)
+
+    @property
+    def failed(self):
+        return [result for result in self.results if result.status in (FAILED, TIMEOUT, BUSY)]
+
+    def summary(self):
+        return {'theme': self.theme, 'plugins': len(self.results), 'changed': self.count(CHANGED),
+                'unchanged': self.count(UNCHANGED), 'failed': len(self.failed),
+                'elapsed_ms': round(self.elapsed * 1000, 3)}
+
+    def to_dict(self):
+        return dict(self.summary(), results=[result.to_dict() for result in self.results])
+
+    def lines(self, failed_only=False):
+        """逐个插件的文本报告"""
+        lines = []
+        for result in self.failed if failed_only else self.results:
+            line = f"{result.plugin.name:<24}{STATUS_NAMES[result.status]:<10}{result.duration * 1000:8.1f} ms"
+            if result.error:
+                line += f"  {result.error}"
+            lines.append(line)
+        return lines
+
+
+def target_key(plugin):
+    """插件修改的文件（规范化后的路径），不修改文件的插件为 None"""
+    path = getattr(plugin, 'path', None)
+    return os.path.normcase(os.path.realpath(path)) if path else None
+
+
+class PropagationRunner:
+    """
+    每个插件一个线程并发运行，各自按超时等待，返回 PropagationReport；
+    修改同一文件的插件持有同一把锁，依次读改写
+    """
+
+    def __init__(self, plugins):
+        self.plugins = list(plugins)
+        self._running = set()
+        self._lock = threading.Lock()
+        # 插件名 -> 所改文件的锁
+        self._file_locks = {}
+        locks = {}
+        for plugin in self.plugins:
+            key = target_key(plugin)
+            if key is not None:
+                self._file_locks[plugin.name] = locks.setdefault(key, threading.Lock())
+        self.stats = {plugin.name: {'runs': 0, 'changed': 0, 'failed': 0, 'timeouts': 0,
+                                    'last_ms': 0.0, 'max_ms': 0.0} for plugin in self.plugins}
+
+    @property
+    def timeout(self):
+        """一次运行最长的等待时间（插件并发，取各插件超时的最大值）"""
+        return max((plugin.timeout for plugin in self.plugins), default=0)
+
+    def run(self, theme):
+        started = time.perf_counter()
+        with tracing.span('propagation.run', theme=theme, plugins=len(self.plugins)):
+            pending = []
+            results = []
+            # 插件线程与超时判定都在锁内写结果，先到者生效
+            for plugin in self.plugins:
+                result = PluginResult(plugin)
+                results.append(result)
+                with self._lock:
+                    if plugin.name in self._running:
+                        # 上次超时的插件仍在运行，不再叠加一个线程
+                        result.status = BUSY
+                        continue
+                    self._running.add(plugin.name)
+                done = threading.Event()
+                thread = threading.Thread(target=self._run_plugin, args=(plugin, theme, result, done),
+                                          name=f'ThemeSwitcherPlugin-{plugin.name}', daemon=True)
+                thread.start()
+                pending.append((result, done, started + plugin.timeout))
+            for result, done, deadline in pending:
+                if done.wait(max(0.0, deadline - time.perf_counter())):
+                    continue
+                with self._lock:
+                    if result.status is None:
+                        result.status = TIMEOUT
+                        result.error = f"超过 {result.plugin.timeout:g} 秒未完成"
+                        result.duration = time.perf_counter() - started
+        for result in results:
+            self._record(result)
+        return PropagationReport(theme, results, time.perf_counter() - started)
+
+    def _run_plugin(self, plugin, theme, result, done):
+        started = time.perf_counter()
+        error = None
+        try:
+            file_lock = self._file_locks.get(plugin.name)
+            with tracing.span('propagation.plugin', plugin=plugin.name):
+                if file_lock is None:
+                    status = CHANGED if plugin.apply(theme) else UNCHANGED
+                else:
+                    with file_lock:
+                        status = CHANGED if plugin.apply(theme) else UNCHANGED
+        except Exception as e:
+            status = FAILED
+            error = str(e) or type(e).__name__
+        with self._lock:
+            self._running.discard(plugin.name)
+            # 已被判定超时的结果不再改写
+            if result.status is None:
+                result.status = status
+                result.error = error
+                result.duration = time.perf_counter() - started
+        done.set()
+
+    def _record(self, result):
+        stats = self.stats[result.plugin.name]
+        stats['runs'] += 1
+        if result.status == CHANGED:
+            stats['changed'] += 1
+        elif result.status == TIMEOUT:
+            stats['timeouts'] += 1
+        elif result.status in (FAILED, BUSY):
+            stats['failed'] += 1
+        stats['last_ms'] = round(result.duration * 1000, 3)
+        stats['max_ms'] = max(stats['max_ms'], stats['last_ms'])
@@ -0,0 +1,191 @@
+"""
+调度器虚拟时钟模拟
+
+用 VirtualClock / VirtualTimer 驱动真实的 ThemeScheduler，在不等待真实时间
+的情况下回放任意时长（含指定时区的夏令时切换、跨午夜、休眠恢复），
+报告每一次触发的事件和计时器唤醒次数，用于回归检查正确性与开销。
+
+用法: python schedule_simulator.py [--dark HH:MM] [--light HH:MM] [--solar LAT LON] [--year 2024]
+                                   [--zone Europe/Berlin] [--suspend 2024-03-31T01:00 7200] [--events]
+"""
+import argparse
+import heapq
+import time
+from datetime import datetime
+
+from scheduler import DailySchedule, ThemeScheduler
+from solar import SolarSchedule
+from theme_backend import MemoryThemeBackend
+from theme_controller import ThemeController
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:
+    # Python 3.9 以下没有 zoneinfo，只能使用系统本地时区
+    ZoneInfo = None
+
+
+class VirtualClock:
+    """虚拟时钟：时间只在模拟器推进时变化；zone 为 None 时使用系统本地时区"""
+
+    def __init__(self, start_ts, zone=None):
+        self.current = start_ts
+        self.tz = ZoneInfo(zone) if zone else None
+
+    def time(self):
+        return self.current
+
+    def now(self):
+        if self.tz is None:
+            return datetime.fromtimestamp(self.current)
+        return datetime.fromtimestamp(self.current, self.tz).replace(tzinfo=None)
+
+    def to_timestamp(self, local_dt):
+        if self.tz is None:
+            return local_dt.timestamp()
+        return local_dt.replace(tzinfo=self.tz).timestamp()
+
+
+class VirtualTimer:
+    """按虚拟时间排序的计时器队列"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self._queue = []
+        self._cancelled = set()
+        self._seq = 0
+
+    def call_later(self, delay_ms, callback):
+        self._seq += 1
+        heapq.heappush(self._queue, (self.clock.current + delay_ms / 1000, self._seq, callback))
+        return self._seq
+
+    def cancel(self, handle):
+        self._cancelled.add(handle)
+
+    def next_due(self):
+        """丢弃已取消的计时器，返回最早到期时间（没有则为 None）"""
+        while self._queue and self._queue[0][1] in self._cancelled:
+            self._cancelled.discard(heapq.heappop(self._queue)[1])
+        return self._queue[0][0] if self._queue else None
+
+    def pop(self):
+        return heapq.heappop(self._queue)
+
+
+class FiredEvent:
+    """一次调度触发的记录"""
+
+    def __init__(self, timestamp, local_time, theme, changed, scheduled_time):
+        self.timestamp = timestamp
+        self.local_time = local_time
+        self.theme = theme
+        self.changed = changed
+        # 计时器对应的日程时刻；时钟跳变触发时为 None
+        self.scheduled_time = scheduled_time
+
+    def __repr__(self):
+        flag = '切换' if self.changed else '跳过'
+        return f"{self.local_time:%Y-%m-%d %H:%M:%S} {self.theme:<5} {flag}"
+
+
+class SimulationResult:
+    def __init__(self, events, wakeups, clock_jumps, elapsed, stats):
+        self.events = events
+        self.wakeups = wakeups
+        self.clock_jumps = clock_jumps
+        self.elapsed = elapsed
+        self.stats = stats
+
+    def off_schedule(self):
+        """触发时的本地时间与日程时刻不一致的事件（如落在夏令时空档中的时刻）"""
+        return [e for e in self.events
+                if e.scheduled_time is not None and e.scheduled_time != e.local_time]
+
+
+def simulate(schedule, start, end, zone=None, initial_theme='light', suspends=()):
+    """
+    从本地时间 start 回放到 end。
+    suspends: [(本地开始时间, 持续秒数)]，期间计时器不触发，恢复后通知时钟跳变。
+    """
+    started = time.perf_counter()
+    clock = VirtualClock(0, zone)
+    clock.current = clock.to_timestamp(start)
+    end_ts = clock.to_timestamp(end)
+    pending_suspends = sorted((clock.to_timestamp(at), seconds) for at, seconds in suspends)
+    timer = VirtualTimer(clock)
+    controller = ThemeController(MemoryThemeBackend(initial_theme))
+    events = []
+    current = {'scheduled': None}
+
+    def on_event(theme):
+        changed = controller.set_theme(theme, source='schedule')
+        events.append(FiredEvent(clock.current, clock.now(), theme, changed, current['scheduled']))
+
+    scheduler = ThemeScheduler(timer, on_event, clock=clock)
+    scheduler.set_schedule(schedule)
+    scheduler.arm()
+
+    while True:
+        due = timer.next_due()
+        if due is None or due > end_ts:
+            break
+        if pending_suspends and pending_suspends[0][0] < due:
+            suspend_at, seconds = pending_suspends.pop(0)
+            # 休眠期间计时器不触发，恢复后由系统事件通知时钟跳变
+            clock.current = suspend_at + seconds
+            while timer.next_due() is not None and timer.next_due() <= clock.current:
+                _, _, callback = timer.pop()
+                current['scheduled'] = None
+                callback()
+            current['scheduled'] = None
+            scheduler.on_clock_jump()
+            continue
+        _, _, callback = timer.pop()
+        clock.current = due
+        scheduled = scheduler.next_event[0] if scheduler.next_event else None
+        current['scheduled'] = scheduled
+        callback()
+
+    return SimulationResult(events, scheduler.wakeups, scheduler.clock_jumps,
+                            time.perf_counter() - started, dict(controller.stats))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回放调度器并报告触发事件与唤醒次数")
+    parser.add_argument('--dark', default='21:04')
+    parser.add_argument('--light', default='06:00')
+    parser.add_argument('--solar', nargs=2, type=float, metavar=('LAT', 'LON'),
+                        help="使用日出日落日程代替固定时间")
+    parser.add_argument('--sunrise-offset', type=int, default=0, help="日出偏移（分钟）")
+    parser.add_argument('--sunset-offset', type=int, default=0, help="日落偏移（分钟）")
+    parser.add_argument('--year', type=int, default=datetime.now().year)
+    parser.add_argument('--zone', default=None, help="IANA 时区名，如 Europe/Berlin；默认系统时区")
+    parser.add_argument('--suspend', nargs=2, action='append', default=[], metavar=('START', 'SECONDS'),
+                        help="模拟休眠：本地开始时间（ISO 格式）与持续秒数，可重复")
+    parser.add_argument('--events', action='store_true', help="逐条列出触发的事件")
+    args = parser.parse_args()
+
+    if args.solar:
+        schedule = SolarSchedule(args.solar[0], args.solar[1], args.sunrise_offset, args.sunset_offset,
+                                 tz=ZoneInfo(args.zone) if args.zone else None)
+    else:
+        schedule = DailySchedule.from_times(args.dark, args.light)
+    suspends = [(datetime.fromisoformat(at), int(seconds)) for at, seconds in args.suspend]
+    result = simulate(schedule, datetime(args.year, 1, 1), datetime(args.year + 1, 1, 1),
+                      zone=args.zone, suspends=suspends)
+
+    if args.events:
+        for event in result.events:
+            print(event)
+    print(f"时区 {args.zone or '系统本地'}，{args.year} 年全年：")
+    print(f"  触发 {len(result.events)} 次（切换 {result.stats['scheduled_switches']}，"
+          f"跳过 {result.stats['scheduled_noop_skips']}）")
+    print(f"  计时器唤醒 {result.wakeups} 次，时钟跳变 {result.clock_jumps} 次")
+    for event in result.off_schedule():
+        print(f"  偏离日程: 计划 {event.scheduled_time:%m-%d %H:%M}，实际 {event.local_time:%m-%d %H:%M}")
+    print(f"  模拟耗时 {result.elapsed * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
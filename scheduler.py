@@ -0,0 +1,236 @@
+"""
+定时切换调度器
+
+配置加载或修改时把 dark_time / light_time 编译成按一天内时刻排序的事件表，
+之后每个事件只布置一个精确计时器，到点即执行，不再阶梯式反复唤醒。
+计时器迟到或提前过多（休眠恢复、手动改时间）以及收到系统时间跳变通知时，
+直接按当前时刻应处的主题执行并重新布置。
+
+调度核心只依赖注入的时钟（clock）和计时器（timer）：界面中使用
+SystemClock + TkTimer，命令行守护进程使用 LoopTimer，
+schedule_simulator 中使用虚拟时钟快速回放。
+"""
+import bisect
+import heapq
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+
+import tracing
+
+# 实际唤醒时刻偏离预定时刻超过该秒数即视为时钟跳变
+CLOCK_JUMP_THRESHOLD = 120
+# 计时器提前触发不超过该秒数时视为事件已到期（计时器与墙上时钟存在毫秒级偏差）
+DUE_TOLERANCE = 1.0
+
+
+def parse_hhmm(text):
+    """解析 'HH:MM'，返回当天的秒数；格式错误时抛出 ValueError"""
+    try:
+        hour, minute = text.split(':')
+        hour, minute = int(hour), int(minute)
+    except (AttributeError, ValueError):
+        raise ValueError(f"时间格式不正确: {text!r}")
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"时间超出范围: {text!r}")
+    return hour * 3600 + minute * 60
+
+
+class DailySchedule:
+    """每天重复的事件表：[(当天秒数, 主题)]，按时刻排序"""
+
+    def __init__(self, events):
+        if not events:
+            raise ValueError("日程至少需要一个事件")
+        self.events = sorted(events)
+        self._seconds = [second for second, _ in self.events]
+
+    @classmethod
+    def from_times(cls, dark_time, light_time):
+        return cls([(parse_hhmm(dark_time), 'dark'), (parse_hhmm(light_time), 'light')])
+
+    def next_event(self, now):
+        """返回 now 之后的下一个事件 (datetime, 主题)"""
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        second_of_day = (now - midnight).total_seconds()
+        index = bisect.bisect_right(self._seconds, second_of_day)
+        if index < len(self.events):
+            second, theme = self.events[index]
+            return midnight + timedelta(seconds=second), theme
+        second, theme = self.events[0]
+        return midnight + timedelta(days=1, seconds=second), theme
+
+    def theme_at(self, now):
+        """返回 now 时刻按日程应处的主题（最近一个已过事件的主题）"""
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        second_of_day = (now - midnight).total_seconds()
+        index = bisect.bisect_right(self._seconds, second_of_day)
+        # index 为 0 时沿用前一天最后一个事件
+        return self.events[index - 1][1]
+
+
+class SystemClock:
+    """系统时钟：本地墙上时间与 Unix 时间戳"""
+
+    def time(self):
+        """当前 Unix 时间戳"""
+        return time.time()
+
+    def now(self):
+        """当前本地时间（naive datetime）"""
+        return datetime.now()
+
+    def to_timestamp(self, local_dt):
+        """本地时间转时间戳，夏令时由操作系统时区规则处理"""
+        return local_dt.timestamp()
+
+
+class TkTimer:
+    """基于 Tk 的 after / after_cancel 的计时器"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def call_later(self, delay_ms, callback):
+        return self.root.after(delay_ms, callback)
+
+    def cancel(self, handle):
+        self.root.after_cancel(handle)
+
+
+class LoopTimer:
+    """
+    无界面时使用的计时器：run() 在当前线程中阻塞执行到点的回调，
+    call_later / cancel / stop 可以从任意线程调用。
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._cancelled = set()
+        self._counter = 0
+        self._cond = threading.Condition()
+        self._stopped = False
+
+    def call_later(self, delay_ms, callback):
+        with self._cond:
+            self._counter += 1
+            handle = self._counter
+            heapq.heappush(self._heap, (time.monotonic() + delay_ms / 1000, handle, callback))
+            self._cond.notify()
+        return handle
+
+    def cancel(self, handle):
+        with self._cond:
+            self._cancelled.add(handle)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def run(self):
+        """执行回调直到 stop() 被调用"""
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if self._heap:
+                        delay = self._heap[0][0] - time.monotonic()
+                        if delay <= 0:
+                            break
+                        self._cond.wait(delay)
+                    else:
+                        self._cond.wait()
+                if self._stopped:
+                    return
+                _, handle, callback = heapq.heappop(self._heap)
+                if handle in self._cancelled:
+                    self._cancelled.discard(handle)
+                    continue
+            try:
+                callback()
+            except Exception as e:
+                print(f"计时器回调失败: {e}")
+
+
+class ThemeScheduler:
+    """
+    单计时器调度器：任一时刻最多只有一个计时器，对应下一个事件。
+    on_event(theme) 在计时器线程（界面中即 Tk 线程）中被调用，
+    应当是幂等的“确保主题”操作。
+    """
+
+    def __init__(self, timer, on_event, clock=None, jump_threshold=CLOCK_JUMP_THRESHOLD):
+        self.timer = timer
+        self.on_event = on_event
+        self.clock = clock or SystemClock()
+        self.jump_threshold = jump_threshold
+        self.schedule = None
+        self.timer_id = None
+        self.next_event = None
+        self.wakeups = 0
+        self.clock_jumps = 0
+
+    def set_schedule(self, schedule):
+        """更换日程；若已布置计时器则按新日程重新布置"""
+        self.schedule = schedule
+        if self.timer_id:
+            self.arm()
+
+    def arm(self, after=None):
+        """
+        取消旧计时器并为下一个事件布置唯一的计时器；after 为刚执行的事件时刻，
+        计时器略早于它触发时也从它之后找下一个事件，同一事件不会再布置一次
+        """
+        self.cancel()
+        if self.schedule is None:
+            return
+        now = self.clock.now()
+        if after is not None and after > now:
+            now = after
+        self.next_event = self.schedule.next_event(now)
+        # 用时间戳相减，跨越夏令时切换时延迟依然准确；向上取整，计时器不会早于事件触发
+        delay = self.clock.to_timestamp(self.next_event[0]) - self.clock.time()
+        self.timer_id = self.timer.call_later(max(0, math.ceil(delay * 1000)), self._fire)
+
+    def cancel(self):
+        if self.timer_id:
+            self.timer.cancel(self.timer_id)
+            self.timer_id = None
+        self.next_event = None
+
+    def _fire(self):
+        self.timer_id = None
+        self.wakeups += 1
+        when, theme = self.next_event
+        now = self.clock.now()
+        lateness = self.clock.time() - self.clock.to_timestamp(when)
+        jumped = abs(lateness) > self.jump_threshold
+        if jumped:
+            # 计时器严重偏离预定时刻：按当前时刻应处的主题执行
+            self.clock_jumps += 1
+            theme = self.schedule.theme_at(now)
+        elif lateness < -DUE_TOLERANCE:
+            # 提前较多但不算跳变：事件尚未到期，为它重新布置计时器
+            self.arm()
+            return
+        tracing.count('scheduler.wakeups')
+        try:
+            with tracing.span('scheduler.wake', theme=theme, lateness_s=round(lateness, 3), clock_jump=jumped):
+                self.on_event(theme)
+        finally:
+            self.arm(after=None if jumped else when)
+
+    def on_clock_jump(self):
+        """系统时间跳变或休眠恢复后调用：立即确保正确主题并重新布置"""
+        if self.schedule is None or not self.timer_id:
+            return
+        self.wakeups += 1
+        self.clock_jumps += 1
+        theme = self.schedule.theme_at(self.clock.now())
+        tracing.count('scheduler.clock_jumps')
+        try:
+            with tracing.span('scheduler.wake', theme=theme, clock_jump=True):
+                self.on_event(theme)
+        finally:
+            self.arm()
@@ -0,0 +1,189 @@
+"""
+配置读写 - 不依赖 Tk，界面与命令行共用
+
+Settings 保存 config.ini 中 TimerSettings / ScheduleRules 的内容；
+build_schedule 根据设置编译调度器使用的日程。配置文件的位置、缓存和
+延迟写入见 config_store.py。
+"""
+import io
+import os
+
+# 本地控制接口的默认端口
+DEFAULT_CONTROL_PORT = 47631
+
+
+class Settings:
+    """config.ini 的内存表示"""
+
+    def __init__(self):
+        self.enabled = False
+        self.dark_time = "20:00"
+        self.light_time = "06:00"
+        self.restart_on_switch = True
+        self.apply_strategy = 'broadcast'
+        # 日程模式：fixed 使用固定时间，solar 按日出日落（经纬度 + 分钟偏移），
+        # rules 在固定时间基础上叠加 ScheduleRules 段中的周末/日期范围/日历例外
+        self.mode = 'fixed'
+        self.latitude = None
+        self.longitude = None
+        self.sunrise_offset = 0
+        self.sunset_offset = 0
+        self.schedule_rules = {}
+        # 上次显示的主题（State 段），启动时用于首次绘制，无需先读注册表
+        self.last_theme = None
+        # 本地控制接口（ControlServer 段），默认关闭
+        self.control_enabled = False
+        self.control_port = DEFAULT_CONTROL_PORT
+        self.control_token = ''
+        # 运行跟踪（Diagnostics 段，只读），默认关闭
+        self.tracing = False
+        self.trace_buffer = 0
+        # 主题方案（Profile:<名称> 段的原始键值，只读）与 Profiles 段中各主题使用的方案名
+        self.profiles = {}
+        self.theme_profiles = {}
+        # 主题传播插件（Propagation:<名称> 段的原始键值，只读，不做 % 插值以便写 %APPDATA%）
+        self.propagation = {}
+        # 切换历史（History 段，只读）：默认开启，每段 256 KB，最多保留 20 段
+        self.history_enabled = True
+        self.history_max_kb = 256
+        self.history_segments = 20
+
+
+def _get_value(section, getter, option, fallback, errors):
+    """section.getint 等的包装：errors 为列表时，格式错误记入其中并返回 fallback"""
+    try:
+        return getattr(section, getter)(option, fallback=fallback)
+    except ValueError as e:
+        if errors is None:
+            raise
+        errors.append(f"[{section.name}] {option}: {e}")
+        return fallback
+
+
+def settings_from_config(config, errors=None):
+    """
+    从已解析的 ConfigParser 读取设置；数值格式错误时抛出 ValueError。
+    errors 为列表时不抛出：出错的项使用默认值，错误描述记入 errors。
+    """
+    settings = Settings()
+    if 'TimerSettings' in config:
+        section = config['TimerSettings']
+        settings.enabled = _get_value(section, 'getboolean', 'enabled', False, errors)
+        settings.dark_time = section.get('dark_time', fallback='20:00')
+        settings.light_time = section.get('light_time', fallback='06:00')
+        settings.restart_on_switch = _get_value(section, 'getboolean', 'restart_on_switch', True, errors)
+        settings.apply_strategy = section.get('apply_strategy', fallback='broadcast')
+        settings.mode = section.get('mode', fallback='fixed')
+        settings.latitude = _get_value(section, 'getfloat', 'latitude', None, errors)
+        settings.longitude = _get_value(section, 'getfloat', 'longitude', None, errors)
+        settings.sunrise_offset = _get_value(section, 'getint', 'sunrise_offset', 0, errors)
+        settings.sunset_offset = _get_value(section, 'getint', 'sunset_offset', 0, errors)
+    if 'ScheduleRules' in config:
+        settings.schedule_rules = dict(config['ScheduleRules'])
+    if 'State' in config:
+        last_theme = config['State'].get('last_theme')
+        settings.last_theme = last_theme if last_theme in ('dark', 'light') else None
+    if 'ControlServer' in config:
+        section = config['ControlServer']
+        settings.control_enabled = _get_value(section, 'getboolean', 'enabled', False, errors)
+        settings.control_port = _get_value(section, 'getint', 'port', DEFAULT_CONTROL_PORT, errors)
+        settings.control_token = section.get('token', fallback='')
+    if 'Diagnostics' in config:
+        section = config['Diagnostics']
+        settings.tracing = _get_value(section, 'getboolean', 'tracing', False, errors)
+        settings.trace_buffer = _get_value(section, 'getint', 'trace_buffer', 0, errors)
+    for name in config.sections():
+        if name.startswith('Profile:'):
+            settings.profiles[name[len('Profile:'):].strip()] = dict(config[name])
+    if 'Profiles' in config:
+        settings.theme_profiles = {theme: name for theme, name in config['Profiles'].items() if name}
+    if 'History' in config:
+        section = config['History']
+        settings.history_enabled = _get_value(section, 'getboolean', 'enabled', True, errors)
+        settings.history_max_kb = max(1, _get_value(section, 'getint', 'max_kb', 256, errors))
+        settings.history_segments = max(1, _get_value(section, 'getint', 'segments', 20, errors))
+    for name in config.sections():
+        if name.startswith('Propagation:'):
+            settings.propagation[name[len('Propagation:'):].strip()] = dict(config.items(name, raw=True))
+    return settings
+
+
+def update_config(config, settings):
+    """把设置写入 ConfigParser（保留 ScheduleRules 等其他配置段）"""
+    config['TimerSettings'] = {
+        'enabled': str(settings.enabled),
+        'dark_time': settings.dark_time,
+        'light_time': settings.light_time,
+        'restart_on_switch': str(settings.restart_on_switch),
+        'apply_strategy': settings.apply_strategy,
+        'mode': settings.mode
+    }
+    if settings.latitude is not None and settings.longitude is not None:
+        config['TimerSettings'].update({
+            'latitude': str(settings.latitude),
+            'longitude': str(settings.longitude),
+            'sunrise_offset': str(settings.sunrise_offset),
+            'sunset_offset': str(settings.sunset_offset)
+        })
+    if settings.last_theme:
+        config['State'] = {'last_theme': settings.last_theme}
+    if settings.control_enabled or settings.control_token or 'ControlServer' in config:
+        config['ControlServer'] = {
+            'enabled': str(settings.control_enabled),
+            'port': str(settings.control_port),
+            'token': settings.control_token
+        }
+
+
+def render_config(config):
+    """ConfigParser 写出后的文本"""
+    buffer = io.StringIO()
+    config.write(buffer)
+    return buffer.getvalue()
+
+
+def write_text_atomic(path, text, newline=None, mode=None):
+    """
+    先写同目录下的临时文件再替换，写入中途失败不会留下半个配置文件。
+    newline 同 open()；mode 为替换后文件的权限（默认为临时文件的 0600）。
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    # 只有保存时才需要 tempfile，不在导入时加载（命令行一次性命令只读取配置）
+    import tempfile
+    fd, tmp_path = tempfile.mkstemp(prefix='.config-', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline=newline) as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def build_schedule(settings, base_dir='.'):
+    """把定时设置编译为日程（固定时间、日出日落或规则）；设置不完整时抛出 ValueError"""
+    if settings.mode == 'solar':
+        from solar import SolarSchedule
+        if settings.latitude is None or settings.longitude is None:
+            raise ValueError("日出日落模式需要设置 latitude 和 longitude")
+        return SolarSchedule(settings.latitude, settings.longitude,
+                             settings.sunrise_offset, settings.sunset_offset)
+    if settings.mode == 'rules':
+        from calendar_rules import build_rule_schedule
+        return build_rule_schedule(settings.schedule_rules, settings.dark_time, settings.light_time,
+                                   base_dir)
+    from scheduler import DailySchedule
+    return DailySchedule.from_times(settings.dark_time, settings.light_time)
+
+
+def config_base_dir(path):
+    """配置文件所在目录，用于解析其中的相对路径"""
+    return os.path.dirname(os.path.abspath(path))
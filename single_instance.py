@@ -0,0 +1,346 @@
+"""
+单实例与命令转发
+
+第一个启动的实例（界面或 --daemon）在本地 IPC 通道上监听：Windows 为
+命名管道 \\\\.\\pipe\\ThemeSwitcher-<用户名>，其他平台为 Unix 套接字。
+再次启动时把命令（show / toggle / set / reload）以一行 JSON 发给正在运行的
+实例并立即退出，不会再创建第二套窗口、光标检测和调度器。
+
+Unix 套接字放在只有本用户可访问（0700）的目录中：XDG_RUNTIME_DIR，未设置时
+为 /tmp 下按用户 ID 命名的专有目录。服务端和客户端都拒绝使用不属于本用户或
+权限过宽的目录和套接字，防止其他用户抢先占用地址冒充实例。
+
+客户端只用内置的 open()（Windows）或 socket，不导入 multiprocessing，
+转发一次只需几毫秒；没有实例在运行时（一次性命令的常见情况）连 json 和
+socket 都不导入。
+"""
+import os
+import stat
+import sys
+import time
+
+# 单条消息上限，防止异常客户端占用内存
+MAX_MESSAGE = 64 * 1024
+
+PIPE_ACCESS_DUPLEX = 0x00000003
+FILE_FLAG_FIRST_PIPE_INSTANCE = 0x00080000
+PIPE_TYPE_BYTE = 0x00000000
+PIPE_WAIT = 0x00000000
+PIPE_REJECT_REMOTE_CLIENTS = 0x00000008
+ERROR_PIPE_CONNECTED = 535
+ERROR_PIPE_BUSY = 231
+
+
+def instance_address():
+    """当前用户的 IPC 地址；THEME_SWITCHER_INSTANCE 可指定其他名称（测试和基准用）"""
+    name = os.environ.get('THEME_SWITCHER_INSTANCE')
+    if sys.platform == 'win32':
+        name = name or os.environ.get('USERNAME', 'default')
+        return rf'\\.\pipe\ThemeSwitcher-{name}'
+    base = os.environ.get('XDG_RUNTIME_DIR')
+    if not base:
+        # 不直接放在所有用户可写的临时目录中，而是放在本用户专有的子目录里
+        base = os.path.join(os.environ.get('TMPDIR') or '/tmp', f'theme_switcher-{os.getuid()}')
+    return os.path.join(base, f'theme_switcher-{name or os.getuid()}.sock')
+
+
+def check_private_dir(directory, create=False):
+    """
+    确认 directory 是属于当前用户、其他人无权访问的目录（不跟随符号链接），
+    否则抛出 OSError；create 为 True 时不存在则以 0700 创建
+    """
+    if create:
+        try:
+            os.mkdir(directory, 0o700)
+        except FileExistsError:
+            pass
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        raise OSError(f"{directory} 不是属于当前用户的目录，拒绝使用")
+    if info.st_mode & 0o077:
+        raise OSError(f"{directory} 的权限过宽（{oct(info.st_mode & 0o777)}），应为 0700")
+
+
+def check_own_socket(address):
+    """address 存在时确认它是属于当前用户的套接字；不存在时返回 False"""
+    try:
+        info = os.lstat(address)
+    except FileNotFoundError:
+        return False
+    if not stat.S_ISSOCK(info.st_mode) or info.st_uid != os.getuid():
+        raise OSError(f"{address} 不是属于当前用户的套接字，拒绝使用")
+    return True
+
+
+def _read_line(read, limit=MAX_MESSAGE):
+    """用 read(n) 读取一行（不含换行符）；连接在换行前关闭时返回已读内容"""
+    data = b''
+    while not data.endswith(b'\n'):
+        chunk = read(4096)
+        if not chunk:
+            break
+        data += chunk
+        if len(data) > limit:
+            raise ValueError("消息过长")
+    return data.rstrip(b'\n')
+
+
+def encode_message(message):
+    import json
+    return json.dumps(message, ensure_ascii=False).encode('utf-8') + b'\n'
+
+
+def send_command(message, address=None, timeout=1.0):
+    """
+    把命令发给正在运行的实例并返回其回复（dict）；
+    没有实例在运行时返回 None。
+    """
+    address = address or instance_address()
+    if sys.platform == 'win32':
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                pipe = open(address, 'r+b', buffering=0)
+                break
+            except FileNotFoundError:
+                return None
+            except OSError as e:
+                # 实例正在处理另一条命令时管道忙，稍后重试
+                if getattr(e, 'winerror', None) != ERROR_PIPE_BUSY or time.monotonic() > deadline:
+                    raise
+                time.sleep(0.01)
+        with pipe:
+            pipe.write(encode_message(message))
+            reply = _read_line(pipe.read)
+    else:
+        if not check_own_socket(address):
+            # 没有实例在运行：不必导入 socket
+            return None
+        check_private_dir(os.path.dirname(address))
+        import socket
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.settimeout(timeout)
+        try:
+            client.connect(address)
+        except (FileNotFoundError, ConnectionRefusedError):
+            client.close()
+            return None
+        with client:
+            client.sendall(encode_message(message))
+            reply = _read_line(client.recv)
+    if not reply:
+        return {'ok': False, 'error': '实例没有回复'}
+    import json
+    return json.loads(reply.decode('utf-8'))
+
+
+class InstanceServer:
+    """
+    在后台线程中接收其他进程转发的命令。handler(message) 在监听线程中调用，
+    返回回复 dict，须自行把界面操作投递到对应线程；handler 为 None 时
+    （实例尚在启动）回复错误。
+    """
+
+    def __init__(self, handler=None, address=None):
+        self.handler = handler
+        self.address = address or instance_address()
+        self.stats = {'received': 0}
+        self._running = False
+        self._thread = None
+        self._listener = None
+
+    def start(self):
+        """开始监听；已有其他实例在监听时返回 False"""
+        if sys.platform == 'win32':
+            listener = self._create_pipe()
+        else:
+            listener = self._create_socket()
+        if listener is None:
+            return False
+        self._listener = listener
+        self._running = True
+        target = self._pipe_loop if sys.platform == 'win32' else self._socket_loop
+        import threading
+        self._thread = threading.Thread(target=target, daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        # 连接一次以唤醒阻塞在等待连接上的监听线程
+        try:
+            send_command({'command': 'stop'}, self.address, timeout=0.2)
+        except (OSError, ValueError):
+            pass
+        if sys.platform != 'win32':
+            try:
+                os.remove(self.address)
+            except OSError:
+                pass
+
+    def handle(self, data):
+        """处理一条请求，返回回复 dict"""
+        import json
+        try:
+            message = json.loads(data.decode('utf-8'))
+            if not isinstance(message, dict):
+                raise ValueError("消息必须是 JSON 对象")
+        except ValueError as e:
+            return {'ok': False, 'error': f"无法解析命令: {e}"}
+        command = message.get('command')
+        if command == 'ping' or (command == 'stop' and not self._running):
+            return {'ok': True}
+        self.stats['received'] += 1
+        if self.handler is None:
+            return {'ok': False, 'error': '实例正在启动，请稍后重试'}
+        try:
+            return self.handler(message)
+        except Exception as e:
+            return {'ok': False, 'error': str(e)}
+
+    # ---- Unix 套接字 ----
+
+    def _create_socket(self):
+        import socket
+        check_private_dir(os.path.dirname(self.address), create=True)
+        for _ in range(2):
+            listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            # bind 时即以 0600 创建套接字文件，不留先创建后 chmod 的间隙
+            umask = os.umask(0o177)
+            try:
+                listener.bind(self.address)
+                listener.listen(4)
+                return listener
+            except OSError as e:
+                error = e
+                listener.close()
+            finally:
+                os.umask(umask)
+            if not check_own_socket(self.address):
+                raise error
+            # 地址已存在：能连上说明实例在运行，否则是上次异常退出留下的文件
+            if self._is_alive():
+                return None
+            try:
+                os.remove(self.address)
+            except OSError:
+                return None
+        return None
+
+    def _is_alive(self):
+        """只有连接成功才说明实例在运行；连接被拒绝、超时等都视为残留文件"""
+        import socket
+        # 另一实例可能刚 bind 还未 listen，稍等后再确认一次
+        for _ in range(2):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            probe.settimeout(0.5)
+            try:
+                probe.connect(self.address)
+            except OSError:
+                probe.close()
+                time.sleep(0.05)
+                continue
+            with probe:
+                # 读完回复再关闭，避免对方回复时出错；回复与否都不影响判断
+                try:
+                    probe.sendall(encode_message({'command': 'ping'}))
+                    _read_line(probe.recv)
+                except (OSError, ValueError):
+                    pass
+            return True
+        return False
+
+    def _socket_loop(self):
+        listener = self._listener
+        try:
+            while self._running:
+                conn, _ = listener.accept()
+                with conn:
+                    conn.settimeout(1.0)
+                    try:
+                        reply = self.handle(_read_line(conn.recv))
+                        conn.sendall(encode_message(reply))
+                    except (OSError, ValueError) as e:
+                        print(f"处理转发命令失败: {e}")
+        finally:
+            listener.close()
+
+    # ---- Windows 命名管道 ----
+
+    def _create_pipe(self):
+        import ctypes
+        from ctypes import wintypes
+        self._kernel32 = kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        kernel32.CreateNamedPipeW.restype = wintypes.HANDLE
+        kernel32.CreateNamedPipeW.argtypes = (wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD, wintypes.DWORD,
+                                              wintypes.DWORD, wintypes.DWORD, wintypes.DWORD, wintypes.LPVOID)
+        kernel32.ConnectNamedPipe.argtypes = (wintypes.HANDLE, wintypes.LPVOID)
+        kernel32.DisconnectNamedPipe.argtypes = (wintypes.HANDLE,)
+        kernel32.FlushFileBuffers.argtypes = (wintypes.HANDLE,)
+        kernel32.CloseHandle.argtypes = (wintypes.HANDLE,)
+        kernel32.ReadFile.argtypes = (wintypes.HANDLE, wintypes.LPVOID, wintypes.DWORD,
+                                      ctypes.POINTER(wintypes.DWORD), wintypes.LPVOID)
+        kernel32.WriteFile.argtypes = (wintypes.HANDLE, wintypes.LPCVOID, wintypes.DWORD,
+                                       ctypes.POINTER(wintypes.DWORD), wintypes.LPVOID)
+        # FILE_FLAG_FIRST_PIPE_INSTANCE 且只允许一个管道实例：管道名即是单实例锁
+        handle = kernel32.CreateNamedPipeW(self.address,
+                                           PIPE_ACCESS_DUPLEX | FILE_FLAG_FIRST_PIPE_INSTANCE,
+                                           PIPE_TYPE_BYTE | PIPE_WAIT | PIPE_REJECT_REMOTE_CLIENTS,
+                                           1, 4096, 4096, 0, None)
+        if handle is None or handle == ctypes.c_void_p(-1).value:
+            return None
+        return handle
+
+    def _pipe_loop(self):
+        import ctypes
+        from ctypes import wintypes
+        kernel32 = self._kernel32
+        handle = self._listener
+        buffer = ctypes.create_string_buffer(4096)
+        count = wintypes.DWORD()
+
+        def read(size):
+            if not kernel32.ReadFile(handle, buffer, min(size, len(buffer)), ctypes.byref(count), None):
+                return b''
+            return buffer.raw[:count.value]
+
+        try:
+            while self._running:
+                if not kernel32.ConnectNamedPipe(handle, None) and ctypes.get_last_error() != ERROR_PIPE_CONNECTED:
+                    print(f"等待转发命令失败: {ctypes.get_last_error()}")
+                    break
+                try:
+                    data = encode_message(self.handle(_read_line(read)))
+                    kernel32.WriteFile(handle, data, len(data), ctypes.byref(count), None)
+                    kernel32.FlushFileBuffers(handle)
+                except ValueError as e:
+                    print(f"处理转发命令失败: {e}")
+                finally:
+                    kernel32.DisconnectNamedPipe(handle)
+        finally:
+            kernel32.CloseHandle(handle)
+
+
+def claim_instance(message):
+    """
+    成为唯一实例并返回已启动的 InstanceServer（handler 由调用方稍后设置）；
+    已有实例在运行时把 message 转发给它并返回 None；无法建立监听（IPC 不可用）
+    时返回 False，调用方应不带单实例功能照常启动。
+    """
+    server = InstanceServer()
+    try:
+        if server.start():
+            return server
+    except OSError as e:
+        print(f"警告：无法建立单实例监听，本次不启用单实例: {e}")
+        return False
+    try:
+        reply = send_command(message)
+    except (OSError, ValueError) as e:
+        print(f"转发命令失败: {e}")
+        return None
+    if reply is not None and not reply.get('ok'):
+        print(f"正在运行的实例未能处理命令: {reply.get('error')}")
+    return None
@@ -0,0 +1,170 @@
+"""
+日出日落日程 - 离线计算，无需联网
+
+采用标准日出方程（NOAA / Meeus 简化算法）一次性算出整年每天的日出、
+日落时间戳，按位置和年份缓存到磁盘；之后启动和调度时只做查表。
+SolarSchedule 与 DailySchedule 提供相同的 next_event / theme_at 接口。
+"""
+import json
+import math
+import os
+from datetime import date, datetime, timedelta
+
+# 太阳视半径与大气折射修正后的日出日落高度角
+SUNRISE_ALTITUDE = -0.833
+EARTH_OBLIQUITY = 23.4397
+J2000 = 2451545.0
+UNIX_EPOCH_JD = 2440587.5
+
+POLAR_DAY = 'polar_day'
+POLAR_NIGHT = 'polar_night'
+
+
+def default_cache_dir():
+    """每用户缓存目录"""
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+        return os.path.join(base, 'ThemeSwitcher', 'cache')
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'theme_switcher')
+
+
+def compute_year_table(year, latitude, longitude):
+    """
+    一次遍历算出整年每天的日出日落。
+    返回列表，每项为 [日出时间戳, 日落时间戳]，极昼/极夜日为 POLAR_DAY / POLAR_NIGHT。
+    """
+    sin_lat = math.sin(math.radians(latitude))
+    cos_lat = math.cos(math.radians(latitude))
+    sin_alt = math.sin(math.radians(SUNRISE_ALTITUDE))
+    sin_obliquity = math.sin(math.radians(EARTH_OBLIQUITY))
+    first = date(year, 1, 1).toordinal()
+    days = date(year + 1, 1, 1).toordinal() - first
+    # 自 J2000.0（2000-01-01 正午）起算的日序数
+    j2000_offset = first - date(2000, 1, 1).toordinal()
+
+    table = []
+    for day in range(days):
+        n = j2000_offset + day + 0.0008
+        mean_solar_time = n - longitude / 360
+        anomaly = math.radians((357.5291 + 0.98560028 * mean_solar_time) % 360)
+        center = 1.9148 * math.sin(anomaly) + 0.02 * math.sin(2 * anomaly) + 0.0003 * math.sin(3 * anomaly)
+        ecliptic = math.radians((math.degrees(anomaly) + center + 180 + 102.9372) % 360)
+        transit = J2000 + mean_solar_time + 0.0053 * math.sin(anomaly) - 0.0069 * math.sin(2 * ecliptic)
+        sin_decl = math.sin(ecliptic) * sin_obliquity
+        cos_decl = math.cos(math.asin(sin_decl))
+        cos_hour_angle = (sin_alt - sin_lat * sin_decl) / (cos_lat * cos_decl) if cos_lat else 2.0
+        if cos_hour_angle < -1:
+            table.append(POLAR_DAY)
+        elif cos_hour_angle > 1:
+            table.append(POLAR_NIGHT)
+        else:
+            half_day = math.degrees(math.acos(cos_hour_angle)) / 360
+            table.append([round((transit - half_day - UNIX_EPOCH_JD) * 86400),
+                          round((transit + half_day - UNIX_EPOCH_JD) * 86400)])
+    return table
+
+
+def load_year_table(year, latitude, longitude, cache_dir=None):
+    """读取磁盘缓存的年表，缺失或损坏时重新计算并写回"""
+    cache_dir = cache_dir or default_cache_dir()
+    path = os.path.join(cache_dir, f"solar_{latitude:.4f}_{longitude:.4f}_{year}.json")
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+    table = compute_year_table(year, latitude, longitude)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(table, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"写入日出日落缓存失败: {e}")
+    return table
+
+
+class SolarSchedule:
+    """
+    按日出日落切换的日程：日出 + sunrise_offset 分钟切到浅色，
+    日落 + sunset_offset 分钟切到暗色。tz 为 None 时使用系统本地时区。
+    """
+    # 向前/向后查找事件的最大天数（覆盖极昼极夜）
+    SEARCH_DAYS = 200
+
+    def __init__(self, latitude, longitude, sunrise_offset=0, sunset_offset=0, cache_dir=None, tz=None):
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValueError(f"经纬度超出范围: {latitude}, {longitude}")
+        self.latitude = round(latitude, 4)
+        self.longitude = round(longitude, 4)
+        self.sunrise_offset = sunrise_offset * 60
+        self.sunset_offset = sunset_offset * 60
+        self.cache_dir = cache_dir
+        self.tz = tz
+        self._tables = {}
+        self._day_cache = {}
+
+    def _table(self, year):
+        table = self._tables.get(year)
+        if table is None:
+            table = load_year_table(year, self.latitude, self.longitude, self.cache_dir)
+            self._tables[year] = table
+        return table
+
+    def _to_local(self, timestamp):
+        if self.tz is None:
+            return datetime.fromtimestamp(timestamp)
+        return datetime.fromtimestamp(timestamp, self.tz).replace(tzinfo=None)
+
+    def day_events(self, day):
+        """某个本地日期的事件 [(本地时间, 主题)]；极昼/极夜返回表中的标记字符串"""
+        events = self._day_cache.get(day)
+        if events is None:
+            entry = self._table(day.year)[day.timetuple().tm_yday - 1]
+            if isinstance(entry, str):
+                events = entry
+            else:
+                sunrise, sunset = entry
+                events = sorted([(self._to_local(sunrise + self.sunrise_offset), 'light'),
+                                 (self._to_local(sunset + self.sunset_offset), 'dark')])
+            if len(self._day_cache) > 64:
+                self._day_cache.clear()
+            self._day_cache[day] = events
+        return events
+
+    def sun_times(self, day):
+        """返回 (日出, 日落) 本地时间（已含偏移），极昼/极夜时为 None"""
+        events = self.day_events(day)
+        if isinstance(events, str):
+            return None
+        times = dict((theme, when) for when, theme in events)
+        return times['light'], times['dark']
+
+    def next_event(self, now):
+        """返回 now 之后的下一个事件 (datetime, 主题)"""
+        today = now.date()
+        for offset in range(-1, self.SEARCH_DAYS):
+            events = self.day_events(today + timedelta(days=offset))
+            if isinstance(events, str):
+                continue
+            for when, theme in events:
+                if when > now:
+                    return when, theme
+        # 长期极昼/极夜：一天后再检查
+        return now + timedelta(days=1), self.theme_at(now)
+
+    def theme_at(self, now):
+        """返回 now 时刻应处的主题"""
+        today = now.date()
+        for offset in range(self.SEARCH_DAYS):
+            day = today - timedelta(days=offset)
+            events = self.day_events(day)
+            if isinstance(events, str):
+                # 当天或最近一天为极昼/极夜，直接按标记决定
+                return 'light' if events == POLAR_DAY else 'dark'
+            passed = [theme for when, theme in events if when <= now]
+            if passed:
+                return passed[-1]
+        return 'light'
@@ -0,0 +1,37 @@
+"""
+启动耗时分析 - 对应命令行参数 --profile-startup
+
+按阶段记录耗时：每次 mark(phase) 记录自上一次标记以来经过的时间。
+未启用时 mark 直接返回，正常启动不受影响。
+"""
+import time
+
+
+class StartupProfiler:
+    """按阶段记录启动耗时；start 为计时起点（perf_counter），默认为创建时刻"""
+
+    def __init__(self, enabled=True, start=None):
+        self.enabled = enabled
+        self.start = time.perf_counter() if start is None else start
+        self._last = self.start
+        self.phases = []
+
+    def mark(self, phase, note=''):
+        """结束一个阶段"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self._last) * 1000, note))
+        self._last = now
+
+    @property
+    def total_ms(self):
+        return (self._last - self.start) * 1000
+
+    def report(self):
+        """返回各阶段耗时的文本表格"""
+        lines = ["启动耗时分析:"]
+        for phase, elapsed, note in self.phases:
+            lines.append(f"  {phase:<14}{elapsed:>9.1f} ms  {note}".rstrip())
+        lines.append(f"  {'total':<14}{self.total_ms:>9.1f} ms")
+        return "\n".join(lines)
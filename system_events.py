@@ -0,0 +1,185 @@
+"""
+系统事件监听 - 时间跳变、休眠恢复等通知
+
+Windows 上创建一个隐藏的顶层窗口接收 WM_TIMECHANGE / WM_POWERBROADCAST
+等广播消息，由消息驱动，不需要定时唤醒；其他平台退化为低频的
+DriftWatchdog，比较墙上时钟与单调时钟的差值来发现跳变，比较本地时间的
+UTC 偏移来发现夏令时切换和时区修改（这两种情况墙上时钟本身不跳）。
+回调均在后台线程中触发，调用方需自行转交到 Tk 线程。
+"""
+import sys
+import threading
+import time
+
+WM_DESTROY = 0x0002
+WM_CLOSE = 0x0010
+WM_TIMECHANGE = 0x001E
+WM_POWERBROADCAST = 0x0218
+WM_DISPLAYCHANGE = 0x007E
+WM_SETTINGCHANGE = 0x001A
+# WM_SETTINGCHANGE 的 wparam：任务栏移动、改变大小或自动隐藏后工作区变化
+SPI_SETWORKAREA = 0x002F
+PBT_APMRESUMESUSPEND = 0x0007
+PBT_APMRESUMEAUTOMATIC = 0x0012
+
+
+class SystemEventWindow:
+    """
+    隐藏的 Win32 顶层窗口，在独立线程中运行消息循环。
+    handlers: {消息号: callback(wparam, lparam)}
+    """
+
+    def __init__(self, handlers, class_name='ThemeSwitcherEventWindow'):
+        self.handlers = handlers
+        self.class_name = class_name
+        self.hwnd = None
+        self.thread = None
+        self._ready = threading.Event()
+
+    def start(self):
+        if self.thread:
+            return
+        self.thread = threading.Thread(target=self._message_loop, daemon=True)
+        self.thread.start()
+        self._ready.wait(2)
+
+    def stop(self):
+        if self.hwnd:
+            self._user32.PostMessageW(self.hwnd, WM_CLOSE, 0, 0)
+
+    def _message_loop(self):
+        import ctypes
+        from ctypes import wintypes
+
+        user32 = ctypes.WinDLL('user32', use_last_error=True)
+        kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        self._user32 = user32
+        LRESULT = ctypes.c_ssize_t
+        WNDPROC = ctypes.WINFUNCTYPE(LRESULT, wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM)
+
+        class WNDCLASSW(ctypes.Structure):
+            _fields_ = [('style', wintypes.UINT), ('lpfnWndProc', WNDPROC),
+                        ('cbClsExtra', ctypes.c_int), ('cbWndExtra', ctypes.c_int),
+                        ('hInstance', wintypes.HINSTANCE), ('hIcon', wintypes.HICON),
+                        ('hCursor', wintypes.HANDLE), ('hbrBackground', wintypes.HBRUSH),
+                        ('lpszMenuName', wintypes.LPCWSTR), ('lpszClassName', wintypes.LPCWSTR)]
+
+        user32.DefWindowProcW.restype = LRESULT
+        user32.DefWindowProcW.argtypes = (wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM)
+        user32.CreateWindowExW.restype = wintypes.HWND
+        user32.CreateWindowExW.argtypes = (wintypes.DWORD, wintypes.LPCWSTR, wintypes.LPCWSTR, wintypes.DWORD,
+                                           ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                                           wintypes.HWND, wintypes.HMENU, wintypes.HINSTANCE, wintypes.LPVOID)
+        user32.PostMessageW.argtypes = (wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM)
+        kernel32.GetModuleHandleW.restype = wintypes.HMODULE
+
+        def window_proc(hwnd, msg, wparam, lparam):
+            handler = self.handlers.get(msg)
+            if handler:
+                try:
+                    handler(wparam, lparam)
+                except Exception as e:
+                    print(f"系统事件处理失败: {e}")
+            if msg == WM_DESTROY:
+                user32.PostQuitMessage(0)
+                return 0
+            return user32.DefWindowProcW(hwnd, msg, wparam, lparam)
+
+        # 回调对象必须保持引用，否则会被回收
+        self._window_proc = WNDPROC(window_proc)
+        hinstance = kernel32.GetModuleHandleW(None)
+        wndclass = WNDCLASSW()
+        wndclass.lpfnWndProc = self._window_proc
+        wndclass.hInstance = hinstance
+        wndclass.lpszClassName = self.class_name
+        user32.RegisterClassW(ctypes.byref(wndclass))
+        # 不可见的顶层窗口（非 message-only 窗口），才能收到广播消息
+        self.hwnd = user32.CreateWindowExW(0, self.class_name, self.class_name, 0,
+                                           0, 0, 0, 0, None, None, hinstance, None)
+        self._ready.set()
+        if not self.hwnd:
+            print(f"系统事件窗口创建失败: {ctypes.get_last_error()}")
+            return
+
+        msg = wintypes.MSG()
+        while user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+            user32.TranslateMessage(ctypes.byref(msg))
+            user32.DispatchMessageW(ctypes.byref(msg))
+        self.hwnd = None
+        self.thread = None
+
+
+class Win32ClockJumpMonitor:
+    """通过系统广播消息感知时间修改与休眠恢复"""
+
+    def __init__(self):
+        self.window = None
+
+    def start(self, callback):
+        def on_power(wparam, lparam):
+            if wparam in (PBT_APMRESUMEAUTOMATIC, PBT_APMRESUMESUSPEND):
+                callback()
+
+        self.window = SystemEventWindow({
+            WM_TIMECHANGE: lambda wparam, lparam: callback(),
+            WM_POWERBROADCAST: on_power,
+        })
+        self.window.start()
+
+    def stop(self):
+        if self.window:
+            self.window.stop()
+
+
+def local_utc_offset():
+    """当前本地时间的 UTC 偏移（秒）；先 tzset，系统时区设置被修改后也能读到新值"""
+    if hasattr(time, 'tzset'):
+        time.tzset()
+    return time.localtime().tm_gmtoff
+
+
+class DriftWatchdog:
+    """
+    低频看门狗：每 interval 秒比较一次墙上时钟与单调时钟的走时，
+    差值超过 threshold 秒即认为发生了时间跳变或休眠；本地时间的 UTC 偏移
+    变化（夏令时切换、修改时区）同样触发回调。
+    """
+
+    def __init__(self, interval=60, threshold=30):
+        self.interval = interval
+        self.threshold = threshold
+        self.wakeups = 0
+        self.offset_changes = 0
+        self._stop_event = threading.Event()
+        self.thread = None
+
+    def start(self, callback):
+        if self.thread:
+            return
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._watch_loop, args=(callback,), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _watch_loop(self, callback):
+        last_wall, last_mono = time.time(), time.monotonic()
+        last_offset = local_utc_offset()
+        while not self._stop_event.wait(self.interval):
+            self.wakeups += 1
+            wall, mono = time.time(), time.monotonic()
+            offset = local_utc_offset()
+            if offset != last_offset:
+                self.offset_changes += 1
+            if abs((wall - last_wall) - (mono - last_mono)) > self.threshold or offset != last_offset:
+                callback()
+            last_wall, last_mono, last_offset = wall, mono, offset
+        self.thread = None
+
+
+def create_clock_jump_monitor():
+    """Windows 上使用消息驱动的监听器，其他平台使用看门狗"""
+    if sys.platform == 'win32':
+        return Win32ClockJumpMonitor()
+    return DriftWatchdog()
@@ -0,0 +1,183 @@
+"""
+主题生效策略
+
+写入注册表后需要通知正在运行的程序。BroadcastApplyStrategy 向所有顶层窗口
+广播 WM_SETTINGCHANGE("ImmersiveColorSet")，并以有限的超时等待；只有广播
+失败或超时且允许重启时，才退回到重启资源管理器。广播成功但某个程序没有
+响应变更时无从得知（注册表在广播前已写入并校验，读回它不能说明程序已更新），
+这种情况不会触发重启。
+SendMessageTimeoutW 的超时按窗口计算，挂起的窗口多时总耗时没有上限，因此
+广播在工作线程中进行，调用方最多等待 timeout_ms。
+广播器与重启操作都是可替换的接口，FakeBroadcaster 可在 Linux 上验证
+回退逻辑和耗时。
+"""
+import os
+import sys
+import time
+
+import tracing
+
+HWND_BROADCAST = 0xFFFF
+WM_SETTINGCHANGE = 0x001A
+SMTO_ABORTIFHUNG = 0x0002
+SMTO_NOTIMEOUTIFNOTHUNG = 0x0008
+IMMERSIVE_COLOR_SET = "ImmersiveColorSet"
+RESTART_EXPLORER_SCRIPT = "restart_explorer_only.bat"
+
+
+def resource_path(relative_path):
+    """打包后资源位于 PyInstaller 的临时目录，源码运行时位于当前目录"""
+    try:
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = os.path.abspath(".")
+    return os.path.join(base_path, relative_path)
+
+
+def run_restart_explorer_script(timeout=None):
+    """运行重启资源管理器脚本（唯一仍需外部进程的操作），失败时抛出 OSError"""
+    # 按需导入：命令行的一次性命令大多不需要启动子进程
+    import subprocess
+    tracing.count('process.spawns')
+    try:
+        with tracing.span('process.spawn', script=RESTART_EXPLORER_SCRIPT):
+            subprocess.run([resource_path(RESTART_EXPLORER_SCRIPT)],
+                           creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0), check=True, timeout=timeout)
+    except subprocess.SubprocessError as e:
+        raise OSError(f"重启资源管理器失败: {e}") from e
+
+
+class ApplyResult:
+    """一次主题生效的结果"""
+
+    def __init__(self, strategy, broadcast_ok, restarted, duration):
+        self.strategy = strategy
+        self.broadcast_ok = broadcast_ok
+        self.restarted = restarted
+        self.duration = duration
+
+    def __repr__(self):
+        return (f"ApplyResult(strategy={self.strategy!r}, broadcast_ok={self.broadcast_ok}, "
+                f"restarted={self.restarted}, duration={self.duration:.3f})")
+
+
+class Win32SettingBroadcaster:
+    """通过 SendMessageTimeoutW 广播设置变更"""
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+        self._ctypes = ctypes
+        self._user32 = ctypes.WinDLL('user32', use_last_error=True)
+        self._user32.SendMessageTimeoutW.restype = wintypes.LPARAM
+        self._user32.SendMessageTimeoutW.argtypes = (wintypes.HWND, wintypes.UINT, wintypes.WPARAM,
+                                                     wintypes.LPCWSTR, wintypes.UINT, wintypes.UINT,
+                                                     ctypes.POINTER(wintypes.DWORD))
+
+    def broadcast(self, timeout_ms):
+        result = self._ctypes.c_ulong()
+        ok = self._user32.SendMessageTimeoutW(HWND_BROADCAST, WM_SETTINGCHANGE, 0, IMMERSIVE_COLOR_SET,
+                                              SMTO_ABORTIFHUNG, timeout_ms, self._ctypes.byref(result))
+        return bool(ok)
+
+
+class FakeBroadcaster:
+    """可配置结果与耗时的广播器，用于测试回退逻辑"""
+
+    def __init__(self, succeed=True, delay=0.0):
+        self.succeed = succeed
+        self.delay = delay
+        self.calls = []
+
+    def broadcast(self, timeout_ms):
+        self.calls.append(timeout_ms)
+        # 超过超时时间视为失败，与真实广播的行为一致
+        if self.delay:
+            time.sleep(min(self.delay, timeout_ms / 1000))
+        return self.succeed and self.delay * 1000 <= timeout_ms
+
+
+class RestartApplyStrategy:
+    """旧行为：需要时直接重启资源管理器"""
+    name = 'restart'
+
+    def __init__(self, restarter):
+        self.restarter = restarter
+
+    def apply(self, theme, allow_restart=True):
+        started = time.perf_counter()
+        restarted = False
+        if allow_restart and self.restarter:
+            with tracing.span('explorer.restart', strategy=self.name):
+                self.restarter()
+            restarted = True
+        return ApplyResult(self.name, False, restarted, time.perf_counter() - started)
+
+
+class BroadcastApplyStrategy:
+    """
+    先广播设置变更；广播未生效且 allow_restart 时才重启资源管理器。
+    广播总共最多等待 timeout_ms：超时记为未生效，广播线程在后台结束，
+    结束前的下一次广播直接记为未生效（不叠加线程）。
+    """
+    name = 'broadcast'
+
+    def __init__(self, broadcaster, restarter=None, timeout_ms=2000):
+        self.broadcaster = broadcaster
+        self.restarter = restarter
+        self.timeout_ms = timeout_ms
+        self.stats = {'broadcasts': 0, 'broadcast_failures': 0, 'broadcast_timeouts': 0,
+                      'fallback_restarts': 0}
+        self._running = None
+
+    def _broadcast(self):
+        """在工作线程中广播，最多等待 timeout_ms，返回是否成功"""
+        import threading
+        if self._running is not None and not self._running.is_set():
+            print("上一次广播仍未结束，跳过本次广播")
+            return False
+        done = threading.Event()
+        result = [False]
+
+        def run():
+            try:
+                result[0] = bool(self.broadcaster.broadcast(self.timeout_ms))
+            except OSError as e:
+                print(f"广播主题变更失败: {e}")
+            finally:
+                done.set()
+
+        self._running = done
+        threading.Thread(target=run, name='ThemeSwitcher-broadcast', daemon=True).start()
+        if not done.wait(self.timeout_ms / 1000):
+            self.stats['broadcast_timeouts'] += 1
+            return False
+        return result[0]
+
+    def apply(self, theme, allow_restart=True):
+        started = time.perf_counter()
+        self.stats['broadcasts'] += 1
+        with tracing.span('theme.broadcast') as span:
+            ok = self._broadcast()
+            span.set(ok=ok)
+        restarted = False
+        if not ok:
+            self.stats['broadcast_failures'] += 1
+            if allow_restart and self.restarter:
+                with tracing.span('explorer.restart', strategy=self.name):
+                    self.restarter()
+                self.stats['fallback_restarts'] += 1
+                restarted = True
+        return ApplyResult(self.name, ok, restarted, time.perf_counter() - started)
+
+
+def create_default_applier(restarter, strategy='broadcast'):
+    """
+    创建默认的生效策略：strategy 为 'restart' 时沿用重启资源管理器；
+    否则在 Windows 上使用广播（失败或超时时回退重启），其他平台返回 None。
+    """
+    if strategy == 'restart':
+        return RestartApplyStrategy(restarter)
+    if sys.platform == 'win32':
+        return BroadcastApplyStrategy(Win32SettingBroadcaster(), restarter)
+    return None
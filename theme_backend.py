@@ -0,0 +1,282 @@
+"""
+主题后端 - 负责读写系统浅色/暗色主题状态
+
+WinRegThemeBackend 直接通过 winreg 读写注册表，取代 toggle_theme.bat
+启动 cmd.exe 再启动多次 reg.exe 的进程链；MemoryThemeBackend 和
+FileThemeBackend 不依赖 Windows，用于在 Linux 上运行和测量核心逻辑。
+Linux 桌面的 color-scheme 后端见 linux_desktop.py。
+"""
+import os
+
+import tracing
+
+try:
+    import winreg
+except ImportError:
+    # 非 Windows 平台没有 winreg，只能使用内存/文件后端
+    winreg = None
+
+PERSONALIZE_KEY = r"SOFTWARE\Microsoft\Windows\CurrentVersion\Themes\Personalize"
+THEME_VALUE_NAMES = ('AppsUseLightTheme', 'SystemUsesLightTheme')
+VALID_THEMES = ('light', 'dark')
+
+
+def theme_to_value(theme):
+    """主题名转换为注册表 DWORD 值"""
+    return 1 if theme == 'light' else 0
+
+
+def value_to_theme(value):
+    """注册表 DWORD 值转换为主题名"""
+    if value is None:
+        return 'unknown'
+    return 'light' if value == 1 else 'dark'
+
+
+def opposite_theme(theme):
+    """取相反主题，与 toggle_theme.bat 一致：只有当前为浅色时才切到暗色"""
+    return 'dark' if theme == 'light' else 'light'
+
+
+def changed_values(current, values):
+    """values 中与 current 不同的项（值为 None 表示应删除）"""
+    return {name: value for name, value in values.items() if current.get(name) != value}
+
+
+def check_written(subkey, changes, actual):
+    """写入后回读校验，有不一致时抛出 OSError"""
+    mismatched = [name for name, value in changes.items() if actual.get(name) != value]
+    if mismatched:
+        raise OSError(f"写入后校验失败: {subkey} 中的 {', '.join(mismatched)}")
+
+
+class ThemeBackend:
+    """主题后端基类，子类实现 read_values / write_values"""
+    name = 'base'
+
+    def read_values(self):
+        """返回 {值名: DWORD}，读取失败的值不出现在结果中"""
+        raise NotImplementedError
+
+    def write_values(self, values):
+        """写入 {值名: DWORD}"""
+        raise NotImplementedError
+
+    def read_theme(self):
+        """读取当前主题: 'light' / 'dark' / 'unknown'"""
+        with tracing.span('theme.read', backend=self.name) as span:
+            try:
+                values = self.read_values()
+            except OSError as e:
+                span.set(error=str(e))
+                return 'unknown'
+        return value_to_theme(values.get('AppsUseLightTheme'))
+
+    def write_theme(self, theme):
+        """把系统主题写为 'light' 或 'dark'"""
+        value = theme_to_value(theme)
+        with tracing.span('theme.write', backend=self.name, theme=theme):
+            self.write_values({name: value for name in THEME_VALUE_NAMES})
+
+    def toggle_theme(self):
+        """切换主题并返回切换后的主题"""
+        target = opposite_theme(self.read_theme())
+        self.write_theme(target)
+        return target
+
+    def write_key(self, subkey, values, snapshot, known=None):
+        """
+        把 values（{值名: DWORD}，None 表示删除）写入 subkey（相对于用户根键），
+        只写与当前值不同的项并回读校验；写入前把这些项的原值（不存在为 None）
+        记入 snapshot，供失败时恢复。known 为调用方已知的当前值，这些项不再读取。
+        返回实际写入的项。基类只支持 Personalize 键中的两个主题值，且不能删除值。
+        """
+        if subkey != PERSONALIZE_KEY or not set(values) <= set(THEME_VALUE_NAMES):
+            raise OSError(f"{self.name} 后端不支持写入 {subkey}\\{','.join(sorted(values))}")
+        if known and set(values) <= set(known):
+            current = known
+        else:
+            current = self.read_values()
+        changes = changed_values(current, values)
+        snapshot.update({name: current.get(name) for name in changes})
+        if changes:
+            if None in changes.values():
+                raise OSError(f"{self.name} 后端不支持删除注册表值")
+            self.write_values(changes)
+            check_written(subkey, changes, self.read_values())
+        return changes
+
+
+class WinRegThemeBackend(ThemeBackend):
+    """通过 winreg 直接读写 HKCU 下的 Personalize 键"""
+    name = 'winreg'
+
+    def __init__(self, root=None, subkey=PERSONALIZE_KEY):
+        if winreg is None:
+            raise OSError("winreg 仅在 Windows 上可用")
+        self.root = winreg.HKEY_CURRENT_USER if root is None else root
+        self.subkey = subkey
+        # 用户根键：HKCU 下为空，HKEY_USERS 下为 "<SID>\\"，其他键相对于它
+        self.user_prefix = subkey[:-len(PERSONALIZE_KEY)] if subkey.endswith(PERSONALIZE_KEY) else ''
+
+    def read_values(self):
+        values = {}
+        with winreg.OpenKey(self.root, self.subkey) as key:
+            for name in THEME_VALUE_NAMES:
+                try:
+                    values[name], _ = winreg.QueryValueEx(key, name)
+                except FileNotFoundError:
+                    pass
+        return values
+
+    def write_values(self, values):
+        with winreg.CreateKeyEx(self.root, self.subkey, 0, winreg.KEY_SET_VALUE) as key:
+            for name, value in values.items():
+                winreg.SetValueEx(key, name, 0, winreg.REG_DWORD, value)
+
+    def write_key(self, subkey, values, snapshot, known=None):
+        # 读取原值、写入、回读校验都在同一次打开中完成；已知的原值不再查询
+        access = winreg.KEY_QUERY_VALUE | winreg.KEY_SET_VALUE
+        with winreg.CreateKeyEx(self.root, self.user_prefix + subkey, 0, access) as key:
+            known = known or {}
+            current = {name: known[name] if name in known else self._query(key, name) for name in values}
+            changes = changed_values(current, values)
+            snapshot.update({name: current[name] for name in changes})
+            for name, value in changes.items():
+                if value is None:
+                    winreg.DeleteValue(key, name)
+                else:
+                    winreg.SetValueEx(key, name, 0, winreg.REG_DWORD, value)
+            check_written(subkey, changes, {name: self._query(key, name) for name in changes})
+        return changes
+
+    @staticmethod
+    def _query(key, name):
+        try:
+            return winreg.QueryValueEx(key, name)[0]
+        except FileNotFoundError:
+            return None
+
+
+class MemoryThemeBackend(ThemeBackend):
+    """内存后端，模拟注册表中的主题值"""
+    name = 'memory'
+
+    def __init__(self, theme='light'):
+        self.values = {name: theme_to_value(theme) for name in THEME_VALUE_NAMES}
+        # 子键 -> {值名: DWORD}；Personalize 键与 values 为同一个 dict
+        self.keys = {PERSONALIZE_KEY: self.values}
+        # 写入这些值名时抛出 PermissionError，用于测试回滚
+        self.fail_writes = set()
+        self.write_count = 0
+
+    def read_values(self):
+        return dict(self.values)
+
+    def write_values(self, values):
+        self.values.update(values)
+        self.write_count += 1
+
+    def write_key(self, subkey, values, snapshot, known=None):
+        # 内存中读取没有开销，known 不使用；比较、记录原值和写入在一次遍历中完成，
+        # 写入的就是 key 本身，不必回读校验
+        key = self.keys.get(subkey)
+        if key is None:
+            key = self.keys[subkey] = {}
+        changes = {}
+        fail_writes = self.fail_writes
+        for name, value in values.items():
+            old = key.get(name)
+            if old == value:
+                continue
+            if fail_writes and name in fail_writes:
+                raise PermissionError(f"拒绝访问: {subkey}\\{name}")
+            snapshot[name] = old
+            changes[name] = value
+            if value is None:
+                key.pop(name, None)
+            else:
+                key[name] = value
+        if changes:
+            self.write_count += 1
+        return changes
+
+
+class FileThemeBackend(ThemeBackend):
+    """文件后端，以 JSON 保存主题值，可被多个进程共享"""
+    name = 'file'
+
+    def __init__(self, path, default_theme='light'):
+        self.path = path
+        self.default_theme = default_theme
+
+    def read_values(self):
+        import json
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {name: theme_to_value(self.default_theme) for name in THEME_VALUE_NAMES}
+        except ValueError as e:
+            raise OSError(f"主题状态文件损坏: {e}")
+
+    def write_values(self, values):
+        import json
+        try:
+            current = self.read_values()
+        except OSError:
+            current = {}
+        current.update(values)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(current, f)
+        os.replace(tmp_path, self.path)
+
+
+class ScriptThemeBackend(ThemeBackend):
+    """
+    旧版脚本路径：每次切换都启动外部脚本（toggle_theme.bat）。
+    仅保留用于对比测量，读取委托给 reader 后端。
+    """
+    name = 'script'
+
+    def __init__(self, command, reader, creationflags=0):
+        self.command = command
+        self.reader = reader
+        self.creationflags = creationflags
+
+    def read_values(self):
+        return self.reader.read_values()
+
+    def write_values(self, values):
+        raise OSError("脚本后端只能整体切换主题")
+
+    def write_theme(self, theme):
+        # 脚本只会翻转当前状态，因此仅在需要时调用
+        if self.read_theme() != theme:
+            self.toggle_theme()
+
+    def toggle_theme(self):
+        import subprocess
+        with tracing.span('process.spawn', script=os.path.basename(str(self.command))):
+            subprocess.run(self.command, creationflags=self.creationflags, check=True)
+        tracing.count('process.spawns')
+        return self.read_theme()
+
+
+def create_default_backend():
+    """
+    根据运行平台创建默认后端：Windows 上使用 winreg；
+    其他平台若设置了 THEME_SWITCHER_STATE_FILE 则使用文件后端，有桌面会话时
+    使用 color-scheme 后端，否则使用内存后端。
+    """
+    if winreg is not None:
+        return WinRegThemeBackend()
+    state_file = os.environ.get('THEME_SWITCHER_STATE_FILE')
+    if state_file:
+        return FileThemeBackend(state_file)
+    from linux_desktop import ColorSchemeThemeBackend, create_desktop_store
+    store = create_desktop_store()
+    if store is not None:
+        return ColorSchemeThemeBackend(store)
+    return MemoryThemeBackend()
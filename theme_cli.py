@@ -0,0 +1,481 @@
+"""
+命令行入口 - 不导入 tkinter
+
+供脚本和热键工具调用的一次性命令（--toggle / --set / --status）直接读写
+主题后端后退出；--daemon 在无窗口的情况下按定时设置运行调度器（未启用定时切换时
+只等待配置修改）。
+已有实例（界面或守护模式）在运行时，--toggle / --set / --reload 转发给该实例处理，
+--export-trace 让它把运行跟踪导出到文件。
+
+一次性命令要求几十毫秒内完成，因此只按需导入模块（json、控制器、配置等
+都在用到时才导入），也不使用 argparse。
+"""
+import os
+import sys
+
+from theme_backend import VALID_THEMES, create_default_backend
+
+# 出现这些参数时 theme_switcher.py 不启动界面，交给本模块处理
+HEADLESS_FLAGS = ('--toggle', '--set', '--status', '--daemon', '--reload', '--export-trace', '--all-users',
+                  '--history', '-h', '--help')
+# 与界面中的后台任务超时一致
+RESTART_TIMEOUT = 30
+THEME_NAMES = {'dark': '暗色模式', 'light': '浅色模式'}
+USAGE = """用法: python theme_switcher.py <命令> [选项]
+
+命令:
+    --status               显示当前主题
+    --set dark|light       切换到指定主题（已是该主题时不做任何操作）
+    --toggle               切换到相反主题
+    --daemon               不显示窗口，按定时设置持续运行
+    --reload               让正在运行的实例重新读取配置文件
+    --export-trace PATH    让正在运行的实例把运行跟踪导出到 PATH
+    --all-users dark|light 为本机所有用户设置主题（含未登录用户，需管理员权限）
+    --history              按日或按周统计切换历史（次数、来源、耗时、各模式时长）
+
+选项:
+    --restart              主题未生效时允许重启资源管理器
+    --no-restart           从不重启资源管理器（默认沿用配置中的 restart_on_switch）
+    --json                 以 JSON 输出结果
+    --config PATH          配置文件路径（默认为用户目录下的 config.ini）
+    --trace                守护模式下记录运行跟踪（界面直接加 --trace 启动）
+    --format jsonl|prometheus
+                           --export-trace 的导出格式（默认 jsonl）
+    --workers N            --all-users 的并发线程数（默认 8）
+    --loaded-only          --all-users 只处理已登录用户，不挂载离线配置文件
+    --period day|week      --history 的统计周期（默认 day）
+    --since YYYY-MM-DD     --history 的起始日期
+    --until YYYY-MM-DD     --history 的结束日期（含当天，默认到现在）"""
+
+
+class CliOptions:
+    def __init__(self):
+        self.command = None
+        self.theme = None
+        self.restart = None
+        self.json = False
+        # None 表示使用用户目录下的配置文件
+        self.config = None
+        self.trace = False
+        self.path = None
+        self.format = 'jsonl'
+        self.workers = None
+        self.loaded_only = False
+        self.period = 'day'
+        self.since = None
+        self.until = None
+
+
+def is_headless(argv):
+    """命令行参数是否请求无界面模式"""
+    return any(arg.split('=', 1)[0] in HEADLESS_FLAGS for arg in argv)
+
+
+def config_option(argv):
+    """界面模式下 --config PATH / --config=PATH 指定的配置文件，未指定时返回 None"""
+    for index, arg in enumerate(argv):
+        if arg.startswith('--config='):
+            return arg.split('=', 1)[1]
+        if arg == '--config' and index + 1 < len(argv):
+            return argv[index + 1]
+    return None
+
+
+def parse_args(argv):
+    """解析命令行参数；参数错误时抛出 ValueError"""
+    options = CliOptions()
+    args = []
+    for arg in argv:
+        # 同时支持 --set dark 与 --set=dark
+        if arg.startswith('--') and '=' in arg:
+            args.extend(arg.split('=', 1))
+        else:
+            args.append(arg)
+    index = 0
+    while index < len(args):
+        arg = args[index]
+        index += 1
+        if arg in ('-h', '--help'):
+            options.command = 'help'
+            return options
+        if arg in ('--status', '--toggle', '--daemon', '--reload', '--set', '--export-trace', '--all-users',
+                   '--history'):
+            if options.command is not None:
+                raise ValueError(f"只能指定一个命令: {options.command} 与 {arg}")
+            options.command = arg[2:]
+            if arg in ('--set', '--all-users'):
+                if index >= len(args) or args[index] not in VALID_THEMES:
+                    raise ValueError(f"{arg} 需要参数 dark 或 light")
+                options.theme = args[index]
+                index += 1
+            elif arg == '--export-trace':
+                if index >= len(args):
+                    raise ValueError("--export-trace 需要文件路径")
+                options.path = args[index]
+                index += 1
+        elif arg in ('--restart', '--no-restart'):
+            options.restart = arg == '--restart'
+        elif arg == '--json':
+            options.json = True
+        elif arg == '--trace':
+            options.trace = True
+        elif arg == '--loaded-only':
+            options.loaded_only = True
+        elif arg == '--workers':
+            if index >= len(args) or not args[index].isdigit() or int(args[index]) < 1:
+                raise ValueError("--workers 需要正整数")
+            options.workers = int(args[index])
+            index += 1
+        elif arg == '--format':
+            if index >= len(args) or args[index] not in ('jsonl', 'prometheus'):
+                raise ValueError("--format 需要参数 jsonl 或 prometheus")
+            options.format = args[index]
+            index += 1
+        elif arg == '--period':
+            if index >= len(args) or args[index] not in ('day', 'week'):
+                raise ValueError("--period 需要参数 day 或 week")
+            options.period = args[index]
+            index += 1
+        elif arg in ('--since', '--until'):
+            if index >= len(args):
+                raise ValueError(f"{arg} 需要日期 YYYY-MM-DD")
+            setattr(options, arg[2:], args[index])
+            index += 1
+        elif arg == '--config':
+            if index >= len(args):
+                raise ValueError("--config 需要文件路径")
+            options.config = args[index]
+            index += 1
+        else:
+            raise ValueError(f"未知参数: {arg}")
+    if options.command is None:
+        raise ValueError("需要指定命令: --status、--set、--toggle、--reload、--export-trace、--all-users、--history 或 --daemon")
+    return options
+
+
+def create_controller(settings, watch=False):
+    """watch 为 True 时为状态缓存挂上变更通知源（长时间运行的守护模式使用）"""
+    from theme_apply import create_default_applier, run_restart_explorer_script
+    from theme_controller import ThemeController
+    backend = create_default_backend()
+    applier = create_default_applier(lambda: run_restart_explorer_script(RESTART_TIMEOUT),
+                                     settings.apply_strategy)
+    state = None
+    if watch:
+        from theme_state import ThemeStateCache, create_default_change_source
+        state = ThemeStateCache(backend, create_default_change_source(backend))
+    controller = ThemeController(backend, applier=applier, state=state)
+    set_profiles(controller, settings)
+    set_propagation(controller, settings)
+    return controller
+
+
+def set_profiles(controller, settings):
+    """按配置设置主题方案；方案有误时只提示，保留原来的方案"""
+    if not settings.theme_profiles and not controller.profiles:
+        return
+    from theme_profiles import build_profiles
+    try:
+        controller.profiles = build_profiles(settings)
+    except ValueError as e:
+        print(f"主题方案配置错误: {e}", file=sys.stderr)
+
+
+def set_propagation(controller, settings):
+    """按配置设置主题传播插件；插件配置有误时只提示，保留原来的插件"""
+    if not settings.propagation and controller.propagation is None:
+        return
+    from propagation import PropagationRunner, build_plugins
+    try:
+        plugins = build_plugins(settings)
+    except ValueError as e:
+        print(f"主题传播插件配置错误: {e}", file=sys.stderr)
+        return
+    controller.propagation = PropagationRunner(plugins) if plugins else None
+
+
+def report(args, payload, text):
+    if args.json:
+        import json
+        print(json.dumps(payload, ensure_ascii=False))
+    else:
+        print(text)
+
+
+def main(argv=None):
+    try:
+        args = parse_args(sys.argv[1:] if argv is None else argv)
+    except ValueError as e:
+        print(f"错误：{e}（--help 查看用法）", file=sys.stderr)
+        return 2
+    if args.command == 'help':
+        print(USAGE)
+        return 0
+
+    if args.command == 'status':
+        # 只读当前主题，不需要加载配置
+        theme = create_default_backend().read_theme()
+        report(args, {'theme': theme}, f"当前主题: {THEME_NAMES.get(theme, '检测失败')}")
+        return 0 if theme in VALID_THEMES else 1
+
+    if args.command == 'all-users':
+        return run_all_users(args)
+
+    if args.command == 'history':
+        return run_history(args)
+
+    if args.command in ('toggle', 'set', 'reload', 'export-trace'):
+        # 已有实例在运行时交给它处理，避免两个进程各自切换
+        from single_instance import send_command
+        message = {'command': args.command, 'theme': args.theme}
+        if args.command == 'export-trace':
+            # 实例的工作目录可能不同，传绝对路径
+            message = {'command': 'export_trace', 'path': os.path.abspath(args.path), 'format': args.format}
+        try:
+            reply = send_command(message)
+        except (OSError, ValueError) as e:
+            reply = {'ok': False, 'error': str(e)}
+        if reply is not None:
+            reply['forwarded'] = True
+            if reply.get('ok') and args.command == 'export-trace':
+                text = f"已导出 {reply.get('spans')} 条跟踪记录到 {reply.get('path')}"
+            elif reply.get('ok'):
+                text = "已交给正在运行的实例处理"
+            else:
+                text = f"正在运行的实例未能处理命令: {reply.get('error')}"
+            report(args, reply, text)
+            return 0 if reply.get('ok') else 1
+        if args.command in ('reload', 'export-trace'):
+            report(args, {'ok': False, 'error': 'no instance'}, "没有正在运行的实例")
+            return 1
+
+    if args.command == 'set' and create_default_backend().read_theme() == args.theme:
+        # 已是目标主题时控制器不做任何操作，配置（重启、方案、传播、历史）都用不到，
+        # 不必导入 configparser 读取配置
+        report(args, {'theme': args.theme, 'changed': False}, f"当前已是{THEME_NAMES[args.theme]}，无需切换")
+        return 0
+
+    from config_store import ConfigStore, read_settings, resolve_config_path
+    config_path = resolve_config_path(args.config)
+    if args.command == 'daemon':
+        store = ConfigStore(config_path)
+        settings = store.load()
+        controller = create_controller(settings, watch=True)
+        set_history(controller, settings, config_path)
+        if args.trace or settings.tracing:
+            import tracing
+            tracing.enable(settings.trace_buffer)
+        return run_daemon(controller, store, args.restart)
+
+    # 一次性命令只读配置，不需要 ConfigStore 的缓存和写入
+    settings = read_settings(config_path)
+    restart = settings.restart_on_switch if args.restart is None else args.restart
+    controller = create_controller(settings)
+    set_history(controller, settings, config_path)
+
+    try:
+        if args.command == 'toggle':
+            target = controller.toggle(restart=restart, source='cli')
+            changed = True
+        else:
+            target = args.theme
+            changed = controller.set_theme(target, restart=restart, source='cli')
+    except OSError as e:
+        report(args, {'error': str(e)}, f"切换失败: {e}")
+        return 1
+    payload = {'theme': target, 'changed': changed}
+    if controller.last_apply is not None and changed:
+        payload['restarted'] = controller.last_apply.restarted
+    profile = controller.profiles.get(target)
+    if profile is not None and changed:
+        payload['profile'] = profile.name
+        payload['profile_ms'] = controller.profile_stats[profile.name]['last_ms']
+    text = f"已切换到{THEME_NAMES[target]}" if changed else f"当前已是{THEME_NAMES[target]}，无需切换"
+    propagation = controller.last_propagation
+    if propagation is not None and changed:
+        payload['propagation'] = propagation.to_dict()
+        text += "\n主题传播插件:\n" + '\n'.join(propagation.lines())
+    report(args, payload, text)
+    return 1 if propagation is not None and changed and propagation.failed else 0
+
+
+def set_history(controller, settings, config_path):
+    """为控制器挂上切换历史；守护模式下外部修改也记入（需要变更通知源）"""
+    from history import HistoryRecorder, create_history_log
+    log = create_history_log(settings, config_path)
+    if log is None:
+        return
+    controller.history = HistoryRecorder(log)
+    controller.state.subscribe(controller.history.on_state_changed)
+
+
+def run_history(args):
+    """逐行读取切换历史，按日 / 周输出统计"""
+    from config_store import resolve_config_path
+    from history import HISTORY_DIR, HistoryLog, format_table, query
+    from settings import config_base_dir
+    # 只读取，不需要配置中的容量设置；记录已关闭时也能查询以前的记录
+    log = HistoryLog(os.path.join(config_base_dir(resolve_config_path(args.config)), HISTORY_DIR))
+    try:
+        rows = query(log, args.period, args.since, args.until)
+    except ValueError as e:
+        print(f"错误：{e}", file=sys.stderr)
+        return 2
+    report(args, {'period': args.period, 'rows': rows}, '\n'.join(format_table(rows)))
+    return 0
+
+
+def print_propagation_failures(controller):
+    report = controller.last_propagation
+    if report is not None and report.failed:
+        print("主题传播插件未完成:\n" + '\n'.join(report.lines(failed_only=True)))
+
+
+def run_all_users(args):
+    """为所有用户配置单元设置主题；有配置单元失败时返回 1"""
+    from user_hives import CHANGED, DEFAULT_WORKERS, LOADED, WinRegHiveSource, apply_to_hives
+    try:
+        source = WinRegHiveSource(include_offline=not args.loaded_only)
+        bulk = apply_to_hives(source, args.theme, workers=args.workers or DEFAULT_WORKERS)
+    except OSError as e:
+        report(args, {'error': str(e)}, f"批量设置失败: {e}")
+        return 1
+    # 已登录用户的会话需要广播设置变更才会立即刷新（只能通知到当前会话）
+    if any(result.status == CHANGED and result.hive.kind == LOADED for result in bulk.results):
+        from theme_apply import create_default_applier
+        applier = create_default_applier(None)
+        if applier:
+            applier.apply(args.theme, allow_restart=False)
+    report(args, bulk.to_dict(), '\n'.join(bulk.lines()))
+    return 1 if bulk.failed else 0
+
+
+def run_daemon(controller, store, restart_override=None):
+    """按定时设置运行调度器，直到被中断；配置文件被修改后自动重新加载"""
+    from config_store import RELOAD_INTERVAL_MS
+    from scheduler import LoopTimer, ThemeScheduler
+    from single_instance import InstanceServer
+    from settings import build_schedule, config_base_dir
+    from system_events import create_clock_jump_monitor
+    from theme_apply import create_default_applier, run_restart_explorer_script
+
+    settings = store.settings
+    try:
+        schedule = build_schedule(settings, config_base_dir(store.path))
+    except ValueError as e:
+        print(f"错误：{e}")
+        return 1
+
+    # 单实例：界面或另一个守护进程已在运行时不再重复调度
+    server = InstanceServer()
+    try:
+        started = server.start()
+    except OSError as e:
+        print(f"错误：无法建立单实例监听: {e}")
+        return 1
+    if not started:
+        print("已有实例在运行（界面或守护模式），退出")
+        return 1
+
+    # 长时间运行时主题可能被其他工具修改：有变更通知就订阅，否则每次事件前重新读取
+    controller.state.start()
+
+    def on_event(theme):
+        if controller.state.source is None:
+            controller.state.refresh()
+        restart = store.settings.restart_on_switch if restart_override is None else restart_override
+        try:
+            changed = controller.set_theme(theme, restart=restart, source='schedule')
+        except OSError as e:
+            print(f"自动切换失败: {e}")
+            return
+        if changed:
+            print(f"定时切换到{THEME_NAMES[theme]}")
+            print_propagation_failures(controller)
+        else:
+            print(f"定时任务跳过: 当前已是{theme}主题")
+
+    timer = LoopTimer()
+    scheduler = ThemeScheduler(timer, on_event)
+
+    def apply_reloaded(settings):
+        try:
+            scheduler.set_schedule(build_schedule(settings, config_base_dir(store.path)))
+        except ValueError as e:
+            print(f"重新加载配置失败，继续使用原日程: {e}")
+            return
+        controller.applier = create_default_applier(
+            lambda: run_restart_explorer_script(RESTART_TIMEOUT), settings.apply_strategy)
+        set_profiles(controller, settings)
+        set_propagation(controller, settings)
+        print(f"已重新加载配置，{arm_if_enabled(settings)}")
+
+    def arm_if_enabled(settings):
+        # 未启用定时切换时不排定切换，只等待配置修改和其他进程的命令
+        if not settings.enabled:
+            scheduler.cancel()
+            return "定时切换未启用，等待配置启用"
+        scheduler.arm()
+        when, theme = scheduler.next_event
+        return f"下一次切换: {when:%Y-%m-%d %H:%M} → {THEME_NAMES[theme]}"
+
+    def watch_config():
+        settings = store.check_reload()
+        if settings is not None:
+            apply_reloaded(settings)
+        timer.call_later(RELOAD_INTERVAL_MS, watch_config)
+
+    def run_command(message):
+        restart = store.settings.restart_on_switch if restart_override is None else restart_override
+        try:
+            if message['command'] == 'toggle':
+                target = controller.toggle(restart=restart, source='ipc')
+            elif message['command'] == 'set':
+                target = message['theme']
+                if not controller.set_theme(target, restart=restart, source='ipc'):
+                    return
+            else:
+                apply_reloaded(store.load())
+                return
+        except OSError as e:
+            print(f"切换失败: {e}")
+            return
+        print(f"已切换到{THEME_NAMES[target]}（来自其他进程的命令）")
+        print_propagation_failures(controller)
+
+    def on_instance_command(message):
+        # 在监听线程中调用：操作交给计时器线程执行，立即回复
+        command = message.get('command')
+        if command == 'show':
+            return {'ok': False, 'error': '守护模式没有窗口'}
+        if command == 'export_trace':
+            import tracing
+            return tracing.handle_export_command(message)
+        if command not in ('toggle', 'set', 'reload'):
+            return {'ok': False, 'error': f"未知命令: {command}"}
+        if command == 'set' and message.get('theme') not in VALID_THEMES:
+            return {'ok': False, 'error': f"无效的主题: {message.get('theme')}"}
+        timer.call_later(0, lambda: run_command(message))
+        return {'ok': True}
+
+    server.handler = on_instance_command
+
+    scheduler.set_schedule(schedule)
+    clock_monitor = create_clock_jump_monitor()
+    clock_monitor.start(lambda: timer.call_later(0, scheduler.on_clock_jump))
+    timer.call_later(RELOAD_INTERVAL_MS, watch_config)
+    print(f"守护模式已启动，{arm_if_enabled(settings)}")
+    try:
+        timer.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scheduler.cancel()
+        clock_monitor.stop()
+        controller.state.stop()
+        server.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
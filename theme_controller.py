@@ -0,0 +1,116 @@
+"""
+主题控制器 - 幂等的主题设置入口
+
+set_theme 先比较目标主题与当前主题，一致时不做任何操作（不写注册表、
+不重启资源管理器），调用方据返回值决定是否刷新界面。定时任务据此成为
+“确保处于某主题”的操作，而不是盲目翻转。
+
+写入后由 applier（见 theme_apply）负责让新主题生效：广播设置变更，
+必要时再重启资源管理器。目标主题配置了方案（见 theme_profiles）时，
+以方案的批量写入代替只写两个主题值。实际切换后再由 propagation
+（见 propagation.py）把主题传播到各应用自己的配置文件，并由 history
+（见 history.py）记入切换历史。
+"""
+import time
+
+import tracing
+from theme_backend import VALID_THEMES, opposite_theme
+from theme_state import ThemeStateCache
+
+
+class ThemeController:
+    """在主题后端之上提供 set_theme / toggle，并统计执行与跳过次数"""
+
+    def __init__(self, backend, applier=None, state=None):
+        self.backend = backend
+        # 当前主题从共享缓存读取，写入后同步更新缓存
+        self.state = state or ThemeStateCache(backend)
+        # 主题生效策略，为 None 时只写入不通知
+        self.applier = applier
+        self.last_apply = None
+        # {主题: ThemeProfile}，切换到该主题时写入整个方案
+        self.profiles = {}
+        # {方案名: 应用次数、写入值数、回滚次数与耗时}
+        self.profile_stats = {}
+        # 主题传播插件（PropagationRunner），为 None 时不传播
+        self.propagation = None
+        self.last_propagation = None
+        # 切换历史（HistoryRecorder），为 None 时不记录
+        self.history = None
+        self.stats = {
+            'switches': 0,
+            'noop_skips': 0,
+            'scheduled_switches': 0,
+            'scheduled_noop_skips': 0,
+            'explorer_restarts': 0,
+        }
+
+    def get_theme(self):
+        return self.state.get()
+
+    def set_theme(self, target, restart=False, source='manual'):
+        """
+        确保系统处于 target 主题。
+        已处于目标主题时直接返回 False；否则写入、通知生效并返回 True。
+        restart 表示广播未生效时是否允许重启资源管理器。
+        """
+        if target not in VALID_THEMES:
+            raise ValueError(f"未知主题: {target}")
+        scheduled = source == 'schedule'
+        if self.state.get() == target:
+            self.stats['noop_skips'] += 1
+            if scheduled:
+                self.stats['scheduled_noop_skips'] += 1
+            tracing.count('theme.noop_skips')
+            return False
+
+        previous = self.state.get()
+        started = time.perf_counter()
+        if self.history:
+            self.history.expect(target)
+        with tracing.span('theme.switch', theme=target, source=source) as span:
+            profile = self.profiles.get(target)
+            if profile is None:
+                self.backend.write_theme(target)
+            else:
+                result = self.apply_profile(profile, previous)
+                span.set(profile=profile.name, written=result.written)
+            self.state.set(target)
+            self.stats['switches'] += 1
+            if scheduled:
+                self.stats['scheduled_switches'] += 1
+            if self.applier:
+                self.last_apply = self.applier.apply(target, allow_restart=restart)
+                if self.last_apply.restarted:
+                    self.stats['explorer_restarts'] += 1
+                span.set(strategy=self.last_apply.strategy, restarted=self.last_apply.restarted)
+            # 耗时不含传播插件（插件各自计时）
+            duration = time.perf_counter() - started
+            # 插件失败只记入报告，不影响切换结果
+            self.last_propagation = self.propagation.run(target) if self.propagation else None
+        if self.history:
+            restarted = bool(self.applier and self.last_apply.restarted)
+            self.history.on_switch(source, previous, target, duration, restarted)
+        return True
+
+    def apply_profile(self, profile, current=None):
+        """批量写入方案并记录耗时；失败时已回滚，异常（ProfileError）交给调用方"""
+        stats = self.profile_stats.setdefault(profile.name, {
+            'applies': 0, 'values_written': 0, 'rollbacks': 0, 'last_ms': 0.0, 'max_ms': 0.0,
+        })
+        try:
+            result = profile.apply(self.backend, current)
+        except OSError:
+            stats['rollbacks'] += 1
+            raise
+        stats['applies'] += 1
+        stats['values_written'] += result.written
+        stats['last_ms'] = round(result.duration * 1000, 3)
+        stats['max_ms'] = max(stats['max_ms'], stats['last_ms'])
+        return result
+
+    def toggle(self, restart=False, source='manual'):
+        """切换到相反主题并返回目标主题"""
+        target = opposite_theme(self.state.get())
+        self.set_theme(target, restart=restart, source=source)
+        return target
@@ -0,0 +1,201 @@
+"""
+主题方案
+
+一个方案除浅色/暗色外，还可以包含强调色、在“开始”/任务栏和标题栏上显示
+强调色（ColorPrevalence）、透明效果，以及本程序界面的色板。在配置中定义，
+并指定暗色/浅色各使用哪个方案：
+
+    [Profile:work]
+    theme = dark
+    accent_color = #0078D4
+    color_prevalence = True
+    transparency = False
+    # 界面色板（键同 ui_style.THEME_PALETTES），未给出的沿用默认值
+    bg = #1e1e1e
+
+    [Profiles]
+    dark = work
+    light = day
+
+方案作为一个批次写入：每个注册表键只打开一次，只写与当前不同的值并回读
+校验；写入前记下将被修改的原值，任一写入或校验失败时全部恢复。已知当前
+主题时，AppsUseLightTheme 的原值直接取自它（当前主题正是由它得出），不再查询；
+SystemUsesLightTheme 可能与之不同（应用暗色、系统浅色），仍然读取。
+"""
+import time
+
+import tracing
+from theme_backend import PERSONALIZE_KEY, THEME_VALUE_NAMES, theme_to_value
+from theme_controller import VALID_THEMES
+from ui_style import THEME_PALETTES
+
+DWM_KEY = r"SOFTWARE\Microsoft\Windows\DWM"
+ACCENT_KEY = r"SOFTWARE\Microsoft\Windows\CurrentVersion\Explorer\Accent"
+SECTION_PREFIX = 'Profile:'
+REGISTRY_OPTIONS = ('theme', 'accent_color', 'color_prevalence', 'transparency')
+PALETTE_KEYS = tuple(THEME_PALETTES['light'])
+# 已知当前主题时 AppsUseLightTheme 的原值（当前主题由 value_to_theme(AppsUseLightTheme) 得出）
+KNOWN_THEME_VALUES = {theme: {'AppsUseLightTheme': theme_to_value(theme)} for theme in VALID_THEMES}
+BOOLEAN_STATES = {'true': True, 'yes': True, 'on': True, '1': True,
+                  'false': False, 'no': False, 'off': False, '0': False}
+
+
+class ProfileError(OSError):
+    """方案写入失败；rollback_error 为 None 表示已全部恢复为原值"""
+
+    def __init__(self, profile, error, rollback_error=None):
+        message = f"应用方案 {profile} 失败: {error}"
+        message += f"；恢复原值失败: {rollback_error}" if rollback_error else "，已恢复原值"
+        super().__init__(message)
+        self.profile = profile
+        self.error = error
+        self.rollback_error = rollback_error
+
+
+def parse_color(text):
+    """'#RRGGBB' -> (r, g, b)；格式错误时抛出 ValueError"""
+    value = text.strip().lstrip('#')
+    if len(value) != 6:
+        raise ValueError(f"颜色格式应为 #RRGGBB: {text!r}")
+    try:
+        return int(value[0:2], 16), int(value[2:4], 16), int(value[4:6], 16)
+    except ValueError:
+        raise ValueError(f"颜色格式应为 #RRGGBB: {text!r}")
+
+
+def parse_bool(text):
+    try:
+        return BOOLEAN_STATES[text.strip().lower()]
+    except KeyError:
+        raise ValueError(f"应为 True 或 False: {text!r}")
+
+
+class ThemeProfile:
+    """一个主题方案；accent_color / color_prevalence / transparency 为 None 时不修改"""
+
+    def __init__(self, name, theme, accent_color=None, color_prevalence=None, transparency=None, palette=None):
+        if theme not in VALID_THEMES:
+            raise ValueError(f"方案 {name} 的主题无效: {theme!r}")
+        self.name = name
+        self.theme = theme
+        self.accent_color = accent_color
+        self.color_prevalence = color_prevalence
+        self.transparency = transparency
+        self.palette = palette or {}
+        self._batch = self._build_batch()
+
+    @classmethod
+    def from_options(cls, name, options):
+        """从配置段的键值创建；取值错误或有未知键时抛出 ValueError"""
+        unknown = set(options) - set(REGISTRY_OPTIONS) - set(PALETTE_KEYS)
+        if unknown:
+            raise ValueError(f"方案 {name} 有未知的设置: {', '.join(sorted(unknown))}")
+        accent = options.get('accent_color')
+        prevalence = options.get('color_prevalence')
+        transparency = options.get('transparency')
+        palette = {key: options[key] for key in PALETTE_KEYS if key in options}
+        for key, color in palette.items():
+            parse_color(color)
+        return cls(name, options.get('theme', ''),
+                   accent_color=parse_color(accent) if accent else None,
+                   color_prevalence=parse_bool(prevalence) if prevalence else None,
+                   transparency=parse_bool(transparency) if transparency else None,
+                   palette=palette)
+
+    def _build_batch(self):
+        """{子键: {值名: DWORD}}，Personalize 在前"""
+        personalize = {name: theme_to_value(self.theme) for name in THEME_VALUE_NAMES}
+        batch = {PERSONALIZE_KEY: personalize}
+        if self.transparency is not None:
+            personalize['EnableTransparency'] = int(self.transparency)
+        if self.color_prevalence is not None:
+            personalize['ColorPrevalence'] = int(self.color_prevalence)
+            batch[DWM_KEY] = {'ColorPrevalence': int(self.color_prevalence)}
+        if self.accent_color is not None:
+            red, green, blue = self.accent_color
+            # 资源管理器与 DWM 使用 ABGR，ColorizationColor 使用 ARGB
+            abgr = 0xFF000000 | (blue << 16) | (green << 8) | red
+            batch.setdefault(DWM_KEY, {}).update({
+                'AccentColor': abgr,
+                'ColorizationColor': 0xC4000000 | (red << 16) | (green << 8) | blue,
+            })
+            batch[ACCENT_KEY] = {'AccentColorMenu': abgr}
+        return batch
+
+    def registry_batch(self):
+        return self._batch
+
+    def apply(self, backend, current=None):
+        return apply_profile(backend, self, current)
+
+
+class ProfileResult:
+    __slots__ = ('profile', 'written', 'duration')
+
+    def __init__(self, profile, written, duration):
+        self.profile = profile
+        self.written = written
+        self.duration = duration
+
+    def __repr__(self):
+        return f"ProfileResult({self.profile.name!r}, written={self.written}, duration={self.duration:.6f})"
+
+
+def apply_profile(backend, profile, current=None):
+    """
+    以一个批次写入方案，返回 ProfileResult；失败时恢复原值并抛出 ProfileError。
+    current 为调用方已知的当前主题（'light' / 'dark'），此时 AppsUseLightTheme
+    的原值不再读取，只含主题的方案比两值切换少打开一次键、少查询一次。不单独建 span：
+    控制器切换时的 theme.switch span 已包含本次写入及方案名。
+    """
+    started = time.perf_counter()
+    snapshots = []
+    written = 0
+    known = KNOWN_THEME_VALUES.get(current)
+    try:
+        for subkey, values in profile.registry_batch().items():
+            snapshot = {}
+            snapshots.append((subkey, snapshot))
+            written += len(backend.write_key(subkey, values, snapshot,
+                                             known if subkey == PERSONALIZE_KEY else None))
+    except OSError as e:
+        rollback_error = rollback(backend, snapshots)
+        raise ProfileError(profile.name, e, rollback_error)
+    return ProfileResult(profile, written, time.perf_counter() - started)
+
+
+def rollback(backend, snapshots):
+    """按相反顺序恢复已记录的原值；全部成功时返回 None，否则返回错误描述"""
+    errors = []
+    for subkey, snapshot in reversed(snapshots):
+        if not snapshot:
+            continue
+        try:
+            backend.write_key(subkey, snapshot, {})
+        except OSError as e:
+            errors.append(str(e))
+    tracing.count('profile.rollbacks')
+    return '; '.join(errors) or None
+
+
+def build_profiles(settings):
+    """
+    根据配置创建方案，返回 {主题: ThemeProfile}（只含 [Profiles] 中指定的主题）；
+    方案不存在、主题不符或取值错误时抛出 ValueError。
+    """
+    profiles = {}
+    for theme, name in settings.theme_profiles.items():
+        if theme not in VALID_THEMES:
+            raise ValueError(f"[Profiles] 中的主题无效: {theme}")
+        if name not in settings.profiles:
+            raise ValueError(f"未定义的方案: {name}（应有 [{SECTION_PREFIX}{name}] 配置段）")
+        profile = ThemeProfile.from_options(name, settings.profiles[name])
+        if profile.theme != theme:
+            raise ValueError(f"方案 {name} 的主题为 {profile.theme}，不能用作 {theme} 方案")
+        profiles[theme] = profile
+    return profiles
+
+
+def profile_palettes(profiles):
+    """{主题: 色板覆盖}，供 StyleRegistry.set_palettes 使用"""
+    return {theme: profile.palette for theme, profile in profiles.items() if profile.palette}
@@ -0,0 +1,174 @@
+"""
+主题状态缓存 - 所有读取方共享一份当前主题
+
+缓存只在两种情况下更新：本进程写入主题后（set），或变更通知源报告
+注册表键发生变化后（重新读取一次）。Windows 上通知源基于
+RegNotifyChangeKeyValue，Linux 桌面上订阅 color-scheme 的变化
+（见 linux_desktop.DesktopChangeSource），其他平台可接入 FakeChangeSource。
+"""
+import _thread
+
+import tracing
+
+try:
+    import winreg
+    import ctypes
+    from ctypes import wintypes
+except ImportError:
+    winreg = None
+
+REG_NOTIFY_CHANGE_LAST_SET = 0x00000004
+WAIT_OBJECT_0 = 0
+INFINITE = 0xFFFFFFFF
+
+
+class ThemeStateCache:
+    """
+    主题状态缓存。
+    订阅者以 callback(theme, origin) 形式收到变化通知，origin 为
+    'local'（本进程写入）或 'external'（设置应用或其他工具修改）。
+    """
+
+    def __init__(self, backend, source=None):
+        self.backend = backend
+        self.source = source
+        self._theme = None
+        # threading 连同 functools、collections 约 5 ms，一次性命令用不到线程，锁直接取自 _thread
+        self._lock = _thread.allocate_lock()
+        self._listeners = []
+        self.read_count = 0
+
+    def get(self):
+        """返回缓存的主题，首次调用时读取一次后端"""
+        theme = self._theme
+        if theme is None:
+            theme = self.refresh()
+        return theme
+
+    def refresh(self, origin='external'):
+        """重新读取后端并更新缓存"""
+        theme = self.backend.read_theme()
+        self.read_count += 1
+        tracing.count(f'state.refresh.{origin}')
+        self._update(theme, origin)
+        return theme
+
+    def set(self, theme):
+        """本进程写入主题后更新缓存，无需再读注册表"""
+        self._update(theme, 'local')
+
+    def seed(self, theme):
+        """
+        用上次记录的主题预填缓存（不读后端、不通知），供启动时首次绘制；
+        之后调用 refresh() 校验，若实际主题不同会照常通知订阅者。
+        """
+        with self._lock:
+            if self._theme is None:
+                self._theme = theme
+
+    def subscribe(self, callback):
+        self._listeners.append(callback)
+
+    def start(self):
+        """启动变更通知源"""
+        if self.source:
+            self.source.start(self.refresh)
+
+    def stop(self):
+        if self.source:
+            self.source.stop()
+
+    def _update(self, theme, origin):
+        with self._lock:
+            previous = self._theme
+            self._theme = theme
+        # 首次填充缓存不算变化
+        if previous is not None and previous != theme:
+            for callback in list(self._listeners):
+                callback(theme, origin)
+
+
+class FakeChangeSource:
+    """手动触发的变更通知源，用于非 Windows 平台和测试"""
+
+    def __init__(self):
+        self.callback = None
+
+    def start(self, callback):
+        self.callback = callback
+
+    def stop(self):
+        self.callback = None
+
+    def emit(self):
+        """模拟注册表键被外部修改"""
+        if self.callback:
+            self.callback()
+
+
+class RegistryChangeWatcher:
+    """在后台线程中用 RegNotifyChangeKeyValue 等待键值变化，不轮询"""
+
+    def __init__(self, root, subkey):
+        self.root = root
+        self.subkey = subkey
+        self.thread = None
+        self._stop_event = None
+        self._kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        self._advapi32 = ctypes.WinDLL('advapi32', use_last_error=True)
+        self._kernel32.CreateEventW.restype = wintypes.HANDLE
+        self._kernel32.CreateEventW.argtypes = (wintypes.LPVOID, wintypes.BOOL, wintypes.BOOL, wintypes.LPCWSTR)
+        self._kernel32.SetEvent.argtypes = (wintypes.HANDLE,)
+        self._kernel32.CloseHandle.argtypes = (wintypes.HANDLE,)
+        self._kernel32.WaitForMultipleObjects.restype = wintypes.DWORD
+        self._kernel32.WaitForMultipleObjects.argtypes = (wintypes.DWORD, ctypes.POINTER(wintypes.HANDLE),
+                                                          wintypes.BOOL, wintypes.DWORD)
+        self._advapi32.RegNotifyChangeKeyValue.restype = wintypes.LONG
+        self._advapi32.RegNotifyChangeKeyValue.argtypes = (wintypes.HANDLE, wintypes.BOOL, wintypes.DWORD,
+                                                           wintypes.HANDLE, wintypes.BOOL)
+
+    def start(self, callback):
+        if self.thread:
+            return
+        import threading
+        self._stop_event = self._kernel32.CreateEventW(None, True, False, None)
+        self.thread = threading.Thread(target=self._watch_loop, args=(callback,), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self._stop_event:
+            self._kernel32.SetEvent(self._stop_event)
+
+    def _watch_loop(self, callback):
+        kernel32 = self._kernel32
+        change_event = kernel32.CreateEventW(None, False, False, None)
+        handles = (wintypes.HANDLE * 2)(change_event, self._stop_event)
+        try:
+            with winreg.OpenKey(self.root, self.subkey, 0, winreg.KEY_NOTIFY | winreg.KEY_READ) as key:
+                while True:
+                    rc = self._advapi32.RegNotifyChangeKeyValue(key.handle, False, REG_NOTIFY_CHANGE_LAST_SET,
+                                                                change_event, True)
+                    if rc != 0:
+                        print(f"注册表监听失败: {rc}")
+                        break
+                    if kernel32.WaitForMultipleObjects(2, handles, False, INFINITE) != WAIT_OBJECT_0:
+                        break
+                    callback()
+        except OSError as e:
+            print(f"注册表监听失败: {e}")
+        finally:
+            kernel32.CloseHandle(change_event)
+            kernel32.CloseHandle(self._stop_event)
+            self._stop_event = None
+            self.thread = None
+
+
+def create_default_change_source(backend):
+    """为后端选择变更通知源；没有可用通知机制时返回 None"""
+    name = getattr(backend, 'name', None)
+    if winreg is not None and name == 'winreg':
+        return RegistryChangeWatcher(backend.root, backend.subkey)
+    if name == 'color-scheme':
+        from linux_desktop import DesktopChangeSource
+        return DesktopChangeSource(backend.store)
+    return None
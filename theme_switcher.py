@@ -1,53 +1,129 @@
+import time
+# 启动耗时分析（--profile-startup）的计时起点，须在其他导入之前
+STARTUP_BEGIN = time.perf_counter()
+import sys
+import theme_cli
+
+if __name__ == "__main__" and theme_cli.is_headless(sys.argv[1:]):
+    # 命令行模式：不导入 tkinter 和界面用到的模块，执行完立即退出
+    sys.exit(theme_cli.main(sys.argv[1:]))
+
+import tracing
+
+if __name__ == "__main__":
+    # 单实例：已有实例在运行时请它显示窗口，本进程不再加载界面；
+    # 无法建立监听时（False）不带单实例功能照常启动
+    import single_instance
+    instance_server = single_instance.claim_instance({'command': 'show'})
+    if instance_server is None:
+        sys.exit(0)
+
 import tkinter as tk
 from tkinter import ttk
-import subprocess
-import winreg
-import sys
-import os
 import ctypes
 from ctypes import wintypes
-import threading
-import time
-import configparser
 from datetime import datetime
+from theme_backend import create_default_backend
+from theme_controller import ThemeController
+from theme_profiles import build_profiles, profile_palettes
+from propagation import PropagationRunner, build_plugins
+from history import HistoryRecorder, create_history_log
+from theme_state import ThemeStateCache, create_default_change_source
+from scheduler import ThemeScheduler, TkTimer, parse_hhmm
+from solar import SolarSchedule
+from calendar_rules import RuleSchedule
+from system_events import create_clock_jump_monitor
+from jobs import DONE, TIMEOUT, JobRunner
+from theme_apply import create_default_applier, run_restart_explorer_script
+from settings import Settings, build_schedule, config_base_dir
+from config_store import RELOAD_INTERVAL_MS, ConfigStore, resolve_config_path
+from startup_profiler import StartupProfiler
+from ui_dispatch import TkDispatcher
+from docking import DockHitTester, Rect, compute_dock_zones, docked_window_rect, hidden_position
+from monitors import create_default_monitor_provider
+from window_pool import ToplevelPool
+from ui_style import StyleRegistry
+from cursor_source import create_default_cursor_source
+
+# 时间选择器的候选值只生成一次
+HOUR_VALUES = tuple(f"{i:02d}" for i in range(24))
+MINUTE_VALUES = tuple(f"{i:02d}" for i in range(60))
 
 class WindowsThemeSwitcher:
-    def __init__(self):
+    def __init__(self, profiler=None, instance_server=None, config_path=None):
+        # 启动耗时分析，默认关闭
+        self.profiler = profiler or StartupProfiler(enabled=False)
+        self.profiler.mark('imports')
+
+        # 配置和主题状态不依赖窗口，先于 Tk 准备好
+        # 配置保存在用户目录（或 --config 指定的文件），内存中缓存，修改合并后延迟写入
+        self.config_file = resolve_config_path(config_path)
+        self.config_store = ConfigStore(self.config_file)
+        settings = self.config_store.load()
+        if settings.tracing:
+            tracing.enable(settings.trace_buffer)
+        self.profiler.mark('config load')
+
+        # 主题后端：进程内直接读写注册表
+        self.theme_backend = create_default_backend()
+        # 主题状态缓存：由注册表变更通知更新，界面各处共享读取
+        self.theme_state = ThemeStateCache(self.theme_backend,
+                                           create_default_change_source(self.theme_backend))
+        # 首次绘制使用上次记录的主题，窗口显示后再读注册表校验
+        self.last_theme = settings.last_theme
+        self.theme_seeded = self.last_theme is not None
+        if self.theme_seeded:
+            self.theme_state.seed(self.last_theme)
+            self.profiler.mark('theme read', '使用上次记录，显示后校验')
+        else:
+            self.theme_state.get()
+            self.profiler.mark('theme read', '读取注册表')
+
         self.root = tk.Tk()
         
         # 立即隐藏主窗口
         self.root.withdraw()
 
-        # 定义色彩系统
-        self.light_theme_colors = {
-            'bg': '#f5f7fc',
-            'fg': '#333333',
-            'btn_bg': '#e8ecf4',
-            'btn_active_bg': '#dfe4ee'
-        }
-        self.dark_theme_colors = {
-            'bg': '#17191f',
-            'fg': '#e0e0e0',
-            'btn_bg': '#2c2f3a',
-            'btn_active_bg': '#3a3e4c'
-        }
+        # 配色登记表：控件按角色登记，切换主题时只推送有变化的颜色
+        self.style = StyleRegistry()
+
+        # 窗口创建后配置写入改为延迟合并
+        self.config_store.timer = TkTimer(self.root)
+
+        # 线程安全的调度队列：后台线程对界面的所有操作都经由它回到 Tk 线程
+        self.dispatcher = TkDispatcher(self.root)
+        # 显示器布局：缓存各显示器矩形，只在显示配置变化时重新枚举
+        self.monitor_provider = create_default_monitor_provider(self.root)
+        self.monitor_provider.start(lambda: self.dispatcher.post(self.on_display_change))
 
         self.root.title("Windows主题切换器")
-        self.root.geometry("180x280")
+        self.WINDOW_WIDTH = 180
+        self.WINDOW_HEIGHT = 280
+        self.root.geometry(f"{self.WINDOW_WIDTH}x{self.WINDOW_HEIGHT}")
         self.root.resizable(False, False)
         self.root.overrideredirect(True)
 
         self.is_docked = False
         self.dock_side = None
         self.is_hidden = False
-        self.mouse_check_thread = None
-        self.mouse_check_running = False
         self.hide_timer_id = None
+        # 停靠热区在停靠/移动/改变大小时计算一次，光标线程只读取缓存
+        self.dock_zones = None
         self.restart_explorer = tk.BooleanVar(value=True)
         self.dock_indicator = None
         self.DOCK_OFFSET = 5
+        self.PICKER_WIDTH = 250
+        self.PICKER_HEIGHT = 150
+        self.picker_time_type = None
+        # 停靠指示条与时间选择器在首次使用时创建，之后隐藏复用
+        self.window_pool = ToplevelPool(self.root)
+        self.window_pool.register('dock_indicator', self.build_dock_indicator)
+        self.window_pool.register('time_picker', self.build_time_picker)
+        # 后台任务超时（秒）：超时后界面立即解锁并提示
+        self.THEME_JOB_TIMEOUT = 10
+        self.RESTART_JOB_TIMEOUT = 30
         
-        # UI锁定相关变量
+        # UI锁定相关变量（蒙版在首次锁定时创建）
         self.ui_mask = None
         self.interactive_widgets = []
         
@@ -55,27 +131,63 @@ class WindowsThemeSwitcher:
         self.is_timed_switching_enabled = False
         self.dark_time = "20:00"
         self.light_time = "06:00"
+        # 日程模式：fixed 使用固定时间，solar 按日出日落（经纬度 + 分钟偏移），
+        # rules 在固定时间基础上叠加 ScheduleRules 段中的周末/日期范围/日历例外
+        self.schedule_mode = 'fixed'
+        self.schedule_rules = {}
+        self.latitude = None
+        self.longitude = None
+        self.sunrise_offset = 0
+        self.sunset_offset = 0
         self.last_auto_switch_minute = None
-        self.config_file = "config.ini"
-        self.schedule_timer_id = None  # 新增调度器计时器ID
         
-        # 加载配置
-        self.load_config()
-
-        # 显示启动画面
-        self.show_splash_screen()
+        # 单计时器调度器：日程在加载/修改配置时编译一次
+        self.scheduler = ThemeScheduler(TkTimer(self.root), self.run_scheduled_task)
+        # 系统时间跳变或休眠恢复时立即重新确保主题
+        self.clock_monitor = create_clock_jump_monitor()
+        self.clock_monitor.start(lambda: self.dispatcher.post(self.scheduler.on_clock_jump))
         
+        self.theme_state.subscribe(self.on_theme_state_changed)
+        self.theme_state.start()
+        # 主题生效策略：默认广播设置变更，未生效时才按设置重启资源管理器
+        self.apply_strategy = 'broadcast'
+        self.theme_controller = ThemeController(self.theme_backend, state=self.theme_state)
+        # 切换历史：本进程的切换与外部修改都记入日志（位置与容量在启动时确定）
+        self.history_log = create_history_log(settings, self.config_file)
+        if self.history_log:
+            self.theme_controller.history = HistoryRecorder(self.history_log)
+            self.theme_state.subscribe(self.theme_controller.history.on_state_changed)
+        # 后台任务执行器：耗时操作不阻塞主循环，完成后回到 Tk 线程
+        self.job_runner = JobRunner(self.dispatcher.post)
+        # 光标事件源：Windows 上为低级鼠标钩子，光标不动时不唤醒
+        # 非 Windows 平台通过 Tk 读取光标位置，轮询放在 Tk 线程中
+        self.cursor_source = create_default_cursor_source(self.get_mouse_position, timer=TkTimer(self.root))
+        self.dock_tester = DockHitTester(on_reveal=lambda: self.dispatcher.post(self.show_window),
+                                         on_leave=lambda: self.dispatcher.post(self.start_hide_timer_unified),
+                                         on_enter=lambda: self.dispatcher.post(self.cancel_hide_timer))
+        
+        # 应用配置
+        self.apply_settings(settings)
+
         self.setup_window_style()
         self.create_ui()
         self.bind_events()
         self.update_theme_status()
+        self.profiler.mark('widget build')
 
-    def resource_path(self, relative_path):
-        try:
-            base_path = sys._MEIPASS
-        except Exception:
-            base_path = os.path.abspath(".")
-        return os.path.join(base_path, relative_path)
+        # 其他进程转发的命令（显示窗口、切换主题、重新加载配置）
+        self.instance_server = instance_server
+        if self.instance_server:
+            self.instance_server.handler = self.on_instance_command
+        # 本地控制接口（配置中启用时）
+        self.control_server = None
+        if self.control_enabled:
+            self.start_control_server()
+
+        # 初始化完成即显示窗口，不再等待固定时长的启动画面
+        self.root.bind('<Map>', self.on_first_map, add='+')
+        self.root.bind('<Configure>', self.on_root_configure, add='+')
+        self.show_main_window()
 
     def setup_window_style(self):
         self.root.attributes('-topmost', True)
@@ -121,17 +233,21 @@ class WindowsThemeSwitcher:
                                          command=self.execute_restart_explorer_with_lock)
         self.restart_now_btn.pack(pady=(10, 0))
         
-        # 创建定时切换功能模块
-        self.create_timer_module()
-        
-        # 收集可交互控件
-        self.interactive_widgets = [self.close_btn, self.toggle_btn, self.restart_check, self.restart_now_btn,
-                                   self.timer_toggle_btn, self.dark_time_label, self.light_time_label,
-                                   self.dark_icon_label, self.light_icon_label]
+        self.style.register(self.root, 'window')
+        self.style.register_all([self.main_frame, self.content_frame], 'frame')
+        self.style.register(self.close_btn, 'close_button')
+        self.style.register(self.status_label, 'label')
+        self.style.register_all([self.toggle_btn, self.restart_now_btn], 'button')
+        self.style.register(self.restart_check, 'check')
         
-        # 创建UI蒙版（默认隐藏）
-        self.create_ui_mask()
+        # 收集可交互控件；定时切换模块在窗口首次展开时才创建
+        self.interactive_widgets = [self.close_btn, self.toggle_btn, self.restart_check, self.restart_now_btn]
     
+    def ensure_timer_module(self):
+        """按需创建定时切换功能模块"""
+        if not hasattr(self, 'timer_frame'):
+            self.create_timer_module()
+
     def create_timer_module(self):
         """创建定时切换功能模块"""
         # 创建定时切换功能容器
@@ -152,8 +268,9 @@ class WindowsThemeSwitcher:
         self.dark_time_frame.pack(side='left', padx=(0, 8))
         self.dark_time_frame.bind('<Button-1>', lambda e: self.open_time_picker('dark'))
         
+        dark_text, light_text = self.get_schedule_display_times()
         self.dark_time_label = tk.Label(self.dark_time_frame, 
-                                       text=self.dark_time,
+                                       text=dark_text,
                                        font=('Microsoft YaHei UI', 8),
                                        cursor='hand2')
         self.dark_time_label.pack(side='left')
@@ -172,7 +289,7 @@ class WindowsThemeSwitcher:
         self.light_time_frame.bind('<Button-1>', lambda e: self.open_time_picker('light'))
         
         self.light_time_label = tk.Label(self.light_time_frame, 
-                                        text=self.light_time,
+                                        text=light_text,
                                         font=('Microsoft YaHei UI', 8),
                                         cursor='hand2')
         self.light_time_label.pack(side='left')
@@ -185,6 +302,14 @@ class WindowsThemeSwitcher:
         self.light_icon_label.pack(side='left', padx=(3, 0))
         self.light_icon_label.bind('<Button-1>', lambda e: self.open_time_picker('light'))
 
+        self.style.register_all([self.timer_frame, self.dark_time_frame, self.light_time_frame], 'frame')
+        self.style.register(self.timer_toggle_btn, 'button')
+        self.style.register_all([self.dark_time_label, self.light_time_label], 'label')
+        self.style.register_all([self.dark_icon_label, self.light_icon_label], 'icon')
+
+        self.interactive_widgets += [self.timer_toggle_btn, self.dark_time_label, self.light_time_label,
+                                     self.dark_icon_label, self.light_icon_label]
+
 
 
     def bind_events(self):
@@ -202,53 +327,6 @@ class WindowsThemeSwitcher:
         self.status_label.bind('<B1-Motion>', self.on_drag)
         self.status_label.bind('<ButtonRelease-1>', self.end_drag)
 
-    def should_show_window(self, mouse_x, mouse_y):
-        """检查是否应该显示窗口 - 精准区域触发"""
-        if not self.is_hidden:
-            return False
-            
-        try:
-            window_x = self.root.winfo_x()
-            window_y = self.root.winfo_y()
-            window_width = self.root.winfo_width()
-            window_height = self.root.winfo_height()
-            screen_width = self.root.winfo_screenwidth()
-        except:
-            return False
-            
-        if self.dock_side == 'left':
-            return (mouse_x < self.DOCK_OFFSET) and \
-                   (window_y < mouse_y < window_y + window_height)
-                   
-        elif self.dock_side == 'right':
-            return (mouse_x > screen_width - self.DOCK_OFFSET) and \
-                   (window_y < mouse_y < window_y + window_height)
-                   
-        elif self.dock_side == 'top':
-            return (mouse_y < self.DOCK_OFFSET) and \
-                   (window_x < mouse_x < window_x + window_width)
-                   
-        return False
-
-    def should_hide_window(self, mouse_x, mouse_y):
-        """检查是否应该隐藏窗口 - 鼠标离开窗口区域"""
-        if self.is_hidden or not self.is_docked:
-            return False
-            
-        try:
-            window_x = self.root.winfo_x()
-            window_y = self.root.winfo_y()
-            window_width = self.root.winfo_width()
-            window_height = self.root.winfo_height()
-        except:
-            return False
-            
-        # 检查鼠标是否在窗口区域外
-        mouse_outside = not (window_x <= mouse_x <= window_x + window_width and 
-                           window_y <= mouse_y <= window_y + window_height)
-        
-        return mouse_outside
-
     def start_hide_timer_unified(self):
         """统一的隐藏计时器启动方法"""
         # 取消之前的计时器
@@ -259,11 +337,19 @@ class WindowsThemeSwitcher:
         if self.is_docked and not self.is_hidden:
             self.hide_timer_id = self.root.after(500, self.hide_window)
 
+    def cancel_hide_timer(self):
+        """鼠标回到窗口内，取消隐藏计时器"""
+        if self.hide_timer_id:
+            self.root.after_cancel(self.hide_timer_id)
+            self.hide_timer_id = None
+
     def start_drag(self, event):
         self.drag_start_x = event.x_root
         self.drag_start_y = event.y_root
         self.window_start_x = self.root.winfo_x()
         self.window_start_y = self.root.winfo_y()
+        # 拖动期间窗口位置不断变化，暂停热区检测，松开后重新计算
+        self.dock_tester.set_zones(None)
 
     def on_drag(self, event):
         if self.is_hidden:
@@ -274,159 +360,140 @@ class WindowsThemeSwitcher:
         new_y = self.window_start_y + dy
         self.root.geometry(f"+{new_x}+{new_y}")
 
+    def current_window_rect(self):
+        return Rect.from_size(self.root.winfo_x(), self.root.winfo_y(),
+                              self.root.winfo_width(), self.root.winfo_height())
+
     def end_drag(self, event):
-        screen_width = self.root.winfo_screenwidth()
-        x = self.root.winfo_x()
-        window_width = self.root.winfo_width()
+        """松开时在窗口所在显示器的四条边中查找吸附边（包括两块屏幕相接的内侧边）"""
         snap_threshold = 50
-        if x <= snap_threshold:
-            self.dock_to_edge('left')
-        elif x + window_width >= screen_width - snap_threshold:
-            self.dock_to_edge('right')
-        elif self.root.winfo_y() <= snap_threshold:
-            self.dock_to_edge('top')
+        side, monitor = self.monitor_provider.get_layout().snap(self.current_window_rect(), snap_threshold)
+        if side:
+            self.dock_to_edge(side, monitor)
         else:
             self.undock()
 
-    def dock_to_edge(self, side):
-        screen_width = self.root.winfo_screenwidth()
-        window_width = self.root.winfo_width()
+    def dock_to_edge(self, side, monitor=None):
+        window = self.current_window_rect()
+        if monitor is None:
+            monitor = self.monitor_provider.get_layout().nearest(window.left, window.top)
         self.is_docked = True
         self.dock_side = side
-        if side == 'left':
-            self.root.geometry(f"+0+{self.root.winfo_y()}")
-        elif side == 'right':
-            self.root.geometry(f"+{screen_width - window_width}+{self.root.winfo_y()}")
-        elif side == 'top':
-            self.root.geometry(f"+{self.root.winfo_x()}+0")
+        rect = docked_window_rect(side, monitor, window.width, window.height, window.left, window.top)
+        self.root.geometry(f"+{rect.left}+{rect.top}")
+        self.update_dock_zones(rect, monitor)
         self.root.after(1000, self.hide_window)
 
+    def update_dock_zones(self, window_rect, monitor):
+        """停靠、移动或改变大小后重新计算并缓存热区（展开时的窗口区域与触发条）"""
+        interior = self.monitor_provider.get_layout().is_interior(monitor, self.dock_side, window_rect)
+        self.dock_zones = compute_dock_zones(self.dock_side, window_rect, monitor, self.DOCK_OFFSET, interior)
+        self.dock_tester.set_zones(self.dock_zones)
+
+    def on_root_configure(self, event):
+        """停靠状态下窗口大小变化时重新计算热区"""
+        if event.widget is not self.root or not self.is_docked or self.dock_zones is None:
+            return
+        window = self.dock_zones.window
+        if (event.width, event.height) != (window.width, window.height) and event.width > 1:
+            rect = docked_window_rect(self.dock_side, self.dock_zones.monitor, event.width, event.height,
+                                      window.left, window.top)
+            self.update_dock_zones(rect, self.dock_zones.monitor)
+
+    def on_display_change(self):
+        """显示器增减或分辨率变化后，按新布局重新停靠到最近的显示器"""
+        if not self.is_docked or self.dock_zones is None:
+            return
+        window = self.dock_zones.window
+        monitor = self.monitor_provider.get_layout().nearest(window.left + window.width // 2,
+                                                             window.top + window.height // 2)
+        rect = docked_window_rect(self.dock_side, monitor, window.width, window.height, window.left, window.top)
+        self.update_dock_zones(rect, monitor)
+        if self.is_hidden:
+            # 按新位置重新隐藏
+            self.remove_dock_indicator()
+            self.is_hidden = False
+            self.root.deiconify()
+            self.hide_window()
+        else:
+            self.root.geometry(f"+{rect.left}+{rect.top}")
+
     def undock(self):
         self.is_docked = False
         self.dock_side = None
+        self.dock_zones = None
+        self.dock_tester.set_zones(None)
         self.remove_dock_indicator()
         self.stop_mouse_check()
-        if self.hide_timer_id:
-            self.root.after_cancel(self.hide_timer_id)
-            self.hide_timer_id = None
+        self.cancel_hide_timer()
 
     def hide_window(self):
         """隐藏窗口 - 统一管理版本"""
-        if not self.is_docked:
+        if not self.is_docked or self.dock_zones is None:
             return
-        window_width = self.root.winfo_width()
-        window_height = self.root.winfo_height()
-        screen_width = self.root.winfo_screenwidth()
-        current_x = self.root.winfo_x()
-        current_y = self.root.winfo_y()
-        if self.dock_side == 'left':
-            self.root.geometry(f"+{-window_width + self.DOCK_OFFSET}+{current_y}")
-        elif self.dock_side == 'right':
-            self.root.geometry(f"+{screen_width - self.DOCK_OFFSET}+{current_y}")
-        elif self.dock_side == 'top':
-            self.root.geometry(f"+{current_x}+{-window_height + self.DOCK_OFFSET}")
+        if self.dock_zones.interior:
+            # 内侧边滑出去会出现在相邻显示器上，只保留指示条
+            self.root.withdraw()
+        else:
+            x, y = hidden_position(self.dock_zones)
+            self.root.geometry(f"+{x}+{y}")
         self.is_hidden = True
+        self.hide_timer_id = None
+        self.dock_tester.set_hidden(True)
         self.create_dock_indicator()
         # 隐藏后启动鼠标检测，用于检测何时显示
-        if not self.mouse_check_running:
-            self.start_mouse_check()
+        self.start_mouse_check()
 
     def show_window(self):
         """显示窗口 - 统一管理版本"""
-        if not self.is_hidden:
+        if not self.is_hidden or self.dock_zones is None:
             return
-        screen_width = self.root.winfo_screenwidth()
-        window_width = self.root.winfo_width()
-        current_y = self.root.winfo_y()
-        current_x = self.root.winfo_x()
-        if self.dock_side == 'left':
-            self.root.geometry(f"+0+{current_y}")
-        elif self.dock_side == 'right':
-            self.root.geometry(f"+{screen_width - window_width}+{current_y}")
-        elif self.dock_side == 'top':
-            self.root.geometry(f"+{current_x}+0")
+        self.ensure_timer_module()
+        window = self.dock_zones.window
+        self.root.geometry(f"+{window.left}+{window.top}")
+        if self.dock_zones.interior:
+            self.root.deiconify()
         self.is_hidden = False
+        self.dock_tester.set_hidden(False)
         self.remove_dock_indicator()
         # 显示后继续鼠标检测，用于检测何时隐藏
-        if not self.mouse_check_running:
-            self.start_mouse_check()
+        self.start_mouse_check()
 
     def start_mouse_check(self):
-        """启动鼠标检测线程 - 统一管理显示和隐藏逻辑"""
-        if self.mouse_check_running:
-            return
-        self.mouse_check_running = True
-        self.mouse_check_thread = threading.Thread(target=self.mouse_check_loop, daemon=True)
-        self.mouse_check_thread.start()
+        """启动光标事件源，由缓存的热区判断显示和隐藏"""
+        self.cursor_source.start(self.dock_tester.on_cursor, self.dock_tester.distance)
 
     def stop_mouse_check(self):
-        """停止鼠标检测线程"""
-        self.mouse_check_running = False
-
-    def mouse_check_loop(self):
-        """鼠标检测循环 - 统一处理显示和隐藏逻辑"""
-        while self.mouse_check_running and self.is_docked:
-            try:
-                mouse_x, mouse_y = self.get_mouse_position()
-                
-                if self.is_hidden:
-                    # 窗口隐藏时：检测是否应该显示
-                    if self.should_show_window(mouse_x, mouse_y):
-                        self.root.after(0, self.show_window)
-                        # 显示后继续检测，不退出循环
-                else:
-                    # 窗口显示时：检测是否应该隐藏
-                    if self.should_hide_window(mouse_x, mouse_y):
-                        # 只有在没有活动计时器时才启动新的隐藏计时器
-                        if not self.hide_timer_id:
-                            self.root.after(0, self.start_hide_timer_unified)
-                    else:
-                        # 鼠标回到窗口内，取消隐藏计时器
-                        if self.hide_timer_id:
-                            self.root.after_cancel(self.hide_timer_id)
-                            self.hide_timer_id = None
-                        
-                time.sleep(0.1)
-            except:
-                break
-
-
+        """停止光标事件源"""
+        self.cursor_source.stop()
 
     def get_mouse_position(self):
+        # 非 Windows 平台只在 Tk 线程中调用（见 TimerPollingCursorSource）
+        if sys.platform != 'win32':
+            return self.root.winfo_pointerxy()
         point = wintypes.POINT()
         ctypes.windll.user32.GetCursorPos(ctypes.byref(point))
         return point.x, point.y
 
     def create_dock_indicator(self):
-        if self.dock_indicator:
+        """显示停靠指示条（窗口只创建一次，之后重新定位并着色）"""
+        if self.dock_indicator or self.dock_zones is None:
             return
-        self.dock_indicator = tk.Toplevel(self.root)
-        self.dock_indicator.overrideredirect(True)
-        self.dock_indicator.attributes('-topmost', True)
-        self.update_dock_indicator_color()
-        screen_width = self.root.winfo_screenwidth()
-        window_width = self.root.winfo_width()
-        window_height = self.root.winfo_height()
-        current_x = self.root.winfo_x()
-        current_y = self.root.winfo_y()
-        if self.dock_side == 'left':
-            self.dock_indicator.geometry(f"{self.DOCK_OFFSET}x{window_height}+0+{current_y}")
-        elif self.dock_side == 'right':
-            self.dock_indicator.geometry(f"{self.DOCK_OFFSET}x{window_height}+{screen_width - self.DOCK_OFFSET}+{current_y}")
-        elif self.dock_side == 'top':
-            self.dock_indicator.geometry(f"{window_width}x{self.DOCK_OFFSET}+{current_x}+0")
+        self.dock_indicator, _ = self.window_pool.acquire('dock_indicator')
+        reveal = self.dock_zones.reveal
+        self.dock_indicator.geometry(f"{reveal.width}x{reveal.height}+{reveal.left}+{reveal.top}")
+        self.window_pool.show('dock_indicator')
+
+    def build_dock_indicator(self, indicator):
+        indicator.overrideredirect(True)
+        indicator.attributes('-topmost', True)
+        self.style.register(indicator, 'indicator')
 
     def remove_dock_indicator(self):
         if self.dock_indicator:
-            self.dock_indicator.destroy()
+            self.window_pool.release('dock_indicator')
             self.dock_indicator = None
 
-    def update_dock_indicator_color(self):
-        if self.dock_indicator:
-            theme = self.get_current_theme()
-            indicator_color = '#FFFFFF' if theme == 'light' else '#000000'
-            self.dock_indicator.configure(bg=indicator_color)
-
     def center_window(self):
         self.root.update_idletasks()
         screen_width = self.root.winfo_screenwidth()
@@ -438,183 +505,181 @@ class WindowsThemeSwitcher:
         self.root.geometry(f"+{x}+{y}")
 
     def get_current_theme(self):
-        try:
-            key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"SOFTWARE\Microsoft\Windows\CurrentVersion\Themes\Personalize")
-            value, _ = winreg.QueryValueEx(key, "AppsUseLightTheme")
-            winreg.CloseKey(key)
-            return 'light' if value == 1 else 'dark'
-        except:
-            return 'unknown'
+        return self.theme_state.get()
+
+    def on_theme_state_changed(self, theme, origin):
+        """主题被设置应用或其他工具修改时立即刷新界面（可能在监听线程中调用）"""
+        if origin == 'external':
+            self.dispatcher.post(self.update_theme_status)
 
     def update_ui_theme(self):
-        theme = self.get_current_theme()
-        colors = self.dark_theme_colors if theme == 'dark' else self.light_theme_colors
-        self.root.config(bg=colors['bg'])
-        self.main_frame.config(bg=colors['bg'])
-        self.content_frame.config(bg=colors['bg'])
-        self.status_label.config(bg=colors['bg'], fg=colors['fg'])
-        self.toggle_btn.config(bg=colors['btn_bg'], fg=colors['fg'], activebackground=colors['btn_active_bg'], relief=tk.FLAT)
-        self.restart_check.config(bg=colors['bg'], fg=colors['fg'], selectcolor=colors['bg'], activebackground=colors['bg'], activeforeground=colors['fg'])
-        self.restart_now_btn.config(bg=colors['btn_bg'], fg=colors['fg'], activebackground=colors['btn_active_bg'], relief=tk.FLAT)
-        self.close_btn.config(bg=colors['bg'], fg=colors['fg'], activebackground=colors['btn_active_bg'])
-        
-        # 更新定时切换模块颜色
-        if hasattr(self, 'timer_frame'):
-            self.timer_frame.config(bg=colors['bg'])
-            self.timer_toggle_btn.config(bg=colors['btn_bg'], fg=colors['fg'], activebackground=colors['btn_active_bg'], relief=tk.FLAT)
-            self.dark_time_frame.config(bg=colors['bg'])
-            self.light_time_frame.config(bg=colors['bg'])
-            self.dark_time_label.config(bg=colors['bg'], fg=colors['fg'])
-            self.light_time_label.config(bg=colors['bg'], fg=colors['fg'])
-            self.dark_icon_label.config(bg=colors['bg'])
-            self.light_icon_label.config(bg=colors['bg'])
-        
-        # 更新蒙版颜色
-        self.update_ui_mask_color()
+        """按当前主题为所有登记的控件着色（主题未变时不调用 Tk）"""
+        self.style.apply(self.get_current_theme())
 
     def update_theme_status(self):
         theme = self.get_current_theme()
-        if theme == 'light':
-            self.status_label.config(text="当前主题: 浅色模式")
-            self.toggle_btn.config(text="切换到暗色")
-        elif theme == 'dark':
-            self.status_label.config(text="当前主题: 暗色模式")
-            self.toggle_btn.config(text="切换到浅色")
-        else:
-            self.status_label.config(text="当前主题: 检测失败")
-            self.toggle_btn.config(text="切换主题")
-        self.update_ui_theme()
-        self.update_dock_indicator_color()
+        with tracing.span('ui.refresh', theme=theme):
+            if theme == 'light':
+                self.status_label.config(text="当前主题: 浅色模式")
+                self.toggle_btn.config(text="切换到暗色")
+            elif theme == 'dark':
+                self.status_label.config(text="当前主题: 暗色模式")
+                self.toggle_btn.config(text="切换到浅色")
+            else:
+                self.status_label.config(text="当前主题: 检测失败")
+                self.toggle_btn.config(text="切换主题")
+            self.update_ui_theme()
+        self.remember_theme(theme)
 
-    def execute_restart_explorer(self):
-        try:
-            script_path = self.resource_path("restart_explorer_only.bat")
-            subprocess.run([script_path], creationflags=subprocess.CREATE_NO_WINDOW, check=True)
-        except Exception as e:
-            self.status_label.config(text=f"重启失败: {e}")
+    def remember_theme(self, theme):
+        """记录最近显示的主题，下次启动时直接用于首次绘制"""
+        if theme in ('dark', 'light') and theme != self.last_theme:
+            self.last_theme = theme
+            self.save_config()
 
-    def execute_theme_toggle(self):
-        try:
-            if self.restart_explorer.get():
-                script_path = self.resource_path("toggle_and_restart.bat")
+    def run_restart_explorer_script(self):
+        """运行重启资源管理器脚本（唯一仍需外部进程的操作，在后台线程中调用）"""
+        run_restart_explorer_script(self.RESTART_JOB_TIMEOUT)
+
+    def describe_job_failure(self, job):
+        """后台任务失败或超时的提示文字"""
+        if job.state == TIMEOUT:
+            return f"操作超时（{job.timeout} 秒）"
+        return str(job.error)
+
+    def get_theme_job_timeout(self, restart):
+        timeout = self.THEME_JOB_TIMEOUT + (self.RESTART_JOB_TIMEOUT if restart else 0)
+        propagation = self.theme_controller.propagation
+        return timeout + (propagation.timeout if propagation else 0)
+
+    def report_propagation(self):
+        """输出上次切换中失败或超时的传播插件"""
+        report = self.theme_controller.last_propagation
+        if report is not None and report.failed:
+            print("主题传播插件未完成:\n" + '\n'.join(report.lines(failed_only=True)))
+
+    def execute_restart_explorer(self, on_done=None):
+        """在后台重启资源管理器，连续请求合并为一次"""
+        def report(job):
+            if job.state != DONE:
+                self.status_label.config(text=f"重启失败: {self.describe_job_failure(job)}")
+            if on_done:
+                on_done(job)
+
+        return self.job_runner.submit('restart_explorer', self.run_restart_explorer_script,
+                                      on_done=report, timeout=self.RESTART_JOB_TIMEOUT)
+
+    def set_theme(self, theme, source='manual', on_done=None):
+        """
+        在后台确保系统处于指定主题（'dark' / 'light'）。
+        已处于目标主题时不写注册表、不重启资源管理器、不刷新界面。
+        on_done(job) 在 Tk 线程中调用，job.result 表示是否实际切换。
+        """
+        restart = self.restart_explorer.get()
+
+        def work():
+            return self.theme_controller.set_theme(theme, restart=restart, source=source)
+
+        def report(job):
+            if job.state == DONE and job.result:
+                self.update_theme_status()
+                self.report_propagation()
+            if on_done:
+                on_done(job)
+
+        # 排队中的同类请求合并为最后一次；控制接口要按各自的目标主题回复客户端，
+        # 只合并目标相同的请求
+        key = ('set_theme', source, theme) if source == 'control' else ('set_theme', source)
+        return self.job_runner.submit(key, work, on_done=report, timeout=self.get_theme_job_timeout(restart))
+
+    def execute_theme_toggle(self, on_done=None, source='manual'):
+        """在后台切换主题（进程内写注册表，不再经由 cmd.exe + reg.exe）"""
+        restart = self.restart_explorer.get()
+
+        def report(job):
+            if job.state == DONE:
+                self.update_theme_status()
+                self.report_propagation()
             else:
-                script_path = self.resource_path("toggle_theme.bat")
-            subprocess.run([script_path], creationflags=subprocess.CREATE_NO_WINDOW, check=True)
-            self.root.after(500, self.update_theme_status)
-        except Exception as e:
-            self.status_label.config(text=f"切换失败: {e}")
-    
-    def show_splash_screen(self):
-        """显示启动画面"""
-        # 创建启动画面窗口
-        self.splash = tk.Toplevel()
-        self.splash.overrideredirect(True)
-        self.splash.geometry("400x225")
-        
-        # 检测当前主题并设置背景色
-        current_theme = self.get_current_theme()
-        bg_color = '#f5f7fc' if current_theme == 'light' else '#17191f'
-        fg_color = '#333333' if current_theme == 'light' else '#e0e0e0'
-        
-        self.splash.configure(bg=bg_color)
-        
-        # 计算屏幕中央位置
-        screen_width = self.splash.winfo_screenwidth()
-        screen_height = self.splash.winfo_screenheight()
-        x = (screen_width - 400) // 2
-        y = (screen_height - 225) // 2
-        self.splash.geometry(f"400x225+{x}+{y}")
-        
-        # 创建内容
-        main_frame = tk.Frame(self.splash, bg=bg_color)
-        main_frame.pack(fill='both', expand=True)
-        
-        # 程序标题
-        title_label = tk.Label(main_frame, text="Windows主题切换器", 
-                              font=('Microsoft YaHei UI', 16, 'bold'),
-                              bg=bg_color, fg=fg_color)
-        title_label.pack(pady=(60, 20))
-        
-        # 版本信息
-        version_label = tk.Label(main_frame, text="版本 1.6.3", 
-                                font=('Microsoft YaHei UI', 10),
-                                bg=bg_color, fg=fg_color)
-        version_label.pack(pady=(0, 30))
-        
-        # 初始化提示
-        status_label = tk.Label(main_frame, text="正在初始化...", 
-                               font=('Microsoft YaHei UI', 9),
-                               bg=bg_color, fg=fg_color)
-        status_label.pack(pady=(0, 40))
-        
-        # 2秒后显示主窗口
-        self.splash.after(2000, self.show_main_window)
+                self.status_label.config(text=f"切换失败: {self.describe_job_failure(job)}")
+            if on_done:
+                on_done(job)
+
+        return self.job_runner.submit('toggle', lambda: self.theme_controller.toggle(restart=restart, source=source),
+                                      on_done=report, timeout=self.get_theme_job_timeout(restart))
     
     def show_main_window(self):
-        """销毁启动画面并显示主程序"""
-        # 销毁启动画面
-        if hasattr(self, 'splash'):
-            self.splash.destroy()
-        
+        """显示主程序"""
         # ---- 实现边缘启动逻辑 ----
         # 1. 立即设置初始停靠状态
         self.dock_side = 'right'  # 设置默认停靠在右侧
         self.is_docked = True
         self.is_hidden = True       # 立即将状态标记为隐藏
 
-        # 2. 计算并预设边缘位置（在显示窗口之前）
-        screen_width = self.root.winfo_screenwidth()
-        screen_height = self.root.winfo_screenheight()
-        
-        # X坐标：屏幕宽度 - 可见触发条的宽度
-        x_pos = screen_width - self.DOCK_OFFSET
+        # 2. 计算并预设边缘位置（在显示窗口之前）：主显示器右边缘，
+        #    若右侧还接着其他显示器则改用最右侧显示器的右边缘
+        layout = self.monitor_provider.get_layout()
+        monitor = layout.primary
+        if layout.neighbors[(0, 'right')]:
+            monitor = max(layout.monitors, key=lambda m: m.right)
         
         # Y坐标：屏幕高度的一半 - 窗口高度的一半
-        y_pos = (screen_height // 2) - (240 // 2)  # 使用固定高度240
+        y_pos = monitor.top + (monitor.height // 2) - (240 // 2)  # 使用固定高度240
+        self.update_dock_zones(docked_window_rect('right', monitor, self.WINDOW_WIDTH, self.WINDOW_HEIGHT,
+                                                  monitor.right, y_pos), monitor)
+        self.dock_tester.set_hidden(True)
 
-        # 3. 先设置位置，再显示窗口（避免窗口闪烁）
-        self.root.geometry(f'+{int(x_pos)}+{int(y_pos)}')
+        # 3. 先设置位置（X坐标为可见触发条处），再显示窗口（避免窗口闪烁）
+        x_pos, y_pos = hidden_position(self.dock_zones)
+        self.root.geometry(f'+{x_pos}+{y_pos}')
         self.root.deiconify()
 
         # 4. 创建指示器并启动新的调度器
         self.create_dock_indicator()
         self.start_mouse_check()
         self.schedule_next_event()
+
+    def on_first_map(self, event):
+        """主窗口首次映射到屏幕：结束启动计时，并在空闲时完成剩余的初始化"""
+        if event.widget is not self.root:
+            return
+        self.root.unbind('<Map>')
+        self.profiler.mark('first map')
+        self.root.after_idle(self.finish_startup)
+
+    def finish_startup(self):
+        """校验首次绘制使用的主题记录；实际主题不同时由订阅回调刷新界面"""
+        # 执行主循环启动前由后台线程投递的回调
+        self.dispatcher.drain()
+        if self.theme_seeded:
+            self.theme_state.refresh()
+            self.profiler.mark('theme verify', '读取注册表')
+        if self.profiler.enabled:
+            print(self.profiler.report())
+        # 开始检查配置文件的外部修改
+        self.root.after(RELOAD_INTERVAL_MS, self.watch_config)
     
     def create_ui_mask(self):
         """创建UI蒙版"""
         self.ui_mask = tk.Frame(self.main_frame)
+        self.style.register(self.ui_mask, 'mask')
+        self.processing_label = tk.Label(self.ui_mask, text="处理中...",
+                                         font=('Microsoft YaHei UI', 10))
+        self.style.register(self.processing_label, 'mask_label')
         # 默认隐藏蒙版
         self.ui_mask.place_forget()
     
-    def update_ui_mask_color(self):
-        """根据当前主题更新蒙版颜色"""
-        if self.ui_mask:
-            theme = self.get_current_theme()
-            # 使用较浅的颜色来模拟半透明效果
-            mask_color = '#f0f0f0' if theme == 'light' else '#404040'
-            self.ui_mask.configure(bg=mask_color)
-    
     def lock_ui(self):
         """锁定UI"""
+        if self.ui_mask is None:
+            self.create_ui_mask()
         # 禁用所有可交互控件
         for widget in self.interactive_widgets:
             widget.configure(state=tk.DISABLED)
         
-        # 更新蒙版颜色并显示
-        self.update_ui_mask_color()
+        # 显示蒙版和处理中提示（颜色由配色登记表随主题更新）
         self.ui_mask.place(relwidth=1, relheight=1)
         self.ui_mask.lift()
-        
-        # 添加处理中提示标签
-        if not hasattr(self, 'processing_label'):
-            self.processing_label = tk.Label(self.ui_mask, text="处理中...", 
-                                           font=('Microsoft YaHei UI', 10),
-                                           bg=self.ui_mask.cget('bg'))
-        
-        theme = self.get_current_theme()
-        label_fg = '#666666' if theme == 'light' else '#cccccc'
-        self.processing_label.configure(fg=label_fg, bg=self.ui_mask.cget('bg'))
         self.processing_label.place(relx=0.5, rely=0.5, anchor='center')
     
     def unlock_ui(self):
@@ -624,69 +689,287 @@ class WindowsThemeSwitcher:
             widget.configure(state=tk.NORMAL)
         
         # 隐藏处理中标签
-        if hasattr(self, 'processing_label'):
+        # 隐藏处理中标签和蒙版
+        if self.ui_mask:
             self.processing_label.place_forget()
-        
-        # 隐藏蒙版
-        self.ui_mask.place_forget()
+            self.ui_mask.place_forget()
     
-    def execute_theme_toggle_with_lock(self):
+    def execute_theme_toggle_with_lock(self, on_done=None, source='manual'):
         """带锁定的主题切换"""
         # 立即锁定UI
         self.lock_ui()
         
-        # 判断锁定时间
-        lock_duration = 3000 if self.restart_explorer.get() else 500
-        
-        # 异步执行脚本
-        self.root.after(100, self.execute_theme_toggle)
-        
-        # 按预设时长解锁UI
-        self.root.after(lock_duration, self.unlock_ui)
+        # 后台执行，完成（或超时）后立即解锁UI
+        self.execute_theme_toggle(on_done=lambda job: self.unlock_after(job, on_done), source=source)
+
+    def unlock_after(self, job, on_done=None):
+        self.unlock_ui()
+        if on_done:
+            on_done(job)
     
+    def execute_set_theme_with_lock(self, theme, on_done=None, source='manual'):
+        """带锁定的设置主题（已是该主题时不做任何操作）"""
+        self.lock_ui()
+        self.set_theme(theme, source=source, on_done=lambda job: self.unlock_after(job, on_done))
+
+    def start_control_server(self):
+        """启动本地控制接口；首次启用时生成令牌并写入配置"""
+        from control_server import ControlServer
+        if not self.control_token:
+            import secrets
+            self.control_token = secrets.token_urlsafe(24)
+            self.save_config()
+        self.control_server = ControlServer(self.on_control_command, self.control_token, self.control_port)
+        try:
+            self.control_server.start()
+        except OSError as e:
+            print(f"控制接口启动失败: {e}")
+            self.control_server = None
+            return
+        print(f"控制接口: http://127.0.0.1:{self.control_server.port}（令牌见 {self.config_file}）")
+
+    def on_control_command(self, command, params, reply):
+        """控制接口的请求（在控制接口线程中调用），交给 Tk 线程执行"""
+        self.dispatcher.post(lambda: self.run_control_command(command, params, reply))
+
+    def run_control_command(self, command, params, reply):
+        """与按钮、定时任务相同的代码路径执行控制接口的请求，完成后 reply(结果, 状态码)"""
+        def report(job):
+            if job.state != DONE:
+                reply({'error': self.describe_job_failure(job)}, 504 if job.state == TIMEOUT else 500)
+            elif command == 'toggle':
+                reply({'theme': job.result, 'changed': True})
+            else:
+                reply({'theme': theme, 'changed': bool(job.result)})
+
+        if command == 'status':
+            reply(self.control_status())
+        elif command == 'toggle':
+            self.execute_theme_toggle_with_lock(on_done=report)
+        elif command == 'set':
+            theme = params.get('theme')
+            if theme not in ('dark', 'light'):
+                reply({'error': f"无效的主题: {theme}"}, 400)
+                return
+            self.execute_set_theme_with_lock(theme, on_done=report, source='control')
+        elif command == 'schedule':
+            reply(self.control_schedule())
+        elif command == 'update_schedule':
+            try:
+                self.update_schedule_settings(params)
+            except ValueError as e:
+                reply({'error': str(e)}, 400)
+                return
+            reply(self.control_schedule())
+        elif command == 'metrics':
+            reply(self.collect_metrics())
+        elif command == 'trace':
+            if not tracing.TRACER.enabled:
+                reply({'error': '未启用跟踪（以 --trace 启动或在配置中设置 [Diagnostics] tracing = True）'}, 400)
+                return
+            try:
+                reply(tracing.TRACER.render(params.get('format', 'prometheus')))
+            except ValueError as e:
+                reply({'error': str(e)}, 400)
+        else:
+            reply({'error': f"未知命令: {command}"}, 404)
+
+    def control_status(self):
+        return {
+            'theme': self.get_current_theme(),
+            'timer_enabled': self.is_timed_switching_enabled,
+            'docked': self.is_docked,
+            'hidden': self.is_hidden,
+            'busy': self.job_runner.is_busy(),
+        }
+
+    def control_schedule(self):
+        dark_text, light_text = self.get_schedule_display_times()
+        schedule = {
+            'enabled': self.is_timed_switching_enabled,
+            'mode': self.schedule_mode,
+            'dark_time': dark_text,
+            'light_time': light_text,
+            'next_event': None,
+        }
+        if self.is_timed_switching_enabled and self.scheduler.timer_id and self.scheduler.next_event:
+            when, theme = self.scheduler.next_event
+            schedule['next_event'] = {'time': when.isoformat(timespec='minutes'), 'theme': theme}
+        return schedule
+
+    def update_schedule_settings(self, params):
+        """按控制接口的参数修改定时设置，与界面开关和时间选择器的处理相同"""
+        times = {}
+        for key in ('dark_time', 'light_time'):
+            if key in params:
+                parse_hhmm(params[key])
+                times[key] = params[key]
+        enabled = params.get('enabled', self.is_timed_switching_enabled)
+        if isinstance(enabled, str):
+            if enabled.lower() not in ('true', 'false', '1', '0'):
+                raise ValueError(f"enabled 应为 true 或 false: {enabled}")
+            enabled = enabled.lower() in ('true', '1')
+        self.dark_time = times.get('dark_time', self.dark_time)
+        self.light_time = times.get('light_time', self.light_time)
+        self.is_timed_switching_enabled = bool(enabled)
+        if hasattr(self, 'timer_toggle_btn'):
+            self.timer_toggle_btn.config(text="√" if self.is_timed_switching_enabled else "×")
+        self.save_config()
+        self.compile_schedule()
+        self.update_timer_labels()
+        self.schedule_next_event()
+
+    def collect_metrics(self):
+        """各模块的统计（在 Tk 线程中复制，交给控制接口线程序列化）"""
+        metrics = {
+            'theme_controller': dict(self.theme_controller.stats),
+            'profiles': {name: dict(stats) for name, stats in self.theme_controller.profile_stats.items()},
+            'jobs': dict(self.job_runner.stats),
+            'dispatcher': dict(self.dispatcher.stats),
+            'style': dict(self.style.stats),
+            'config_store': dict(self.config_store.stats),
+            'window_pool': dict(self.window_pool.stats),
+        }
+        if self.control_server:
+            metrics['control_server'] = dict(self.control_server.stats)
+        if self.instance_server:
+            metrics['instance_server'] = dict(self.instance_server.stats)
+        if self.history_log:
+            metrics['history'] = dict(self.history_log.stats)
+        if self.theme_controller.propagation:
+            metrics['propagation'] = {name: dict(stats)
+                                      for name, stats in self.theme_controller.propagation.stats.items()}
+        if tracing.TRACER.enabled:
+            metrics['tracing'] = tracing.TRACER.summary()
+        return metrics
+
+    def show_from_command(self):
+        """再次启动程序时展开停靠的窗口并置于最前；光标移入再移出后照常隐藏"""
+        self.show_window()
+        self.root.lift()
+
+    def on_instance_command(self, message):
+        """
+        处理再次启动时转发来的命令（在监听线程中调用）。
+        界面操作投递到 Tk 线程执行，立即回复，转发方无需等待切换完成。
+        切换来源记为 ipc，与守护模式一致。
+        """
+        command = message.get('command')
+        if command == 'show':
+            self.dispatcher.post(self.show_from_command)
+        elif command == 'toggle':
+            self.dispatcher.post(lambda: self.execute_theme_toggle_with_lock(source='ipc'))
+        elif command == 'set':
+            theme = message.get('theme')
+            if theme not in ('dark', 'light'):
+                return {'ok': False, 'error': f"无效的主题: {theme}"}
+            self.dispatcher.post(lambda: self.execute_set_theme_with_lock(theme, source='ipc'))
+        elif command == 'reload':
+            self.dispatcher.post(self.reload_config)
+        elif command == 'export_trace':
+            # 只读跟踪缓冲区，直接在监听线程中写文件
+            return tracing.handle_export_command(message)
+        else:
+            return {'ok': False, 'error': f"未知命令: {command}"}
+        return {'ok': True}
+
     def execute_restart_explorer_with_lock(self):
         """带锁定的重启资源管理器"""
         # 立即锁定UI
         self.lock_ui()
         
-        # 异步执行脚本
-        self.root.after(100, self.execute_restart_explorer)
-        
-        # 3秒后解锁UI
-        self.root.after(3000, self.unlock_ui)
+        # 后台执行，完成（或超时）后立即解锁UI
+        self.execute_restart_explorer(on_done=lambda job: self.unlock_ui())
     
     def load_config(self):
         """加载配置文件"""
-        config = configparser.ConfigParser()
+        self.apply_settings(self.config_store.load())
+
+    def watch_config(self):
+        """定期检查配置文件是否被外部修改，修改后立即应用到界面和调度器"""
+        settings = self.config_store.check_reload()
+        if settings is not None:
+            self.apply_reloaded_settings(settings)
+        self.root.after(RELOAD_INTERVAL_MS, self.watch_config)
+
+    def reload_config(self):
+        """立即重新读取配置文件（先写入尚未保存的修改）"""
+        self.config_store.flush()
+        self.apply_reloaded_settings(self.config_store.load())
+
+    def apply_reloaded_settings(self, settings):
+        self.apply_settings(settings)
+        if hasattr(self, 'timer_toggle_btn'):
+            self.timer_toggle_btn.config(text="√" if self.is_timed_switching_enabled else "×")
+        self.update_timer_labels()
+        self.schedule_next_event()
+        print("已重新加载配置文件")
+
+    def apply_settings(self, settings):
+        """把配置应用到界面状态并重新编译日程"""
+        self.is_timed_switching_enabled = settings.enabled
+        self.dark_time = settings.dark_time
+        self.light_time = settings.light_time
+        self.restart_explorer.set(settings.restart_on_switch)
+        self.apply_strategy = settings.apply_strategy
+        self.schedule_mode = settings.mode
+        self.latitude = settings.latitude
+        self.longitude = settings.longitude
+        self.sunrise_offset = settings.sunrise_offset
+        self.sunset_offset = settings.sunset_offset
+        self.schedule_rules = settings.schedule_rules
+        # 控制接口的端口和令牌在启动时生效
+        self.control_enabled = settings.control_enabled
+        self.control_port = settings.control_port
+        self.control_token = settings.control_token
+        self.theme_controller.applier = create_default_applier(self.run_restart_explorer_script,
+                                                               self.apply_strategy)
+        self.apply_profiles(settings)
+        self.apply_propagation(settings)
+        self.compile_schedule()
+
+    def apply_profiles(self, settings):
+        """按配置设置暗色/浅色使用的主题方案；方案有误时保留原来的方案"""
         try:
-            config.read(self.config_file, encoding='utf-8')
-            if 'TimerSettings' in config:
-                self.is_timed_switching_enabled = config.getboolean('TimerSettings', 'enabled', fallback=False)
-                self.dark_time = config.get('TimerSettings', 'dark_time', fallback='20:00')
-                self.light_time = config.get('TimerSettings', 'light_time', fallback='06:00')
-                restart_on_switch = config.getboolean('TimerSettings', 'restart_on_switch', fallback=True)
-                self.restart_explorer.set(restart_on_switch)
-        except Exception:
-            # 如果配置文件不存在或损坏，使用默认值
-            self.is_timed_switching_enabled = False
-            self.dark_time = "20:00"
-            self.light_time = "06:00"
-            self.restart_explorer.set(True)
+            profiles = build_profiles(settings)
+        except ValueError as e:
+            print(f"主题方案配置错误: {e}")
+            return
+        self.theme_controller.profiles = profiles
+        self.style.set_palettes(profile_palettes(profiles))
+
+    def apply_propagation(self, settings):
+        """按配置设置主题传播插件；插件配置有误时保留原来的插件"""
+        try:
+            plugins = build_plugins(settings)
+        except ValueError as e:
+            print(f"主题传播插件配置错误: {e}")
+            return
+        self.theme_controller.propagation = PropagationRunner(plugins) if plugins else None
+
+    def current_settings(self):
+        """把界面中的定时设置收集为 Settings"""
+        settings = Settings()
+        settings.enabled = self.is_timed_switching_enabled
+        settings.dark_time = self.dark_time
+        settings.light_time = self.light_time
+        settings.restart_on_switch = self.restart_explorer.get()
+        settings.apply_strategy = self.apply_strategy
+        settings.mode = self.schedule_mode
+        settings.latitude = self.latitude
+        settings.longitude = self.longitude
+        settings.sunrise_offset = self.sunrise_offset
+        settings.sunset_offset = self.sunset_offset
+        settings.schedule_rules = self.schedule_rules
+        settings.last_theme = self.last_theme
+        settings.control_enabled = self.control_enabled
+        settings.control_port = self.control_port
+        settings.control_token = self.control_token
+        return settings
     
     def save_config(self):
-        """保存配置文件"""
-        config = configparser.ConfigParser()
-        config['TimerSettings'] = {
-            'enabled': str(self.is_timed_switching_enabled),
-            'dark_time': self.dark_time,
-            'light_time': self.light_time,
-            'restart_on_switch': str(self.restart_explorer.get())
-        }
-        try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                config.write(f)
-        except Exception as e:
-            print(f"保存配置失败: {e}")
+        """保存配置（内容未变时不写文件，连续修改合并为一次写入）"""
+        self.config_store.update(self.current_settings())
     
     def toggle_timer_enabled(self):
         """切换定时功能启用状态"""
@@ -696,207 +979,195 @@ class WindowsThemeSwitcher:
         self.schedule_next_event()
     
     def open_time_picker(self, time_type):
-        """打开时间选择器"""
-        # 创建模态对话框
-        picker = tk.Toplevel(self.root)
-        picker.title(f"设置{'暗色' if time_type == 'dark' else '浅色'}模式时间")
-        picker.geometry("250x150")
-        picker.resizable(False, False)
-        picker.transient(self.root)
-        picker.grab_set()
+        """打开时间选择器（对话框只创建一次，之后复用）"""
+        # 日出日落模式下时间由经纬度计算，不提供手动设置
+        if self.schedule_mode == 'solar':
+            return
+        picker, content = self.window_pool.acquire('time_picker')
+        self.picker_time_type = time_type
+        title = f"设置{'暗色' if time_type == 'dark' else '浅色'}模式时间"
+        picker.title(title)
+        content['title_label'].config(text=title)
         
         # 居中显示
-        picker.update_idletasks()
-        x = self.root.winfo_x() + (self.root.winfo_width() - picker.winfo_width()) // 2
-        y = self.root.winfo_y() + (self.root.winfo_height() - picker.winfo_height()) // 2
-        picker.geometry(f"+{x}+{y}")
-        
-        # 应用主题颜色
-        theme = self.get_current_theme()
-        colors = self.dark_theme_colors if theme == 'dark' else self.light_theme_colors
-        picker.config(bg=colors['bg'])
+        x = self.root.winfo_x() + (self.root.winfo_width() - self.PICKER_WIDTH) // 2
+        y = self.root.winfo_y() + (self.root.winfo_height() - self.PICKER_HEIGHT) // 2
+        picker.geometry(f"{self.PICKER_WIDTH}x{self.PICKER_HEIGHT}+{x}+{y}")
         
         # 获取当前时间
         current_time = self.dark_time if time_type == 'dark' else self.light_time
         hour, minute = current_time.split(':')
+        content['hour_var'].set(hour)
+        content['minute_var'].set(minute)
+
+        self.window_pool.show('time_picker')
+        picker.grab_set()
+
+    def build_time_picker(self, picker):
+        """创建时间选择器的内容（仅首次打开时调用一次）"""
+        picker.resizable(False, False)
+        picker.transient(self.root)
+        # 关闭按钮只隐藏对话框，以便下次复用
+        picker.protocol('WM_DELETE_WINDOW', self.close_time_picker)
         
         # 创建UI
-        main_frame = tk.Frame(picker, bg=colors['bg'])
+        main_frame = tk.Frame(picker)
         main_frame.pack(fill='both', expand=True, padx=20, pady=20)
         
         # 标题
-        title_label = tk.Label(main_frame, 
-                              text=f"设置{'暗色' if time_type == 'dark' else '浅色'}模式时间",
-                              font=('Microsoft YaHei UI', 10, 'bold'),
-                              bg=colors['bg'], fg=colors['fg'])
+        title_label = tk.Label(main_frame, font=('Microsoft YaHei UI', 10, 'bold'))
         title_label.pack(pady=(0, 15))
         
         # 时间选择区域
-        time_frame = tk.Frame(main_frame, bg=colors['bg'])
+        time_frame = tk.Frame(main_frame)
         time_frame.pack(pady=(0, 15))
         
         # 小时选择
-        hour_label = tk.Label(time_frame, text="小时:", 
-                             font=('Microsoft YaHei UI', 9),
-                             bg=colors['bg'], fg=colors['fg'])
+        hour_label = tk.Label(time_frame, text="小时:", font=('Microsoft YaHei UI', 9))
         hour_label.grid(row=0, column=0, padx=(0, 5))
         
-        hour_var = tk.StringVar(value=hour)
-        hour_combo = ttk.Combobox(time_frame, textvariable=hour_var, 
-                                 values=[f"{i:02d}" for i in range(24)],
-                                 width=5, state="readonly")
+        hour_var = tk.StringVar(master=picker)
+        hour_combo = ttk.Combobox(time_frame, textvariable=hour_var, values=HOUR_VALUES,
+                                  width=5, state="readonly")
         hour_combo.grid(row=0, column=1, padx=(0, 15))
         
         # 分钟选择
-        minute_label = tk.Label(time_frame, text="分钟:", 
-                               font=('Microsoft YaHei UI', 9),
-                               bg=colors['bg'], fg=colors['fg'])
+        minute_label = tk.Label(time_frame, text="分钟:", font=('Microsoft YaHei UI', 9))
         minute_label.grid(row=0, column=2, padx=(0, 5))
         
-        minute_var = tk.StringVar(value=minute)
-        minute_combo = ttk.Combobox(time_frame, textvariable=minute_var,
-                                   values=[f"{i:02d}" for i in range(60)],
-                                   width=5, state="readonly")
+        minute_var = tk.StringVar(master=picker)
+        minute_combo = ttk.Combobox(time_frame, textvariable=minute_var, values=MINUTE_VALUES,
+                                    width=5, state="readonly")
         minute_combo.grid(row=0, column=3)
         
         # 按钮区域
-        button_frame = tk.Frame(main_frame, bg=colors['bg'])
+        button_frame = tk.Frame(main_frame)
         button_frame.pack()
         
-        def confirm_time():
-            new_time = f"{hour_var.get()}:{minute_var.get()}"
-            if time_type == 'dark':
-                self.dark_time = new_time
-                self.dark_time_label.config(text=new_time)
-            else:
-                self.light_time = new_time
-                self.light_time_label.config(text=new_time)
-            self.save_config()
-            self.root.after(100, self.schedule_next_event)
-            picker.destroy()
-        
-        def cancel_time():
-            picker.destroy()
-        
         confirm_btn = tk.Button(button_frame, text="确认",
                                font=('Microsoft YaHei UI', 9),
-                               bg=colors['btn_bg'], fg=colors['fg'],
-                               activebackground=colors['btn_active_bg'],
                                border=0, cursor='hand2',
                                padx=15, pady=5,
-                               command=confirm_time)
+                               command=self.confirm_time_picker)
         confirm_btn.pack(side='left', padx=(0, 10))
         
         cancel_btn = tk.Button(button_frame, text="取消",
                               font=('Microsoft YaHei UI', 9),
-                              bg=colors['btn_bg'], fg=colors['fg'],
-                              activebackground=colors['btn_active_bg'],
                               border=0, cursor='hand2',
                               padx=15, pady=5,
-                              command=cancel_time)
+                              command=self.close_time_picker)
         cancel_btn.pack(side='left')
+
+        # 登记后随主题自动着色，打开时无需再设置颜色
+        self.style.register(picker, 'window')
+        self.style.register_all([main_frame, time_frame, button_frame], 'frame')
+        self.style.register_all([title_label, hour_label, minute_label], 'label')
+        self.style.register_all([confirm_btn, cancel_btn], 'dialog_button')
+        return {
+            'title_label': title_label,
+            'hour_var': hour_var,
+            'minute_var': minute_var,
+        }
+
+    def confirm_time_picker(self):
+        _, content = self.window_pool.acquire('time_picker')
+        new_time = f"{content['hour_var'].get()}:{content['minute_var'].get()}"
+        if self.picker_time_type == 'dark':
+            self.dark_time = new_time
+            self.dark_time_label.config(text=new_time)
+        else:
+            self.light_time = new_time
+            self.light_time_label.config(text=new_time)
+        self.save_config()
+        self.compile_schedule()
+        self.root.after(100, self.schedule_next_event)
+        self.close_time_picker()
+
+    def close_time_picker(self):
+        picker, _ = self.window_pool.acquire('time_picker')
+        picker.grab_release()
+        self.window_pool.release('time_picker')
     
+    def compile_schedule(self):
+        """把定时设置编译为调度器使用的日程（固定时间或日出日落）"""
+        try:
+            schedule = build_schedule(self.current_settings(), config_base_dir(self.config_file))
+            self.scheduler.set_schedule(schedule)
+        except ValueError as e:
+            print(f"错误：{e}")
+            self.scheduler.set_schedule(None)
+
+    def get_schedule_display_times(self):
+        """返回界面显示的 (暗色时间, 浅色时间)；日出日落模式显示今天的计算结果"""
+        schedule = self.scheduler.schedule
+        if isinstance(schedule, SolarSchedule):
+            sun_times = schedule.sun_times(datetime.now().date())
+            if sun_times is None:
+                return "--:--", "--:--"
+            sunrise, sunset = sun_times
+            return sunset.strftime("%H:%M"), sunrise.strftime("%H:%M")
+        if isinstance(schedule, RuleSchedule):
+            # 显示今天实际生效的规则时间
+            times = {}
+            for second, theme in schedule.schedule_for_day(datetime.now().date()).events:
+                times.setdefault(theme, f"{second // 3600:02d}:{second % 3600 // 60:02d}")
+            return times.get('dark', "--:--"), times.get('light', "--:--")
+        return self.dark_time, self.light_time
+
+    def update_timer_labels(self):
+        """刷新定时模块中显示的时间"""
+        if hasattr(self, 'dark_time_label'):
+            dark_text, light_text = self.get_schedule_display_times()
+            self.dark_time_label.config(text=dark_text)
+            self.light_time_label.config(text=light_text)
+
     def schedule_next_event(self):
         """
-        高效渐进式调度器。
-        计算到下一个事件的精确时间，并根据距离动态设置下一次检查的间隔。
+        精确调度器。
+        为已编译日程中的下一个事件布置唯一的计时器，到点后由调度器自动布置下一个。
         """
-        # 1. 取消任何可能存在的旧计时器
-        if hasattr(self, 'schedule_timer_id') and self.schedule_timer_id:
-            self.root.after_cancel(self.schedule_timer_id)
-            self.schedule_timer_id = None
-
-        # 2. 检查功能是否启用
         if not self.is_timed_switching_enabled:
+            self.scheduler.cancel()
             return
+        self.scheduler.arm()
 
-        # 3. 获取并转换时间对象
-        now = datetime.now()
-        try:
-            dark_time_obj = now.replace(hour=int(self.dark_time.split(':')[0]), minute=int(self.dark_time.split(':')[1]), second=0, microsecond=0)
-            light_time_obj = now.replace(hour=int(self.light_time.split(':')[0]), minute=int(self.light_time.split(':')[1]), second=0, microsecond=0)
-        except (ValueError, IndexError):
-            print("错误：时间格式不正确。")
-            return
-
-        # 4. 构建今天和明天的候选事件列表
-        events_today = []
-        if dark_time_obj > now:
-            events_today.append(dark_time_obj)
-        if light_time_obj > now:
-            events_today.append(light_time_obj)
-
-        # 5. 确定下一个事件的时间点
-        if events_today:
-            # 如果今天还有任务
-            next_event_time = min(events_today)
-        else:
-            # 如果今天的任务都已过，则计算明天的第一个任务
-            # timedelta(days=1) 用于获取明天的时间对象
-            from datetime import timedelta
-            tomorrow_dark = dark_time_obj + timedelta(days=1)
-            tomorrow_light = light_time_obj + timedelta(days=1)
-            next_event_time = min(tomorrow_dark, tomorrow_light)
-
-        # 6. 计算总剩余秒数
-        delay_seconds = (next_event_time - now).total_seconds()
-
-        # 7. 实现"渐进式逼近"逻辑阶梯，确定下一次检查的间隔
-        if delay_seconds <= 1:
-            # 已到或即将到点，立即执行
-            self.run_scheduled_task()
-            return
-        elif delay_seconds <= 10:
-            # 10秒内，每秒检查一次
-            next_check_interval = 1
-        elif delay_seconds <= 60:
-            # 1分钟内，每10秒检查一次
-            next_check_interval = 10
-        elif delay_seconds <= 600:
-            # 10分钟内，每分钟检查一次
-            next_check_interval = 60
-        elif delay_seconds <= 3600:
-            # 1小时内，每10分钟检查一次
-            next_check_interval = 600
-        else:
-            # 超过1小时，检查间隔为剩余时间的一半，但最长不超过1小时(3600秒)
-            next_check_interval = min(delay_seconds / 2, 3600)
-            
-        # 8. 设置下一次调度计时器
-        delay_ms = int(next_check_interval * 1000)
-        self.schedule_timer_id = self.root.after(delay_ms, self.schedule_next_event)
-
-
-    def run_scheduled_task(self):
+    def run_scheduled_task(self, theme):
         """
         被计时器唤醒时调用的最终执行方法。
-        负责执行切换并立即重新安排下一个事件。
+        负责确保目标主题，下一个事件由调度器随后布置。
         """
-        # 执行自动切换（此方法已在v1.6.1中实现，会自动判断是否重启资源管理器）
-        self.execute_auto_theme_toggle()
+        # 确保处于目标主题（已是目标主题时不做任何操作，遵循重启资源管理器设置）
+        self.execute_scheduled_theme(theme)
+        # 日出日落模式下每天的时间不同
+        self.update_timer_labels()
 
-        # 关键步骤：任务完成后，立即重新启动调度，安排下一个事件
-        # 增加一个小的延迟，确保状态更新完毕
-        self.root.after(1000, self.schedule_next_event)
+    def execute_scheduled_theme(self, theme):
+        """执行定时主题设置（幂等，智能判断是否重启资源管理器）"""
+        def report(job):
+            if job.state != DONE:
+                print(f"自动切换失败: {self.describe_job_failure(job)}")
+            elif not job.result:
+                stats = self.theme_controller.stats
+                print(f"定时任务跳过: 当前已是{theme}主题（累计跳过 {stats['scheduled_noop_skips']} 次）")
 
-    def execute_auto_theme_toggle(self):
-        """执行自动主题切换（智能判断是否重启资源管理器）"""
-        try:
-            # 根据复选框状态选择执行的脚本
-            if self.restart_explorer.get():
-                script_path = self.resource_path("toggle_and_restart.bat")
-            else:
-                script_path = self.resource_path("toggle_theme.bat")
-            
-            subprocess.run([script_path], creationflags=subprocess.CREATE_NO_WINDOW, check=True)
-            # 延迟更新状态
-            self.root.after(500, self.update_theme_status)
-        except Exception as e:
-            print(f"自动切换失败: {e}")
+        self.set_theme(theme, source='schedule', on_done=report)
 
     def run(self):
         self.root.mainloop()
+        if self.instance_server:
+            self.instance_server.stop()
+        if self.control_server:
+            self.control_server.stop()
+        self.config_store.flush()
+        self.stop_mouse_check()
+        self.monitor_provider.stop()
+        self.job_runner.stop()
+        self.theme_state.stop()
+        self.clock_monitor.stop()
 
 if __name__ == "__main__":
-    app = WindowsThemeSwitcher()
+    if '--trace' in sys.argv[1:]:
+        tracing.enable()
+    profiler = StartupProfiler(enabled='--profile-startup' in sys.argv[1:], start=STARTUP_BEGIN)
+    app = WindowsThemeSwitcher(profiler, instance_server, theme_cli.config_option(sys.argv[1:]))
     app.run()
\ No newline at end of file
@@ -0,0 +1,233 @@
+"""
+运行跟踪与统计
+
+热点路径（读取/写入主题、启动脚本、重启资源管理器、刷新界面、调度器唤醒）
+用 span(name) 包裹，用 count(name) 计数。启用后，每个 span 的耗时和错误记入
+有界的环形缓冲区（只保留最近 capacity 条），并按名称累计直方图；按需导出为
+JSONL 或 Prometheus 文本格式。
+
+默认关闭：关闭时 span() 直接返回共享的空上下文，count() 立即返回，
+只多一次属性判断。环形缓冲区及其依赖的模块在 enable() 时才创建和导入，
+命令行的一次性命令导入本模块不增加启动时间。
+"""
+import time
+
+DEFAULT_CAPACITY = 4096
+# Prometheus 直方图的桶上限（秒）
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+FORMATS = ('jsonl', 'prometheus')
+METRIC_PREFIX = 'theme_switcher'
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """一次计时；set() 可在执行过程中补充属性（如结果）"""
+    __slots__ = ('tracer', 'name', 'attrs', 'wall', 'started')
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.wall = time.time()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.started
+        error = f"{exc_type.__name__}: {exc}" if exc_type else None
+        self.tracer.record(self.name, self.wall, duration, self.attrs, error)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class DisabledTracer:
+    """enable() 之前的占位跟踪器：不分配缓冲区，也不导入 collections / threading"""
+    capacity = DEFAULT_CAPACITY
+
+    def __init__(self):
+        self.enabled = False
+
+    def span(self, name, **attrs):
+        return NOOP_SPAN
+
+    def count(self, name, value=1):
+        pass
+
+
+class Tracer:
+    def __init__(self, capacity=DEFAULT_CAPACITY, enabled=False):
+        import collections
+        import threading
+        self.enabled = enabled
+        self._current_thread = threading.current_thread
+        self._spans = collections.deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._counters = {}
+        # 名称 -> [次数, 总耗时, 最大耗时, 错误次数, 各桶计数]
+        self._aggregates = {}
+        self.dropped = 0
+
+    @property
+    def capacity(self):
+        return self._spans.maxlen
+
+    def span(self, name, **attrs):
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, attrs)
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def record(self, name, wall, duration, attrs=None, error=None):
+        with self._lock:
+            if len(self._spans) == self._spans.maxlen:
+                self.dropped += 1
+            self._spans.append((name, wall, duration, self._current_thread().name, attrs or None, error))
+            aggregate = self._aggregates.get(name)
+            if aggregate is None:
+                aggregate = self._aggregates[name] = [0, 0.0, 0.0, 0, [0] * len(BUCKETS)]
+            aggregate[0] += 1
+            aggregate[1] += duration
+            aggregate[2] = max(aggregate[2], duration)
+            if error:
+                aggregate[3] += 1
+            for index, bound in enumerate(BUCKETS):
+                if duration <= bound:
+                    aggregate[4][index] += 1
+                    break
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+            self._aggregates.clear()
+            self.dropped = 0
+
+    def spans(self):
+        """缓冲区中的 span（从旧到新），每项为 dict"""
+        with self._lock:
+            spans = list(self._spans)
+        return [{'name': name, 'start': round(wall, 6), 'duration_ms': round(duration * 1000, 3),
+                 'thread': thread, 'attrs': attrs or {}, 'error': error}
+                for name, wall, duration, thread, attrs, error in spans]
+
+    def summary(self):
+        """各 span 的次数/平均/最大耗时（毫秒）与计数器"""
+        with self._lock:
+            aggregates = {name: list(value) for name, value in self._aggregates.items()}
+            counters = dict(self._counters)
+        return {
+            'enabled': self.enabled,
+            'buffered': len(self._spans),
+            'dropped': self.dropped,
+            'spans': {name: {'count': count, 'avg_ms': round(total / count * 1000, 3),
+                             'max_ms': round(peak * 1000, 3), 'errors': errors}
+                      for name, (count, total, peak, errors, _) in sorted(aggregates.items())},
+            'counters': counters,
+        }
+
+    def to_jsonl(self):
+        import json
+        lines = [json.dumps(dict(span, type='span'), ensure_ascii=False) for span in self.spans()]
+        with self._lock:
+            counters = sorted(self._counters.items())
+        lines += [json.dumps({'type': 'counter', 'name': name, 'value': value}, ensure_ascii=False)
+                  for name, value in counters]
+        return ''.join(line + '\n' for line in lines)
+
+    def to_prometheus(self):
+        """Prometheus 文本格式：span 耗时直方图、错误计数和计数器"""
+        with self._lock:
+            aggregates = sorted((name, list(value)) for name, value in self._aggregates.items())
+            counters = sorted(self._counters.items())
+        histogram = f'{METRIC_PREFIX}_span_duration_seconds'
+        lines = [f'# HELP {histogram} Duration of traced operations.',
+                 f'# TYPE {histogram} histogram']
+        for name, (count, total, _, _, buckets) in aggregates:
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS, buckets):
+                cumulative += bucket
+                lines.append(f'{histogram}_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{histogram}_bucket{{span="{name}",le="+Inf"}} {count}')
+            lines.append(f'{histogram}_sum{{span="{name}"}} {total:.6f}')
+            lines.append(f'{histogram}_count{{span="{name}"}} {count}')
+        errors = f'{METRIC_PREFIX}_span_errors_total'
+        lines += [f'# HELP {errors} Traced operations that raised.', f'# TYPE {errors} counter']
+        lines += [f'{errors}{{span="{name}"}} {value[3]}' for name, value in aggregates]
+        events = f'{METRIC_PREFIX}_events_total'
+        lines += [f'# HELP {events} Event counters.', f'# TYPE {events} counter']
+        lines += [f'{events}{{name="{name}"}} {value}' for name, value in counters]
+        return '\n'.join(lines) + '\n'
+
+    def render(self, fmt):
+        if fmt not in FORMATS:
+            raise ValueError(f"未知的导出格式: {fmt}（可用 jsonl 或 prometheus）")
+        return self.to_jsonl() if fmt == 'jsonl' else self.to_prometheus()
+
+    def export(self, path, fmt='jsonl'):
+        """导出到文件，返回缓冲区中的 span 数"""
+        from settings import write_text_atomic
+        write_text_atomic(path, self.render(fmt))
+        return len(self._spans)
+
+
+# 进程内共享的跟踪器；各模块通过下面的 span / count 使用，enable() 时换成 Tracer
+TRACER = DisabledTracer()
+
+
+def span(name, **attrs):
+    if not TRACER.enabled:
+        return NOOP_SPAN
+    return Span(TRACER, name, attrs)
+
+
+def count(name, value=1):
+    if TRACER.enabled:
+        TRACER.count(name, value)
+
+
+def enable(capacity=None):
+    global TRACER
+    if not isinstance(TRACER, Tracer):
+        TRACER = Tracer(capacity or DEFAULT_CAPACITY)
+    elif capacity and capacity != TRACER.capacity:
+        import collections
+        TRACER._spans = collections.deque(TRACER._spans, maxlen=capacity)
+    TRACER.enabled = True
+
+
+def handle_export_command(message):
+    """处理转发来的 export_trace 命令（界面与守护模式共用），返回回复 dict"""
+    if not TRACER.enabled:
+        return {'ok': False, 'error': '该实例未启用跟踪（以 --trace 启动或在配置中设置 [Diagnostics] tracing = True）'}
+    path = message.get('path')
+    if not path:
+        return {'ok': False, 'error': '缺少导出路径'}
+    try:
+        spans = TRACER.export(path, message.get('format') or 'jsonl')
+    except (OSError, ValueError) as e:
+        return {'ok': False, 'error': str(e)}
+    return {'ok': True, 'path': path, 'spans': spans}
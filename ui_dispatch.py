@@ -0,0 +1,71 @@
+"""
+线程安全的 Tk 调度队列
+
+Tk 不是线程安全的：后台线程（任务执行器、注册表监听、光标事件源、时钟
+跳变监听）不得直接调用任何 Tk 接口。它们通过 TkDispatcher.post(callback)
+把回调放进队列，再以一个虚拟事件唤醒 Tk 线程统一执行。队列非空期间只发送
+一次唤醒事件，连续投递不会堆积事件。主循环启动前投递的回调由界面在
+启动完成时调用一次 drain() 执行。
+
+跨线程的 event_generate 要等 Tk 线程处理，主循环未运行时还会卡住后失败；
+post() 可能在鼠标钩子回调中调用，钩子回调必须尽快返回。因此唤醒事件由
+专门的唤醒线程发送，post() 本身只入队并置位，从不调用 Tk。
+"""
+import collections
+import threading
+
+DISPATCH_EVENT = '<<ThemeSwitcherDispatch>>'
+
+
+class TkDispatcher:
+    """post(callback) 可在任意线程调用，callback 总在 Tk 线程中执行"""
+
+    def __init__(self, root):
+        self.root = root
+        self._queue = collections.deque()
+        self._lock = threading.Lock()
+        self._wake_pending = False
+        self._tk_thread = threading.get_ident()
+        self.stats = {'posted': 0, 'wakeups': 0, 'executed': 0}
+        root.bind(DISPATCH_EVENT, lambda event: self.drain(), add='+')
+        self._wake = threading.Event()
+        threading.Thread(target=self._wake_loop, name='ThemeSwitcher-dispatch', daemon=True).start()
+
+    def post(self, callback):
+        with self._lock:
+            self._queue.append(callback)
+            self.stats['posted'] += 1
+            if self._wake_pending:
+                return
+            self._wake_pending = True
+        self.stats['wakeups'] += 1
+        if threading.get_ident() == self._tk_thread:
+            self.root.after_idle(self.drain)
+            return
+        self._wake.set()
+
+    def _wake_loop(self):
+        """唤醒线程：每次置位后向 Tk 线程发送一次虚拟事件（可能阻塞的只有本线程）"""
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                self.root.event_generate(DISPATCH_EVENT, when='tail')
+            except Exception:
+                # 主循环尚未启动或已退出：回调留在队列中，由下一次 post 或 drain 执行
+                with self._lock:
+                    self._wake_pending = False
+
+    def drain(self):
+        """在 Tk 线程中执行队列中的全部回调"""
+        while True:
+            with self._lock:
+                if not self._queue:
+                    self._wake_pending = False
+                    return
+                callback = self._queue.popleft()
+            self.stats['executed'] += 1
+            try:
+                callback()
+            except Exception as e:
+                print(f"界面回调失败: {e}")
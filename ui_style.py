@@ -0,0 +1,121 @@
+"""
+界面配色登记表
+
+控件按角色（窗口、框架、标签、按钮……）登记，每个角色在每种主题下的
+configure 选项在启动时就预先算好。切换主题时只把与该控件上次应用值不同的
+选项推送给 Tk，主题未变时刷新不产生任何 Tk 调用。之后创建的控件（对话框、
+停靠指示条、操作蒙版）登记时立即按当前主题着色。
+
+注意：登记过的颜色选项只能通过本登记表修改，否则记录的“上次应用值”会失效。
+"""
+
+# 各主题的色板
+THEME_PALETTES = {
+    'light': {
+        'bg': '#f5f7fc',
+        'fg': '#333333',
+        'btn_bg': '#e8ecf4',
+        'btn_active_bg': '#dfe4ee',
+        'indicator': '#FFFFFF',
+        # 使用较浅的颜色来模拟半透明蒙版
+        'mask': '#f0f0f0',
+        'mask_fg': '#666666',
+    },
+    'dark': {
+        'bg': '#17191f',
+        'fg': '#e0e0e0',
+        'btn_bg': '#2c2f3a',
+        'btn_active_bg': '#3a3e4c',
+        'indicator': '#000000',
+        'mask': '#404040',
+        'mask_fg': '#cccccc',
+    },
+}
+
+# 角色 -> {configure 选项: 色板键}；不是色板键的值按字面值使用（如 relief）
+ROLE_OPTIONS = {
+    'window': {'bg': 'bg'},
+    'frame': {'bg': 'bg'},
+    'label': {'bg': 'bg', 'fg': 'fg'},
+    'icon': {'bg': 'bg'},
+    'button': {'bg': 'btn_bg', 'fg': 'fg', 'activebackground': 'btn_active_bg', 'relief': 'flat'},
+    'dialog_button': {'bg': 'btn_bg', 'fg': 'fg', 'activebackground': 'btn_active_bg'},
+    'close_button': {'bg': 'bg', 'fg': 'fg', 'activebackground': 'btn_active_bg'},
+    'check': {'bg': 'bg', 'fg': 'fg', 'selectcolor': 'bg', 'activebackground': 'bg', 'activeforeground': 'fg'},
+    'indicator': {'bg': 'indicator'},
+    'mask': {'bg': 'mask'},
+    'mask_label': {'bg': 'mask', 'fg': 'mask_fg'},
+}
+
+
+def build_styles(palettes, roles):
+    """预先计算 {主题: {角色: configure 选项}}"""
+    return {theme: {role: {option: palette.get(key, key) for option, key in options.items()}
+                    for role, options in roles.items()}
+            for theme, palette in palettes.items()}
+
+
+class StyleRegistry:
+    """按角色登记控件，apply(theme) 只推送有变化的选项"""
+
+    def __init__(self, palettes=THEME_PALETTES, roles=ROLE_OPTIONS):
+        self.base_palettes = palettes
+        self.roles = roles
+        self.palettes = palettes
+        self.styles = build_styles(palettes, roles)
+        self.theme = None
+        # 控件 -> [角色, 上次应用的选项]
+        self._widgets = {}
+        self.stats = {'configure_calls': 0, 'options_pushed': 0}
+
+    @staticmethod
+    def resolve(theme):
+        """未知主题（检测失败）按浅色显示"""
+        return 'dark' if theme == 'dark' else 'light'
+
+    def colors(self, theme=None):
+        """当前（或指定）主题的色板"""
+        return self.palettes[self.resolve(self.theme if theme is None else theme)]
+
+    def register(self, widget, role):
+        if role not in self.styles['light']:
+            raise ValueError(f"未知的控件角色: {role}")
+        self._widgets[widget] = [role, {}]
+        if self.theme is not None:
+            self._apply_one(widget)
+
+    def register_all(self, widgets, role):
+        for widget in widgets:
+            self.register(widget, role)
+
+    def unregister(self, widget):
+        self._widgets.pop(widget, None)
+
+    def set_palettes(self, overrides):
+        """用 {主题: {色板键: 颜色}} 覆盖默认色板（如主题方案中的配色），当前主题的变化立即推送"""
+        self.palettes = {theme: dict(palette, **overrides.get(theme, {}))
+                         for theme, palette in self.base_palettes.items()}
+        self.styles = build_styles(self.palettes, self.roles)
+        if self.theme is not None:
+            for widget in self._widgets:
+                self._apply_one(widget)
+
+    def apply(self, theme):
+        theme = self.resolve(theme)
+        if theme == self.theme:
+            # 登记时已按当前主题着色，主题未变就没有需要推送的选项
+            return
+        self.theme = theme
+        for widget in self._widgets:
+            self._apply_one(widget)
+
+    def _apply_one(self, widget):
+        role, applied = self._widgets[widget]
+        target = self.styles[self.theme][role]
+        changes = {option: value for option, value in target.items() if applied.get(option) != value}
+        if not changes:
+            return
+        widget.configure(**changes)
+        applied.update(changes)
+        self.stats['configure_calls'] += 1
+        self.stats['options_pushed'] += len(changes)
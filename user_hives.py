@@ -0,0 +1,338 @@
+"""
+批量设置所有用户的主题
+
+共享的实验室、展台电脑需要为每个用户配置文件设置主题。配置单元来源
+（hive source）列出目标并为每个目标提供主题后端：
+
+- WinRegHiveSource: HKEY_USERS 下已加载的用户 SID，以及 ProfileList 中
+  未登录用户的 NTUSER.DAT（临时挂载到 HKEY_USERS，写完即卸载，需要管理员权限）；
+- FakeHiveSource: 任意数量的内存配置单元，可模拟读写延迟、挂载延迟和失败，
+  用于在 Linux 上测量吞吐量与失败隔离。
+
+apply_to_hives 用有界线程池并发处理，单个配置单元失败不影响其他配置单元，
+返回逐个配置单元的结果与耗时。
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+from theme_backend import PERSONALIZE_KEY, MemoryThemeBackend, WinRegThemeBackend, winreg
+from theme_controller import VALID_THEMES
+
+DEFAULT_WORKERS = 8
+# 普通用户账户的 SID 前缀（排除 SYSTEM、服务账户和 .DEFAULT）
+USER_SID_PREFIX = 'S-1-5-21-'
+PROFILE_LIST_KEY = r"SOFTWARE\Microsoft\Windows NT\CurrentVersion\ProfileList"
+MOUNT_PREFIX = 'ThemeSwitcher-'
+UNLOAD_RETRIES = 5
+
+LOADED = 'loaded'
+OFFLINE = 'offline'
+CHANGED = 'changed'
+UNCHANGED = 'unchanged'
+FAILED = 'failed'
+
+KIND_NAMES = {LOADED: '已加载', OFFLINE: '离线'}
+STATUS_NAMES = {CHANGED: '已切换', UNCHANGED: '无需切换', FAILED: '失败'}
+
+
+class HiveTarget:
+    """一个用户配置单元：sid，kind 为 loaded / offline，离线时 path 为 NTUSER.DAT 路径"""
+
+    def __init__(self, sid, kind=LOADED, path=None):
+        self.sid = sid
+        self.kind = kind
+        self.path = path
+
+    def __repr__(self):
+        return f"HiveTarget({self.sid!r}, {self.kind!r})"
+
+
+class HiveResult:
+    def __init__(self, hive):
+        self.hive = hive
+        self.status = None
+        self.previous = None
+        self.error = None
+        self.duration = 0.0
+
+    def to_dict(self):
+        return {'sid': self.hive.sid, 'kind': self.hive.kind, 'status': self.status,
+                'previous': self.previous, 'error': self.error, 'duration_ms': round(self.duration * 1000, 3)}
+
+
+class BulkReport:
+    """一次批量设置的结果"""
+
+    def __init__(self, theme, results, elapsed, workers):
+        self.theme = theme
+        self.results = results
+        self.elapsed = elapsed
+        self.workers = workers
+
+    def count(self, status):
+        return sum(1 for result in self.results if result.status == status)
+
+    @property
+    def failed(self):
+        return [result for result in self.results if result.status == FAILED]
+
+    def summary(self):
+        return {'theme': self.theme, 'hives': len(self.results), 'changed': self.count(CHANGED),
+                'unchanged': self.count(UNCHANGED), 'failed': self.count(FAILED),
+                'workers': self.workers, 'elapsed_ms': round(self.elapsed * 1000, 3)}
+
+    def to_dict(self):
+        return dict(self.summary(), results=[result.to_dict() for result in self.results])
+
+    def lines(self):
+        """逐个配置单元的文本报告"""
+        lines = []
+        for result in self.results:
+            line = (f"{result.hive.sid:<48}{KIND_NAMES[result.hive.kind]:<6}"
+                    f"{STATUS_NAMES[result.status]:<8}{result.duration * 1000:8.1f} ms")
+            if result.error:
+                line += f"  {result.error}"
+            lines.append(line)
+        summary = self.summary()
+        lines.append(f"共 {summary['hives']} 个配置单元：切换 {summary['changed']}，无需切换 {summary['unchanged']}，"
+                     f"失败 {summary['failed']}；{self.workers} 个线程，用时 {self.elapsed * 1000:.0f} ms")
+        return lines
+
+
+def apply_to_hive(source, hive, theme):
+    """确保一个配置单元处于 theme，异常记录在结果中而不抛出"""
+    result = HiveResult(hive)
+    started = time.perf_counter()
+    try:
+        with tracing.span('hive.apply', sid=hive.sid, kind=hive.kind):
+            backend = source.mount(hive)
+            try:
+                result.previous = backend.read_theme()
+                if result.previous == theme:
+                    result.status = UNCHANGED
+                else:
+                    backend.write_theme(theme)
+                    result.status = CHANGED
+            finally:
+                source.unmount(hive)
+    except Exception as e:
+        # 单个配置单元失败（文件被占用、拒绝访问等）不影响其他配置单元
+        result.status = FAILED
+        result.error = str(e) or type(e).__name__
+    result.duration = time.perf_counter() - started
+    return result
+
+
+def apply_to_hives(source, theme, hives=None, workers=DEFAULT_WORKERS):
+    """为 hives（默认为 source 列出的全部配置单元）并发设置主题，返回 BulkReport"""
+    if theme not in VALID_THEMES:
+        raise ValueError(f"未知主题: {theme}")
+    if workers < 1:
+        raise ValueError("线程数至少为 1")
+    hives = source.list_hives() if hives is None else list(hives)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ThemeSwitcherHive') as pool:
+        results = list(pool.map(lambda hive: apply_to_hive(source, hive, theme), hives))
+    return BulkReport(theme, results, time.perf_counter() - started, workers)
+
+
+class WinRegHiveSource:
+    """真实的用户配置单元；挂载离线配置单元需要管理员权限（SeBackup / SeRestore）"""
+
+    def __init__(self, include_offline=True):
+        if winreg is None:
+            raise OSError("批量设置所有用户仅在 Windows 上可用")
+        self.include_offline = include_offline
+        self._privileges_enabled = False
+        self._lock = threading.Lock()
+
+    def list_hives(self):
+        loaded = []
+        with winreg.OpenKey(winreg.HKEY_USERS, '') as users:
+            index = 0
+            while True:
+                try:
+                    name = winreg.EnumKey(users, index)
+                except OSError:
+                    break
+                index += 1
+                if name.startswith(USER_SID_PREFIX) and not name.endswith('_Classes'):
+                    loaded.append(HiveTarget(name, LOADED))
+        if not self.include_offline:
+            return loaded
+        loaded_sids = {hive.sid for hive in loaded}
+        return loaded + [hive for hive in self._list_profiles() if hive.sid not in loaded_sids]
+
+    def _list_profiles(self):
+        """ProfileList 中存在 NTUSER.DAT 的用户配置文件"""
+        hives = []
+        with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, PROFILE_LIST_KEY) as profiles:
+            index = 0
+            while True:
+                try:
+                    sid = winreg.EnumKey(profiles, index)
+                except OSError:
+                    break
+                index += 1
+                if not sid.startswith(USER_SID_PREFIX):
+                    continue
+                try:
+                    with winreg.OpenKey(profiles, sid) as key:
+                        profile_dir, _ = winreg.QueryValueEx(key, 'ProfileImagePath')
+                except OSError:
+                    continue
+                path = os.path.join(os.path.expandvars(profile_dir), 'NTUSER.DAT')
+                if os.path.isfile(path):
+                    hives.append(HiveTarget(sid, OFFLINE, path))
+        return hives
+
+    def mount(self, hive):
+        if hive.kind == LOADED:
+            return WinRegThemeBackend(winreg.HKEY_USERS, f"{hive.sid}\\{PERSONALIZE_KEY}")
+        with self._lock:
+            if not self._privileges_enabled:
+                _enable_privileges(('SeBackupPrivilege', 'SeRestorePrivilege'))
+                self._privileges_enabled = True
+        mount_name = MOUNT_PREFIX + hive.sid
+        # 上次异常退出可能留下挂载点
+        _unload_hive(mount_name, retries=1)
+        winreg.LoadKey(winreg.HKEY_USERS, mount_name, hive.path)
+        return WinRegThemeBackend(winreg.HKEY_USERS, f"{mount_name}\\{PERSONALIZE_KEY}")
+
+    def unmount(self, hive):
+        if hive.kind == OFFLINE:
+            error = _unload_hive(MOUNT_PREFIX + hive.sid)
+            if error:
+                raise OSError(f"卸载配置单元失败: {error}")
+
+
+def _enable_privileges(names):
+    """为当前进程启用特权；未以管理员身份运行时抛出 OSError"""
+    import ctypes
+    from ctypes import wintypes
+
+    class LUID(ctypes.Structure):
+        _fields_ = [('LowPart', wintypes.DWORD), ('HighPart', wintypes.LONG)]
+
+    class LUID_AND_ATTRIBUTES(ctypes.Structure):
+        _fields_ = [('Luid', LUID), ('Attributes', wintypes.DWORD)]
+
+    class TOKEN_PRIVILEGES(ctypes.Structure):
+        _fields_ = [('PrivilegeCount', wintypes.DWORD), ('Privileges', LUID_AND_ATTRIBUTES * 1)]
+
+    TOKEN_ADJUST_PRIVILEGES = 0x0020
+    TOKEN_QUERY = 0x0008
+    SE_PRIVILEGE_ENABLED = 0x00000002
+    ERROR_NOT_ALL_ASSIGNED = 1300
+    kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    advapi32 = ctypes.WinDLL('advapi32', use_last_error=True)
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    kernel32.CloseHandle.argtypes = (wintypes.HANDLE,)
+    advapi32.OpenProcessToken.argtypes = (wintypes.HANDLE, wintypes.DWORD, ctypes.POINTER(wintypes.HANDLE))
+    advapi32.LookupPrivilegeValueW.argtypes = (wintypes.LPCWSTR, wintypes.LPCWSTR, ctypes.POINTER(LUID))
+    advapi32.AdjustTokenPrivileges.argtypes = (wintypes.HANDLE, wintypes.BOOL, ctypes.POINTER(TOKEN_PRIVILEGES),
+                                               wintypes.DWORD, wintypes.LPVOID, wintypes.LPVOID)
+    token = wintypes.HANDLE()
+    if not advapi32.OpenProcessToken(kernel32.GetCurrentProcess(), TOKEN_ADJUST_PRIVILEGES | TOKEN_QUERY,
+                                     ctypes.byref(token)):
+        raise ctypes.WinError(ctypes.get_last_error())
+    try:
+        for name in names:
+            privileges = TOKEN_PRIVILEGES(1)
+            privileges.Privileges[0].Attributes = SE_PRIVILEGE_ENABLED
+            if not advapi32.LookupPrivilegeValueW(None, name, ctypes.byref(privileges.Privileges[0].Luid)):
+                raise ctypes.WinError(ctypes.get_last_error())
+            # 成功返回时也可能只是部分授予，须检查最后错误码
+            if (not advapi32.AdjustTokenPrivileges(token, False, ctypes.byref(privileges), 0, None, None)
+                    or ctypes.get_last_error() == ERROR_NOT_ALL_ASSIGNED):
+                raise OSError(f"无法启用 {name}，挂载离线配置单元需要以管理员身份运行")
+    finally:
+        kernel32.CloseHandle(token)
+
+
+def _unload_hive(mount_name, retries=UNLOAD_RETRIES):
+    """卸载 HKEY_USERS 下的挂载点，返回错误码（成功或不存在时为 0）"""
+    import ctypes
+    from ctypes import wintypes
+    ERROR_FILE_NOT_FOUND = 2
+    advapi32 = ctypes.WinDLL('advapi32', use_last_error=True)
+    advapi32.RegUnLoadKeyW.argtypes = (wintypes.HANDLE, wintypes.LPCWSTR)
+    advapi32.RegUnLoadKeyW.restype = wintypes.LONG
+    # 预定义键在 64 位下按有符号 32 位数扩展（与 SDK 中 HKEY_USERS 的定义一致）
+    users = wintypes.HANDLE(ctypes.c_long(winreg.HKEY_USERS).value)
+    error = 0
+    for attempt in range(retries):
+        error = advapi32.RegUnLoadKeyW(users, mount_name)
+        if error in (0, ERROR_FILE_NOT_FOUND):
+            return 0
+        # 其他进程（如杀毒软件）可能短暂打开了挂载的键
+        time.sleep(0.05 * (attempt + 1))
+    return error
+
+
+class FakeHiveBackend(MemoryThemeBackend):
+    """带读写延迟的内存配置单元，sleep 与真实注册表 I/O 一样释放 GIL"""
+    name = 'fake-hive'
+
+    def __init__(self, theme, latency=0.0, fail_write=False):
+        super().__init__(theme)
+        self.latency = latency
+        self.fail_write = fail_write
+
+    def read_values(self):
+        if self.latency:
+            time.sleep(self.latency)
+        return super().read_values()
+
+    def write_values(self, values):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail_write:
+            raise PermissionError("拒绝访问")
+        super().write_values(values)
+
+
+class FakeHiveSource:
+    """
+    loaded 个已加载和 offline 个离线的内存配置单元，初始主题交替为浅色/暗色。
+    locked 中的 SID 挂载失败（文件被占用），denied 中的 SID 写入失败（拒绝访问）。
+    """
+
+    def __init__(self, loaded=100, offline=0, latency=0.0, mount_latency=0.0, locked=(), denied=()):
+        self.hives = ([HiveTarget(f"{USER_SID_PREFIX}1000-{index}", LOADED) for index in range(loaded)] +
+                      [HiveTarget(f"{USER_SID_PREFIX}2000-{index}", OFFLINE, f"C:\\Users\\user{index}\\NTUSER.DAT")
+                       for index in range(offline)])
+        self.mount_latency = mount_latency
+        self.locked = set(locked)
+        self.backends = {hive.sid: FakeHiveBackend('light' if index % 2 else 'dark', latency, hive.sid in denied)
+                         for index, hive in enumerate(self.hives)}
+        self._lock = threading.Lock()
+        self.mounted = 0
+        self.max_mounted = 0
+        self.stats = {'mounts': 0, 'unmounts': 0}
+
+    def list_hives(self):
+        return list(self.hives)
+
+    def theme_of(self, sid):
+        return self.backends[sid].read_theme()
+
+    def mount(self, hive):
+        if hive.kind == OFFLINE:
+            if self.mount_latency:
+                time.sleep(self.mount_latency)
+            if hive.sid in self.locked:
+                raise OSError("配置单元文件正被另一进程使用")
+        with self._lock:
+            self.stats['mounts'] += 1
+            self.mounted += 1
+            self.max_mounted = max(self.max_mounted, self.mounted)
+        return self.backends[hive.sid]
+
+    def unmount(self, hive):
+        with self._lock:
+            self.stats['unmounts'] += 1
+            self.mounted -= 1
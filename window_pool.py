@@ -0,0 +1,57 @@
+"""
+可复用的临时窗口池
+
+停靠指示条、时间选择器等临时窗口只在第一次使用时创建，之后关闭时
+withdraw、再次使用时重新定位和着色后 deiconify，不再反复创建和销毁
+Toplevel 及其子控件。
+"""
+import tkinter as tk
+
+
+class ToplevelPool:
+    """
+    按名称管理的 Toplevel 池。
+    register(name, builder) 登记构建函数：builder(window) 在新建的 Toplevel 上
+    创建内容并返回内容对象（可为 None）。
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._builders = {}
+        self._windows = {}
+        self.stats = {'created': 0, 'reused': 0}
+
+    def register(self, name, builder):
+        self._builders[name] = builder
+
+    def acquire(self, name):
+        """返回 (window, content)，窗口保持隐藏，由调用方定位后调用 show()"""
+        entry = self._windows.get(name)
+        if entry is None:
+            window = tk.Toplevel(self.root)
+            window.withdraw()
+            entry = (window, self._builders[name](window))
+            self._windows[name] = entry
+            self.stats['created'] += 1
+        else:
+            self.stats['reused'] += 1
+        return entry
+
+    def show(self, name):
+        window, _ = self._windows[name]
+        window.deiconify()
+        return window
+
+    def release(self, name):
+        """隐藏窗口以备下次使用"""
+        entry = self._windows.get(name)
+        if entry is not None:
+            entry[0].withdraw()
+
+    def is_created(self, name):
+        return name in self._windows
+
+    def destroy(self):
+        for window, _ in self._windows.values():
+            window.destroy()
+        self._windows.clear()